@@ -1,15 +1,48 @@
+import logging
+from contextlib import asynccontextmanager
+from typing import Optional
+
 from fastapi import FastAPI
 
-from app.routers import category, docs, order, order_conversion, product, quotation, vendor, waiting_product
+from app.database.config import OrderNumberConfig, ProductIndexConfig
+from app.routers import (
+    category, docs, order, order_conversion, picture, product, quotation, vendor, waiting_product,
+)
+from app.services import category_service, order_number_service, product_service, vendor_service
+
+logger = logging.getLogger(__name__)
 
 
-def create_app(context_path: str = "") -> FastAPI:
+def create_app(
+    context_path: str = "",
+    product_index: Optional[ProductIndexConfig] = None,
+    order_number: Optional[OrderNumberConfig] = None,
+) -> FastAPI:
     """Create and configure the FastAPI application."""
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        order_number_service.configure(order_number or OrderNumberConfig())
+        if product_index is not None and product_index.enabled:
+            product_service.start_search_index(product_index.refresh_interval)
+        try:
+            category_service.load_category_tree()
+        except Exception as e:
+            # Not fatal: the tree is loaded on first use instead
+            logger.warning("Category tree preload failed: %s", e)
+        try:
+            yield
+        finally:
+            product_service.stop_search_index()
+            vendor_service.vendor_directory.clear()
+            category_service.category_tree.clear()
+
     app = FastAPI(
         title="ERP API",
         description="ERP System REST API (Python)",
         version="1.0.0",
         root_path=context_path,
+        lifespan=lifespan,
     )
 
     app.include_router(product.router)
@@ -19,6 +52,7 @@ def create_app(context_path: str = "") -> FastAPI:
     app.include_router(order.router)
     app.include_router(order_conversion.router)
     app.include_router(vendor.router)
+    app.include_router(picture.router)
     app.include_router(docs.router)
 
     return app
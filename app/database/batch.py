@@ -0,0 +1,53 @@
+"""Helpers for splitting set-based statements under SQL Server's parameter limit."""
+
+from typing import Iterator, Sequence, TypeVar
+
+T = TypeVar("T")
+
+# SQL Server rejects a statement with more than 2100 parameters. Keep some
+# headroom for the fixed parameters a statement carries next to its list.
+MAX_PARAMS = 2000
+
+
+def chunked(items: Sequence[T], size: int) -> Iterator[Sequence[T]]:
+    """Yield consecutive slices of ``items`` with at most ``size`` elements."""
+    if size < 1:
+        raise ValueError("Chunk size must be at least 1")
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def placeholders(count: int) -> str:
+    """Return ``count`` comma-separated ``%s`` placeholders for an IN list."""
+    return ",".join(["%s"] * count)
+
+
+# SQL Server accepts at most 1000 row value expressions in one VALUES list
+MAX_VALUES_ROWS = 1000
+
+
+def insert_many(cursor, table: str, columns: Sequence[str], rows: Sequence[Sequence]) -> None:
+    """Insert rows with multi-row INSERT ... VALUES (...), (...) statements.
+
+    Each statement carries as many rows as fit under MAX_PARAMS and
+    MAX_VALUES_ROWS, so large inserts take a handful of round trips.
+
+    Args:
+        cursor: Open cursor (typically from db_manager.cursor())
+        table: Target table name, e.g. "dbo.Orders_Items"
+        columns: Column names, in the order of each row's values
+        rows: Row value tuples
+    """
+    if not rows:
+        return
+
+    per_row = len(columns)
+    batch_size = max(1, min(MAX_VALUES_ROWS, MAX_PARAMS // per_row))
+    row_sql = f"({placeholders(per_row)})"
+    column_list = ", ".join(columns)
+
+    for chunk in chunked(rows, batch_size):
+        cursor.execute(
+            f"INSERT INTO {table} ({column_list}) VALUES {', '.join([row_sql] * len(chunk))}",
+            tuple(value for row in chunk for value in row),
+        )
@@ -1,7 +1,7 @@
 import json
 import os
 import re
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional
 
 
@@ -17,11 +17,42 @@ class DatabaseServerInfo:
     driver: str
 
 
+@dataclass
+class PoolConfig:
+    """Connection pool sizing and lifetime settings."""
+
+    min_size: int = 1
+    max_size: int = 10
+    checkout_timeout: float = 30.0  # seconds to wait for a free connection
+    idle_timeout: float = 300.0  # close idle connections above min_size after this many seconds
+    validate_after: float = 30.0  # ping connections that sat idle longer than this before reuse
+
+
+@dataclass
+class ProductIndexConfig:
+    """In-process product search index settings."""
+
+    enabled: bool = False
+    refresh_interval: float = 60.0  # seconds between incremental refreshes
+
+
+@dataclass
+class OrderNumberConfig:
+    """Order number allocation settings."""
+
+    # Sequence numbers reserved per database round trip. Keep at 1 while the
+    # desktop client (MAX(OrderNumber) + 1) writes to the same OrderSources.
+    block_size: int = 1
+
+
 @dataclass
 class AppConfig:
     port: int = 8080
     context_path: str = ""
     selected_db_index: int = 1
+    pool: PoolConfig = field(default_factory=PoolConfig)
+    product_index: ProductIndexConfig = field(default_factory=ProductIndexConfig)
+    order_number: OrderNumberConfig = field(default_factory=OrderNumberConfig)
 
 
 def _get_conf_dir() -> str:
@@ -80,10 +111,36 @@ def load_app_config(config_path: Optional[str] = None) -> AppConfig:
     with open(config_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
+    pool_data = data.get("pool", {})
+    defaults = PoolConfig()
+    pool = PoolConfig(
+        min_size=pool_data.get("min_size", defaults.min_size),
+        max_size=pool_data.get("max_size", defaults.max_size),
+        checkout_timeout=pool_data.get("checkout_timeout", defaults.checkout_timeout),
+        idle_timeout=pool_data.get("idle_timeout", defaults.idle_timeout),
+        validate_after=pool_data.get("validate_after", defaults.validate_after),
+    )
+
+    index_data = data.get("product_index", {})
+    index_defaults = ProductIndexConfig()
+    product_index = ProductIndexConfig(
+        enabled=index_data.get("enabled", index_defaults.enabled),
+        refresh_interval=index_data.get("refresh_interval", index_defaults.refresh_interval),
+    )
+
+    order_number_data = data.get("order_number", {})
+    order_number_defaults = OrderNumberConfig()
+    order_number = OrderNumberConfig(
+        block_size=order_number_data.get("block_size", order_number_defaults.block_size),
+    )
+
     return AppConfig(
         port=data.get("port", 8080),
         context_path=data.get("context_path", ""),
         selected_db_index=data.get("selected_db_index", 1),
+        pool=pool,
+        product_index=product_index,
+        order_number=order_number,
     )
 
 
@@ -96,6 +153,20 @@ def save_app_config(config: AppConfig, config_path: Optional[str] = None) -> Non
         "port": config.port,
         "context_path": config.context_path,
         "selected_db_index": config.selected_db_index,
+        "pool": {
+            "min_size": config.pool.min_size,
+            "max_size": config.pool.max_size,
+            "checkout_timeout": config.pool.checkout_timeout,
+            "idle_timeout": config.pool.idle_timeout,
+            "validate_after": config.pool.validate_after,
+        },
+        "product_index": {
+            "enabled": config.product_index.enabled,
+            "refresh_interval": config.product_index.refresh_interval,
+        },
+        "order_number": {
+            "block_size": config.order_number.block_size,
+        },
     }
 
     with open(config_path, "w", encoding="utf-8") as f:
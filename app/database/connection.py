@@ -1,63 +1,318 @@
+import logging
 import threading
+import time
+from collections import deque
 from contextlib import contextmanager
-from typing import Optional
+from contextvars import ContextVar
+from typing import Callable, Optional
 
 import pymssql
 
-from app.database.config import DatabaseServerInfo
+from app.database.config import DatabaseServerInfo, PoolConfig
+
+logger = logging.getLogger(__name__)
+
+# Connection held by the outermost transaction()/cursor() of the current
+# thread/task, so nested blocks reuse it instead of checking out a second one
+# (which would deadlock on the outer block's uncommitted rows).
+_active_connection: ContextVar[Optional[pymssql.Connection]] = ContextVar("_active_connection", default=None)
+# Callbacks registered with after_commit() for the outermost transaction
+_after_commit_callbacks: ContextVar[Optional[list[Callable[[], None]]]] = ContextVar(
+    "_after_commit_callbacks", default=None
+)
+# Callbacks registered with after_rollback() for the outermost transaction
+_after_rollback_callbacks: ContextVar[Optional[list[Callable[[], None]]]] = ContextVar(
+    "_after_rollback_callbacks", default=None
+)
+
+
+class PoolTimeoutError(RuntimeError):
+    """Raised when no pooled connection becomes available in time."""
+
+
+class ConnectionPool:
+    """Bounded pool of pymssql connections.
+
+    Connections are created lazily up to ``max_size``. Idle connections above
+    ``min_size`` are closed once they have been idle for ``idle_timeout``
+    seconds, and a connection that sat idle longer than ``validate_after``
+    seconds is pinged before being handed out again.
+    """
+
+    def __init__(self, server_info: DatabaseServerInfo, config: PoolConfig):
+        if config.max_size < 1:
+            raise ValueError("Pool max_size must be at least 1")
+        self._server_info = server_info
+        self._config = config
+        self._cond = threading.Condition()
+        self._idle: deque[tuple[pymssql.Connection, float]] = deque()
+        self._size = 0
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        """Number of open connections (idle + checked out)."""
+        return self._size
+
+    @property
+    def idle_count(self) -> int:
+        return len(self._idle)
+
+    def _create_connection(self) -> pymssql.Connection:
+        info = self._server_info
+        return pymssql.connect(
+            server=info.host,
+            port=info.port,
+            user=info.user,
+            password=info.password,
+            database=info.database,
+            charset="utf8",
+            as_dict=True,
+        )
+
+    @staticmethod
+    def _close_quietly(conn: pymssql.Connection) -> None:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _evict_idle(self, now: float) -> list[pymssql.Connection]:
+        """Pop connections idle past idle_timeout, keeping min_size open. Caller holds the lock."""
+        evicted = []
+        # Oldest idle connections sit at the left end of the deque
+        while self._idle and self._size > self._config.min_size:
+            conn, last_used = self._idle[0]
+            if now - last_used < self._config.idle_timeout:
+                break
+            self._idle.popleft()
+            self._size -= 1
+            evicted.append(conn)
+        return evicted
+
+    def _is_alive(self, conn: pymssql.Connection, idle_for: float) -> bool:
+        if getattr(conn, "_conn", None) is None:
+            return False
+        if idle_for < self._config.validate_after:
+            return True
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            return True
+        except Exception as e:
+            logger.warning("Discarding dead pooled connection: %s", e)
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> pymssql.Connection:
+        """Check out a connection, waiting up to ``timeout`` seconds for one to free up."""
+        if timeout is None:
+            timeout = self._config.checkout_timeout
+        deadline = time.monotonic() + timeout
+
+        while True:
+            conn = None
+            idle_for = 0.0
+            create = False
+            evicted: list[pymssql.Connection] = []
+            try:
+                with self._cond:
+                    while True:
+                        if self._closed:
+                            raise RuntimeError("Connection pool is closed")
+                        now = time.monotonic()
+                        evicted.extend(self._evict_idle(now))
+                        if self._idle:
+                            # Reuse the most recently returned connection (warmest)
+                            conn, last_used = self._idle.pop()
+                            idle_for = now - last_used
+                            break
+                        if self._size < self._config.max_size:
+                            self._size += 1
+                            create = True
+                            break
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise PoolTimeoutError(
+                                f"Timed out after {timeout:.1f}s waiting for a database connection "
+                                f"(pool size {self._config.max_size})"
+                            )
+                        self._cond.wait(remaining)
+            finally:
+                for stale in evicted:
+                    self._close_quietly(stale)
+
+            if create:
+                try:
+                    return self._create_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+
+            if self._is_alive(conn, idle_for):
+                return conn
+
+            # Dead connection: drop it and try again
+            self._close_quietly(conn)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+
+    def release(self, conn: pymssql.Connection, discard: bool = False) -> None:
+        """Return a checked-out connection. ``discard`` closes it instead of pooling it."""
+        with self._cond:
+            if discard or self._closed or getattr(conn, "_conn", None) is None:
+                self._size -= 1
+                self._cond.notify()
+                close = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+                close = False
+        if close:
+            self._close_quietly(conn)
+
+    def close(self) -> None:
+        """Close all idle connections; checked-out ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._close_quietly(conn)
 
 
 class DatabaseManager:
-    """Thread-safe database connection manager using pymssql."""
+    """Thread-safe database access through a bounded connection pool."""
 
     def __init__(self):
         self._lock = threading.Lock()
         self._server_info: Optional[DatabaseServerInfo] = None
-        self._connection: Optional[pymssql.Connection] = None
+        self._pool_config = PoolConfig()
+        self._pool: Optional[ConnectionPool] = None
 
-    def configure(self, server_info: DatabaseServerInfo) -> None:
+    def configure(self, server_info: DatabaseServerInfo, pool_config: Optional[PoolConfig] = None) -> None:
         """Set the active database server configuration."""
         with self._lock:
-            self.close()
+            self._close_pool()
             self._server_info = server_info
+            if pool_config is not None:
+                self._pool_config = pool_config
 
     @property
     def server_info(self) -> Optional[DatabaseServerInfo]:
         return self._server_info
 
-    def _create_connection(self) -> pymssql.Connection:
-        if self._server_info is None:
-            raise RuntimeError("Database not configured. Call configure() first.")
-        return pymssql.connect(
-            server=self._server_info.host,
-            port=self._server_info.port,
-            user=self._server_info.user,
-            password=self._server_info.password,
-            database=self._server_info.database,
-            charset="utf8",
-            as_dict=True,
-        )
-
-    def get_connection(self) -> pymssql.Connection:
-        """Get or create the singleton connection."""
+    @property
+    def pool(self) -> ConnectionPool:
+        """The active connection pool, created on first use."""
         with self._lock:
-            if self._connection is None or self._connection._conn is None:
-                self._connection = self._create_connection()
-            return self._connection
+            if self._server_info is None:
+                raise RuntimeError("Database not configured. Call configure() first.")
+            if self._pool is None:
+                self._pool = ConnectionPool(self._server_info, self._pool_config)
+            return self._pool
 
     @contextmanager
-    def cursor(self):
-        """Context manager that provides a cursor with auto-commit."""
-        conn = self.get_connection()
-        cursor = conn.cursor(as_dict=True)
+    def connection(self):
+        """Context manager that checks out a pooled connection and returns it afterwards."""
+        pool = self.pool
+        conn = pool.acquire()
+        discard = False
         try:
-            yield cursor
-            conn.commit()
-        except Exception:
-            conn.rollback()
+            yield conn
+        except pymssql.OperationalError:
+            # Broken socket or server-side disconnect: don't hand it out again
+            discard = True
             raise
         finally:
-            cursor.close()
+            pool.release(conn, discard=discard)
+
+    @property
+    def in_transaction(self) -> bool:
+        """True when the current thread/task is inside a transaction() or cursor() block."""
+        return _active_connection.get() is not None
+
+    @contextmanager
+    def transaction(self, independent: bool = False):
+        """Unit of work: every cursor() opened inside joins one connection and commits once at the end.
+
+        Nested transaction() blocks join the enclosing unit of work; any
+        exception rolls the whole unit back. ``independent=True`` always
+        checks out a separate connection and commits on its own, even inside
+        another unit of work.
+        """
+        if not independent and _active_connection.get() is not None:
+            yield
+            return
+
+        callbacks: list[Callable[[], None]] = []
+        rollback_callbacks: list[Callable[[], None]] = []
+        try:
+            with self.connection() as conn:
+                token = _active_connection.set(conn)
+                callbacks_token = _after_commit_callbacks.set(callbacks)
+                rollback_token = _after_rollback_callbacks.set(rollback_callbacks)
+                try:
+                    yield
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    _after_rollback_callbacks.reset(rollback_token)
+                    _after_commit_callbacks.reset(callbacks_token)
+                    _active_connection.reset(token)
+        except Exception:
+            self._run_callbacks(rollback_callbacks)
+            raise
+
+        self._run_callbacks(callbacks)
+
+    def after_commit(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` once the current unit of work commits, or right away outside one.
+
+        Callbacks of a unit of work that rolls back are dropped.
+        """
+        callbacks = _after_commit_callbacks.get()
+        if callbacks is None:
+            self._run_callbacks([callback])
+        else:
+            callbacks.append(callback)
+
+    def after_rollback(self, callback: Callable[[], None]) -> None:
+        """Run ``callback`` if the current unit of work rolls back; dropped outside one."""
+        callbacks = _after_rollback_callbacks.get()
+        if callbacks is not None:
+            callbacks.append(callback)
+
+    @staticmethod
+    def _run_callbacks(callbacks: list[Callable[[], None]]) -> None:
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.error("Transaction callback failed: %s", e, exc_info=True)
+
+    @contextmanager
+    def cursor(self, independent: bool = False):
+        """Context manager that provides a cursor with auto-commit.
+
+        Outside a transaction() the cursor gets its own pooled connection and
+        commits on exit; inside one it joins the active unit of work unless
+        ``independent`` is set.
+        """
+        with self.transaction(independent=independent):
+            cursor = _active_connection.get().cursor(as_dict=True)
+            try:
+                yield cursor
+            finally:
+                cursor.close()
 
     def test_connection(self, server_info: Optional[DatabaseServerInfo] = None) -> tuple[bool, str]:
         """Test a database connection. Returns (success, message)."""
@@ -82,14 +337,15 @@ class DatabaseManager:
         except Exception as e:
             return False, str(e)
 
+    def _close_pool(self) -> None:
+        if self._pool is not None:
+            self._pool.close()
+            self._pool = None
+
     def close(self) -> None:
-        """Close the current connection."""
-        if self._connection is not None:
-            try:
-                self._connection.close()
-            except Exception:
-                pass
-            self._connection = None
+        """Close all pooled connections."""
+        with self._lock:
+            self._close_pool()
 
 
 # Global singleton
@@ -1,9 +1,7 @@
 import time
 from datetime import datetime
 
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.requests import Request
-from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 from utils.log_manager import LogEntry, log_manager
 
@@ -11,61 +9,71 @@ from utils.log_manager import LogEntry, log_manager
 MAX_BODY_LOG_SIZE = 4096
 
 
-class LoggingMiddleware(BaseHTTPMiddleware):
-    """Middleware that intercepts requests/responses and pushes log entries to LogManager."""
+def _tee(buffer: bytearray, chunk: bytes) -> None:
+    """Append the part of ``chunk`` that still fits in the log buffer."""
+    room = MAX_BODY_LOG_SIZE - len(buffer)
+    if room > 0 and chunk:
+        buffer += chunk[:room]
+
+
+def _decode(buffer: bytearray):
+    if not buffer:
+        return None
+    return buffer.decode("utf-8", errors="replace")
+
+
+class LoggingMiddleware:
+    """Pure ASGI middleware that pushes a log entry per HTTP request to LogManager.
+
+    Request and response bodies stream through untouched; only the first
+    MAX_BODY_LOG_SIZE bytes of each are copied for the log, so memory per
+    request stays constant and streaming responses keep streaming.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
 
-    async def dispatch(self, request: Request, call_next):
         start_time = time.perf_counter()
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
 
-        # Capture request body
-        request_body = None
-        if request.method in ("POST", "PUT", "PATCH"):
-            try:
-                body_bytes = await request.body()
-                if body_bytes:
-                    text = body_bytes.decode("utf-8", errors="replace")
-                    request_body = text[:MAX_BODY_LOG_SIZE]
-            except Exception:
-                request_body = "<unable to read body>"
-
-        # Call the actual endpoint
-        response: Response = await call_next(request)
-
-        # Capture response body
-        response_body = None
-        response_body_bytes = b""
-        async for chunk in response.body_iterator:
-            if isinstance(chunk, str):
-                response_body_bytes += chunk.encode("utf-8")
-            else:
-                response_body_bytes += chunk
-
-        if response_body_bytes:
-            text = response_body_bytes.decode("utf-8", errors="replace")
-            response_body = text[:MAX_BODY_LOG_SIZE]
-
-        # Rebuild response with captured body
-        from starlette.responses import Response as StarletteResponse
-        new_response = StarletteResponse(
-            content=response_body_bytes,
-            status_code=response.status_code,
-            headers=dict(response.headers),
-            media_type=response.media_type,
-        )
-
-        duration_ms = (time.perf_counter() - start_time) * 1000
-
-        # Push log entry
-        entry = LogEntry(
-            timestamp=timestamp,
-            method=request.method,
-            path=str(request.url.path),
-            status_code=response.status_code,
-            duration_ms=round(duration_ms, 2),
-            request_body=request_body,
-            response_body=response_body,
-        )
-        log_manager.push(entry)
-
-        return new_response
+        method = scope["method"]
+        capture_request = method in ("POST", "PUT", "PATCH")
+        request_buffer = bytearray()
+        response_buffer = bytearray()
+        status_code = 500
+
+        async def receive_and_capture() -> Message:
+            message = await receive()
+            if capture_request and message["type"] == "http.request":
+                _tee(request_buffer, message.get("body", b""))
+            return message
+
+        async def send_and_capture(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                _tee(response_buffer, message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive_and_capture, send_and_capture)
+        finally:
+            duration_ms = (time.perf_counter() - start_time) * 1000
+
+            # Push log entry
+            entry = LogEntry(
+                timestamp=timestamp,
+                method=method,
+                path=scope["path"],
+                status_code=status_code,
+                duration_ms=round(duration_ms, 2),
+                request_body=_decode(request_buffer),
+                response_body=_decode(response_buffer),
+            )
+            log_manager.push(entry)
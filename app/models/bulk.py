@@ -0,0 +1,79 @@
+"""Parsing for bulk endpoints that accept a JSON array or NDJSON body."""
+
+import json
+from typing import Optional, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+M = TypeVar("M", bound=BaseModel)
+
+# Upper bound on rows accepted by one bulk request
+MAX_BULK_ROWS = 20000
+
+
+def _validation_message(e: ValidationError) -> str:
+    parts = []
+    for error in e.errors():
+        location = ".".join(str(item) for item in error["loc"])
+        parts.append(f"{location}: {error['msg']}" if location else error["msg"])
+    return "; ".join(parts)
+
+
+def parse_bulk_rows(body: bytes, model: type[M]) -> list[tuple[Optional[M], Optional[str]]]:
+    """Parse a JSON array or NDJSON body into one entry per row.
+
+    A body starting with ``[`` is read as a JSON array; anything else as
+    NDJSON, one object per non-blank line. A row that cannot be parsed or
+    validated does not fail the request: its entry is ``(None, message)``
+    so the caller can report it next to the rows that succeeded.
+
+    Args:
+        body: Raw request body (UTF-8)
+        model: Row model to validate each object against
+
+    Returns:
+        ``(row, None)`` or ``(None, error message)`` per row, in input order
+
+    Raises:
+        ValueError: If the body is empty, not UTF-8, a malformed JSON
+            array, or has more than MAX_BULK_ROWS rows
+    """
+    try:
+        text = body.decode("utf-8-sig").strip()
+    except UnicodeDecodeError:
+        raise ValueError("請求內容必須為 UTF-8 編碼")
+    if not text:
+        raise ValueError("請求內容不能為空")
+
+    if text.startswith("["):
+        try:
+            items = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"JSON 格式錯誤：{e}")
+        raw_rows = [(item, None) for item in items]
+    else:
+        raw_rows = []
+        for line in text.splitlines():
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                raw_rows.append((json.loads(line), None))
+            except json.JSONDecodeError as e:
+                raw_rows.append((None, f"JSON 格式錯誤：{e}"))
+
+    if len(raw_rows) > MAX_BULK_ROWS:
+        raise ValueError(f"單次最多 {MAX_BULK_ROWS} 筆資料")
+
+    rows: list[tuple[Optional[M], Optional[str]]] = []
+    for item, error in raw_rows:
+        if error is not None:
+            rows.append((None, error))
+        elif not isinstance(item, dict):
+            rows.append((None, "每筆資料必須為 JSON 物件"))
+        else:
+            try:
+                rows.append((model.model_validate(item), None))
+            except ValidationError as e:
+                rows.append((None, _validation_message(e)))
+    return rows
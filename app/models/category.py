@@ -58,3 +58,49 @@ class DeleteCategoryResponse(BaseModel):
     success: bool = False
     message: str = ""
     error: Optional[ErrorInfo] = None
+
+
+class CategoryTreeNode(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    category_id: str = Field(alias="categoryId")
+    category_name: str = Field(alias="categoryName")
+    level: int = Field(alias="level")
+    parent_id: Optional[str] = Field(default=None, alias="parentId")
+    product_count: Optional[int] = Field(default=None, alias="productCount")
+    children: list["CategoryTreeNode"] = Field(default_factory=list, alias="children")
+
+
+class CategoryTreeResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    data: Optional[list[CategoryTreeNode]] = None
+    total: int = 0
+    error: Optional[ErrorInfo] = None
+
+
+class CategoryImportNode(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    category_name: str = Field(alias="categoryName")
+    children: list["CategoryImportNode"] = Field(default_factory=list, alias="children")
+
+
+class CategoryImportRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    # 大類別（level=1），子節點依序為中類別、小類別
+    categories: list[CategoryImportNode] = Field(alias="categories")
+
+
+class CategoryImportResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    data: Optional[list[CategoryData]] = None
+    created: int = 0
+    existing: int = 0
+    error: Optional[ErrorInfo] = None
@@ -0,0 +1,38 @@
+"""Sparse fieldset parsing for ``fields=`` request parameters."""
+
+from typing import Iterable, Optional, Union
+
+from pydantic import BaseModel
+
+
+def parse_fieldset(model: type[BaseModel], fields: Union[str, Iterable[str], None]) -> Optional[set[str]]:
+    """Resolve requested fields (JSON aliases or field names) to model field names.
+
+    Args:
+        model: DTO class the fields belong to
+        fields: Comma-separated string or list of names; None or empty means all fields
+
+    Returns:
+        Set of model field names, or None when no fieldset was requested
+
+    Raises:
+        ValueError: If a name is not a field of the model
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    requested = [name.strip() for name in fields if name and name.strip()]
+    if not requested:
+        return None
+
+    by_name = {}
+    for name, info in model.model_fields.items():
+        by_name[name] = name
+        if info.alias:
+            by_name[info.alias] = name
+
+    unknown = [name for name in requested if name not in by_name]
+    if unknown:
+        raise ValueError(f"未知的欄位：{', '.join(unknown)}")
+    return {by_name[name] for name in requested}
@@ -78,6 +78,18 @@ class OrderListRequest(BaseModel):
     status: Optional[int] = Field(default=None, alias="status")
     page: Optional[int] = Field(default=1, alias="page")
     page_size: Optional[int] = Field(default=20, alias="pageSize")
+    cursor: Optional[str] = Field(default=None, alias="cursor")
+    include_total: Optional[bool] = Field(default=True, alias="includeTotal")
+    fields: Optional[list[str]] = Field(default=None, alias="fields")
+
+
+class OrderBatchRequest(BaseModel):
+    """Request for loading several orders by id."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    ids: list[int] = Field(default_factory=list, alias="ids")
+    fields: Optional[list[str]] = Field(default=None, alias="fields")
 
 
 class OrderTraceabilityDTO(BaseModel):
@@ -90,6 +102,32 @@ class OrderTraceabilityDTO(BaseModel):
     derived_orders: Optional[list[OrderDTO]] = Field(default=None, alias="derivedOrders")
 
 
+class OrderLineageNodeDTO(OrderDTO):
+    """Order in a lineage graph, with its hop distance from the root order."""
+
+    depth: int = Field(default=0, alias="depth")
+
+
+class OrderLineageEdgeDTO(BaseModel):
+    """Orders_Reference link: order_id was derived from order_reference_id."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    order_id: int = Field(alias="orderId")
+    order_reference_id: int = Field(alias="orderReferenceId")
+
+
+class OrderLineageDTO(BaseModel):
+    """Connected order graph around a root order."""
+
+    model_config = ConfigDict(populate_by_name=True)
+
+    root_order_id: int = Field(alias="rootOrderId")
+    nodes: list[OrderLineageNodeDTO] = Field(default_factory=list, alias="nodes")
+    edges: list[OrderLineageEdgeDTO] = Field(default_factory=list, alias="edges")
+    truncated: bool = Field(default=False, alias="truncated")
+
+
 class ErrorInfo(BaseModel):
     """Error information."""
 
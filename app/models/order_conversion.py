@@ -82,6 +82,7 @@ class ConversionResultDTO(BaseModel):
     auto_purchase_orders: Optional[list[AutoPurchaseOrderInfo]] = Field(
         default=None, alias="autoPurchaseOrders"
     )
+    unmatched_isbns: Optional[list[str]] = Field(default=None, alias="unmatchedIsbns")
 
 
 class ConversionResponse(BaseModel):
@@ -0,0 +1,19 @@
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
+
+
+class ErrorInfo(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    code: str = ""
+    details: str = ""
+
+
+class PictureErrorResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    error: Optional[ErrorInfo] = None
+
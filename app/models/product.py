@@ -41,4 +41,5 @@ class ProductListResponse(BaseModel):
     message: str = ""
     data: Optional[list[ProductDTO]] = None
     total: int = 0
+    next_cursor: Optional[int] = Field(default=None, alias="nextCursor")
     error: Optional[ErrorInfo] = None
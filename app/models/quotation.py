@@ -180,3 +180,13 @@ class QuotationListResponse(BaseModel):
     data: Optional[list[QuotationListDTO]] = None
     total: int = 0
     error: Optional[ErrorInfo] = None
+
+
+class PictureUploadResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    # "sha256:<hash>" references of the uploaded pictures, in upload order
+    data: Optional[list[str]] = None
+    error: Optional[ErrorInfo] = None
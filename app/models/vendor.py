@@ -175,3 +175,26 @@ class VendorListResponse(BaseModel):
     data: Optional[list[VendorDTO]] = None
     total: int = 0
     error: Optional[ErrorInfo] = None
+
+
+class BulkVendorResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    row: int = Field(alias="row")
+    vendor_code: Optional[str] = Field(default=None, alias="vendorCode")
+    vendor_id: Optional[int] = Field(default=None, alias="vendorId")
+    # created / updated / error
+    status: str = Field(alias="status")
+    message: Optional[str] = Field(default=None, alias="message")
+
+
+class BulkVendorResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    data: Optional[list[BulkVendorResult]] = None
+    created: int = 0
+    updated: int = 0
+    failed: int = 0
+    error: Optional[ErrorInfo] = None
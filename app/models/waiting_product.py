@@ -68,9 +68,14 @@ class WaitingProductDTO(BaseModel):
     update_date: Optional[str] = Field(default=None, alias="updateDate")
     status: Optional[str] = Field(default=None, alias="status")
 
+    # Without includePictures only "sha256:<hash>" references are returned here;
+    # hasPicture1..3 tell whether a slot holds a picture at all
     picture1: Optional[str] = Field(default=None, alias="picture1")
     picture2: Optional[str] = Field(default=None, alias="picture2")
     picture3: Optional[str] = Field(default=None, alias="picture3")
+    has_picture1: Optional[bool] = Field(default=None, alias="hasPicture1")
+    has_picture2: Optional[bool] = Field(default=None, alias="hasPicture2")
+    has_picture3: Optional[bool] = Field(default=None, alias="hasPicture3")
 
 
 class ErrorInfo(BaseModel):
@@ -104,3 +109,72 @@ class WaitingProductListResponse(BaseModel):
     data: Optional[list[WaitingProductDTO]] = None
     total: int = 0
     error: Optional[ErrorInfo] = None
+
+
+class PictureUploadResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    # "sha256:<hash>" references of the uploaded pictures, in upload order
+    data: Optional[list[str]] = None
+    error: Optional[ErrorInfo] = None
+
+
+class WaitingProductPictureResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    error: Optional[ErrorInfo] = None
+
+
+class BulkWaitingProductResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    row: int = Field(alias="row")
+    product_code: Optional[str] = Field(default=None, alias="productCode")
+    # created / error
+    status: str = Field(alias="status")
+    message: Optional[str] = Field(default=None, alias="message")
+
+
+class BulkWaitingProductResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    data: Optional[list[BulkWaitingProductResult]] = None
+    created: int = 0
+    failed: int = 0
+    error: Optional[ErrorInfo] = None
+
+
+class PromoteWaitingProductRequest(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    # 二擇一：依狀態（新增/更新）或指定商品碼
+    status: Optional[str] = Field(default=None, alias="status")
+    product_codes: Optional[list[str]] = Field(default=None, alias="productCodes")
+
+
+class PromotedProductResult(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    product_code: str = Field(alias="productCode")
+    store_id: Optional[int] = Field(default=None, alias="storeId")
+    # created / updated / skipped
+    status: str = Field(alias="status")
+    message: Optional[str] = Field(default=None, alias="message")
+
+
+class PromoteWaitingProductResponse(BaseModel):
+    model_config = ConfigDict(populate_by_name=True)
+
+    success: bool = False
+    message: str = ""
+    data: Optional[list[PromotedProductResult]] = None
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    error: Optional[ErrorInfo] = None
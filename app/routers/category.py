@@ -1,10 +1,13 @@
 import logging
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.models.category import (
     CategoryData,
+    CategoryImportRequest,
+    CategoryImportResponse,
+    CategoryTreeResponse,
     CreateCategoryRequest,
     CreateCategoryResponse,
     DeleteCategoryResponse,
@@ -142,6 +145,74 @@ def delete_category(category_id: str):
         )
 
 
+@router.post("/import")
+def import_categories(request: CategoryImportRequest):
+    try:
+        created, existing = category_service.import_categories(request)
+
+        response = CategoryImportResponse(
+            success=True,
+            message=f"分類匯入成功：新增 {len(created)} 筆，已存在 {existing} 筆",
+            data=created,
+            created=len(created),
+            existing=existing,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = CategoryImportResponse(
+            success=False,
+            message=f"匯入失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Category import failed: %s", e, exc_info=True)
+        response = CategoryImportResponse(
+            success=False,
+            message="匯入失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
+@router.get("/tree")
+def get_category_tree(includeCounts: bool = Query(default=False)):
+    try:
+        roots, total = category_service.get_category_tree(include_counts=includeCounts)
+
+        response = CategoryTreeResponse(
+            success=True,
+            message="查詢成功",
+            data=roots,
+            total=total,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except Exception as e:
+        logger.error("Category tree query failed: %s", e, exc_info=True)
+        response = CategoryTreeResponse(
+            success=False,
+            message="查詢失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/health", response_class=PlainTextResponse)
 def health():
     return "OK"
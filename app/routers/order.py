@@ -1,11 +1,16 @@
 """Order query endpoints."""
 
 import logging
+from typing import Optional
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Query
 from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.models.fieldset import parse_fieldset
 from app.models.order import (
+    OrderBatchRequest,
+    OrderDTO,
+    OrderDetailDTO,
     OrderListRequest,
     OrderResponse,
     ErrorInfo,
@@ -23,10 +28,76 @@ def health():
     return "OK"
 
 
+@router.get("/cache/stats")
+def get_cache_stats():
+    """Order cache hit/miss/eviction counters."""
+    return JSONResponse(
+        content={
+            "success": True,
+            "message": "查詢成功",
+            "data": order_service.order_cache.stats(),
+        }
+    )
+
+
+def _detail_to_dict(detail: OrderDetailDTO, fields: Optional[set[str]] = None) -> dict:
+    return {
+        "order": detail.order.model_dump(by_alias=True, exclude_none=True, include=fields) if detail.order else None,
+        "items": [item.model_dump(by_alias=True, exclude_none=True) for item in detail.items] if detail.items else [],
+        "references": [ref.model_dump(by_alias=True, exclude_none=True) for ref in detail.references] if detail.references else [],
+    }
+
+
+@router.post("/batch")
+def get_orders_batch(request: OrderBatchRequest):
+    """Get details of several orders by ID."""
+    try:
+        fields = parse_fieldset(OrderDTO, request.fields)
+        details, missing_ids = order_service.get_order_details(request.ids)
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "查詢成功",
+                "data": {
+                    "orders": [_detail_to_dict(detail, fields) for detail in details],
+                    "missingIds": missing_ids,
+                },
+            }
+        )
+
+    except ValueError as e:
+        response = OrderResponse(
+            success=False,
+            message=f"查詢失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Failed to get order batch: %s", e, exc_info=True)
+        response = OrderResponse(
+            success=False,
+            message="查詢失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/{order_id}")
-def get_order(order_id: int):
-    """Get order details by ID."""
+def get_order(order_id: int, fields: Optional[str] = Query(default=None)):
+    """Get order details by ID.
+
+    ``fields`` is a comma-separated list of order fields to return, e.g. orderNumber,orderDate.
+    """
     try:
+        order_fields = parse_fieldset(OrderDTO, fields)
         detail = order_service.get_order_detail(order_id)
 
         if not detail:
@@ -44,14 +115,21 @@ def get_order(order_id: int):
             content={
                 "success": True,
                 "message": "查詢成功",
-                "data": {
-                    "order": detail.order.model_dump(by_alias=True, exclude_none=True) if detail.order else None,
-                    "items": [item.model_dump(by_alias=True, exclude_none=True) for item in detail.items] if detail.items else [],
-                    "references": [ref.model_dump(by_alias=True, exclude_none=True) for ref in detail.references] if detail.references else [],
-                },
+                "data": _detail_to_dict(detail, order_fields),
             }
         )
 
+    except ValueError as e:
+        response = OrderResponse(
+            success=False,
+            message=f"查詢失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
     except Exception as e:
         logger.error("Failed to get order %d: %s", order_id, e, exc_info=True)
         response = OrderResponse(
@@ -69,7 +147,8 @@ def get_order(order_id: int):
 def list_orders(request: OrderListRequest):
     """List orders with filtering."""
     try:
-        orders, total = order_service.list_orders(
+        fields = parse_fieldset(OrderDTO, request.fields)
+        orders, total, next_cursor = order_service.list_orders(
             order_source=request.order_source,
             object_id=request.object_id,
             start_date=request.start_date,
@@ -77,21 +156,40 @@ def list_orders(request: OrderListRequest):
             status=request.status,
             page=request.page or 1,
             page_size=request.page_size or 20,
+            cursor=request.cursor,
+            include_total=request.include_total is not False,
+            fields=fields,
         )
 
+        data = {
+            "orders": [order.model_dump(by_alias=True, exclude_none=True, include=fields) for order in orders],
+            "page": request.page or 1,
+            "pageSize": request.page_size or 20,
+        }
+        if total is not None:
+            data["total"] = total
+        if next_cursor is not None:
+            data["nextCursor"] = next_cursor
+
         return JSONResponse(
             content={
                 "success": True,
                 "message": "查詢成功",
-                "data": {
-                    "orders": [order.model_dump(by_alias=True, exclude_none=True) for order in orders],
-                    "total": total,
-                    "page": request.page or 1,
-                    "pageSize": request.page_size or 20,
-                },
+                "data": data,
             }
         )
 
+    except ValueError as e:
+        response = OrderResponse(
+            success=False,
+            message=f"查詢失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
     except Exception as e:
         logger.error("Failed to list orders: %s", e, exc_info=True)
         response = OrderResponse(
@@ -106,8 +204,20 @@ def list_orders(request: OrderListRequest):
 
 
 @router.get("/{order_id}/traceability")
-def get_order_traceability(order_id: int):
-    """Get order traceability chain."""
+def get_order_traceability(
+    order_id: int,
+    full: bool = Query(default=False),
+    depth: Optional[int] = Query(default=None, ge=1, le=order_service.MAX_LINEAGE_DEPTH),
+    limit: int = Query(default=order_service.DEFAULT_LINEAGE_NODE_LIMIT, ge=1, le=order_service.MAX_LINEAGE_NODE_LIMIT),
+):
+    """Get order traceability chain.
+
+    By default returns the direct source and derived orders. ``full=true``
+    or ``depth`` returns the connected order graph (nodes and edges) instead.
+    """
+    if full or depth is not None:
+        return _get_order_lineage(order_id, depth or order_service.MAX_LINEAGE_DEPTH, limit)
+
     try:
         traceability = order_service.get_order_traceability(order_id)
 
@@ -145,3 +255,39 @@ def get_order_traceability(order_id: int):
             status_code=500,
             content=response.model_dump(by_alias=True, exclude_none=True),
         )
+
+
+def _get_order_lineage(order_id: int, depth: int, limit: int):
+    try:
+        lineage = order_service.get_order_lineage(order_id, depth=depth, node_limit=limit)
+
+        if not lineage:
+            response = OrderResponse(
+                success=False,
+                message=f"訂單 #{order_id} 不存在",
+                error=ErrorInfo(code="NOT_FOUND", details=f"Order {order_id} not found"),
+            )
+            return JSONResponse(
+                status_code=404,
+                content=response.model_dump(by_alias=True, exclude_none=True),
+            )
+
+        return JSONResponse(
+            content={
+                "success": True,
+                "message": "查詢成功",
+                "data": lineage.model_dump(by_alias=True, exclude_none=True),
+            }
+        )
+
+    except Exception as e:
+        logger.error("Failed to get lineage for order %d: %s", order_id, e, exc_info=True)
+        response = OrderResponse(
+            success=False,
+            message="查詢失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
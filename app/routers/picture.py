@@ -0,0 +1,59 @@
+import logging
+
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+
+from app.models.picture import ErrorInfo, PictureErrorResponse
+from app.services import picture_store
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/picture", tags=["Picture"])
+
+# Content under a hash never changes, so clients may cache it indefinitely
+PICTURE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+@router.get("/health", response_class=PlainTextResponse)
+def health():
+    return "OK"
+
+
+@router.get("/{picture_hash}")
+def get_picture(picture_hash: str, request: Request):
+    try:
+        digest = picture_hash.lower().removeprefix(picture_store.PICTURE_REF_PREFIX)
+        if not picture_store.picture_exists(digest):
+            response = PictureErrorResponse(
+                success=False,
+                message=f"圖片不存在：{picture_hash}",
+                error=ErrorInfo(code="NOT_FOUND", details=picture_hash),
+            )
+            return JSONResponse(
+                status_code=404,
+                content=response.model_dump(by_alias=True, exclude_none=True),
+            )
+
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": PICTURE_CACHE_CONTROL}
+        if picture_store.etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+
+        headers["Content-Length"] = str(picture_store.picture_path(digest).stat().st_size)
+        return StreamingResponse(
+            picture_store.iter_picture(digest),
+            media_type=picture_store.picture_media_type(digest),
+            headers=headers,
+        )
+
+    except Exception as e:
+        logger.error("Failed to get picture %s: %s", picture_hash, e, exc_info=True)
+        response = PictureErrorResponse(
+            success=False,
+            message="查詢失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
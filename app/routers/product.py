@@ -1,10 +1,15 @@
+import itertools
+import json
 import logging
 from typing import Optional
 
+import anyio
 from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 
-from app.models.product import ErrorInfo, ProductListResponse
+from app.models.fieldset import parse_fieldset
+from app.models.product import ErrorInfo, ProductDTO, ProductListResponse
 from app.services import product_service
 
 logger = logging.getLogger(__name__)
@@ -17,16 +22,41 @@ def get_product_list(
     isbn: Optional[str] = Query(default=None),
     firmCode: Optional[str] = Query(default=None),
     productName: Optional[str] = Query(default=None),
+    limit: Optional[int] = Query(default=None, ge=1, le=product_service.MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(default=None),
+    stream: bool = Query(default=False),
+    fields: Optional[str] = Query(default=None),
 ):
     try:
-        products = product_service.get_product_list(isbn=isbn, firm_code=firmCode, product_name=productName)
+        field_names = parse_fieldset(ProductDTO, fields)
+        if stream:
+            return _stream_product_list(isbn, firmCode, productName, field_names)
+
+        products, next_cursor = product_service.get_product_list(
+            isbn=isbn, firm_code=firmCode, product_name=productName, limit=limit, cursor=cursor,
+            fields=field_names,
+        )
         response = ProductListResponse(
             success=True,
             message="查詢成功",
             data=products,
             total=len(products),
+            nextCursor=next_cursor,
+        )
+        content = response.model_dump(by_alias=True, exclude_none=True)
+        if field_names is not None:
+            content["data"] = [product.model_dump(by_alias=True, include=field_names) for product in products]
+        return JSONResponse(content=content)
+    except ValueError as e:
+        response = ProductListResponse(
+            success=False,
+            message=f"查詢失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
         )
-        return JSONResponse(content=response.model_dump(by_alias=True, exclude_none=True))
     except Exception as e:
         logger.error("Product list query failed: %s", e, exc_info=True)
         response = ProductListResponse(
@@ -40,6 +70,37 @@ def get_product_list(
         )
 
 
+def _stream_product_list(isbn: Optional[str], firm_code: Optional[str], product_name: Optional[str],
+                         fields: Optional[set[str]]):
+    """Stream every matching product as NDJSON, one ProductDTO per line."""
+    products = product_service.iter_product_list(
+        isbn=isbn, firm_code=firm_code, product_name=product_name, fields=fields,
+    )
+    # Run the query before the response starts so failures still get a JSON error response
+    first = next(products, None)
+    rows = products if first is None else itertools.chain([first], products)
+
+    def lines():
+        try:
+            for product in rows:
+                yield json.dumps(product.model_dump(by_alias=True, include=fields), ensure_ascii=False) + "\n"
+        except Exception as e:
+            logger.error("Product list stream aborted: %s", e, exc_info=True)
+            raise
+
+    async def body():
+        try:
+            async for line in iterate_in_threadpool(lines()):
+                yield line
+        finally:
+            # Also reached when a client disconnect cancels the response: return
+            # the pooled connection now instead of at garbage collection
+            with anyio.CancelScope(shield=True):
+                await run_in_threadpool(products.close)
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
 @router.get("/health", response_class=PlainTextResponse)
 def health():
     return "OK"
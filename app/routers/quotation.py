@@ -1,13 +1,14 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Query, Request
+from fastapi import APIRouter, File, Form, Query, Request, UploadFile
 from fastapi.responses import JSONResponse, PlainTextResponse
 
 from app.models.quotation import (
     CreateQuotationRequest,
     CreateQuotationResponse,
     ErrorInfo,
+    PictureUploadResponse,
     QuotationData,
     QuotationListResponse,
 )
@@ -93,6 +94,50 @@ def create_quotation(request: CreateQuotationRequest):
         )
 
 
+@router.post("/{order_id}/pictures")
+def upload_quotation_pictures(
+    order_id: int,
+    files: list[UploadFile] = File(...),
+    itemNumber: int = Form(default=0),
+):
+    try:
+        result = quotation_service.add_quotation_pictures(
+            order_id, itemNumber, [upload.file for upload in files]
+        )
+
+        response = PictureUploadResponse(
+            success=True,
+            message=f"圖片上傳成功，共 {len(result)} 張",
+            data=result,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = PictureUploadResponse(
+            success=False,
+            message=f"上傳失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Quotation picture upload failed: %s", e, exc_info=True)
+        response = PictureUploadResponse(
+            success=False,
+            message="上傳失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/list")
 def list_quotations(
     objectId: Optional[str] = Query(default=None),
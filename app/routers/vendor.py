@@ -1,16 +1,20 @@
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse, PlainTextResponse
 
+from app.models.bulk import parse_bulk_rows
 from app.models.vendor import (
+    BulkVendorResponse,
     CreateVendorRequest,
     CreateVendorResponse,
     DeleteVendorResponse,
     ErrorInfo,
     UpdateVendorRequest,
     UpdateVendorResponse,
+    VendorDTO,
     VendorListResponse,
 )
 from app.services import vendor_service
@@ -178,6 +182,51 @@ def list_vendors(
         )
 
 
+@router.post("/bulk")
+async def bulk_upsert_vendors(request: Request):
+    try:
+        rows = parse_bulk_rows(await request.body(), VendorDTO)
+        results = await run_in_threadpool(vendor_service.bulk_upsert_vendors, rows)
+
+        created = sum(1 for r in results if r.status == "created")
+        updated = sum(1 for r in results if r.status == "updated")
+        failed = len(results) - created - updated
+        response = BulkVendorResponse(
+            success=True,
+            message=f"匯入完成：新增 {created} 筆，修改 {updated} 筆，失敗 {failed} 筆",
+            data=results,
+            created=created,
+            updated=updated,
+            failed=failed,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = BulkVendorResponse(
+            success=False,
+            message=f"匯入失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Vendor bulk upsert failed: %s", e, exc_info=True)
+        response = BulkVendorResponse(
+            success=False,
+            message="匯入失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/health", response_class=PlainTextResponse)
 def health():
     return "OK"
@@ -1,17 +1,25 @@
+import hashlib
 import logging
 from typing import Optional
 
-from fastapi import APIRouter, Query
-from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi import APIRouter, File, Form, Query, Request, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
+from app.models.bulk import parse_bulk_rows
 from app.models.waiting_product import (
+    BulkWaitingProductResponse,
     CreateWaitingProductRequest,
     CreateWaitingProductResponse,
+    PictureUploadResponse,
+    PromoteWaitingProductRequest,
+    PromoteWaitingProductResponse,
     WaitingProductData,
     WaitingProductListResponse,
+    WaitingProductPictureResponse,
 )
 from app.models.waiting_product import ErrorInfo
-from app.services import waiting_product_service
+from app.services import picture_store, waiting_product_service
 
 logger = logging.getLogger(__name__)
 
@@ -78,17 +86,157 @@ def create_waiting_product(request: CreateWaitingProductRequest):
         )
 
 
+@router.post("/bulk")
+async def bulk_create_waiting_products(request: Request):
+    try:
+        rows = parse_bulk_rows(await request.body(), CreateWaitingProductRequest)
+        results = await run_in_threadpool(
+            waiting_product_service.bulk_create_waiting_products,
+            rows,
+            _validate_create_request,
+        )
+
+        created = sum(1 for r in results if r.status == "created")
+        failed = len(results) - created
+        response = BulkWaitingProductResponse(
+            success=True,
+            message=f"匯入完成：新增 {created} 筆，失敗 {failed} 筆",
+            data=results,
+            created=created,
+            failed=failed,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = BulkWaitingProductResponse(
+            success=False,
+            message=f"匯入失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Waiting product bulk creation failed: %s", e, exc_info=True)
+        response = BulkWaitingProductResponse(
+            success=False,
+            message="匯入失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
+@router.post("/promote")
+def promote_waiting_products(request: PromoteWaitingProductRequest):
+    try:
+        results = waiting_product_service.promote_waiting_products(
+            status=request.status,
+            product_codes=request.product_codes,
+        )
+
+        created = sum(1 for r in results if r.status == "created")
+        updated = sum(1 for r in results if r.status == "updated")
+        skipped = len(results) - created - updated
+        response = PromoteWaitingProductResponse(
+            success=True,
+            message=f"上架完成：新增 {created} 筆，更新 {updated} 筆，略過 {skipped} 筆",
+            data=results,
+            created=created,
+            updated=updated,
+            skipped=skipped,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = PromoteWaitingProductResponse(
+            success=False,
+            message=f"上架失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Waiting product promotion failed: %s", e, exc_info=True)
+        response = PromoteWaitingProductResponse(
+            success=False,
+            message="上架失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
+@router.post("/{product_code}/pictures")
+def upload_waiting_product_pictures(
+    product_code: str,
+    files: list[UploadFile] = File(...),
+    slot: Optional[int] = Form(default=None),
+):
+    try:
+        result = waiting_product_service.set_waiting_product_pictures(
+            product_code, [upload.file for upload in files], slot=slot
+        )
+
+        response = PictureUploadResponse(
+            success=True,
+            message=f"圖片上傳成功，共 {len(result)} 張",
+            data=result,
+        )
+        return JSONResponse(
+            content=response.model_dump(by_alias=True, exclude_none=True)
+        )
+
+    except ValueError as e:
+        response = PictureUploadResponse(
+            success=False,
+            message=f"上傳失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Waiting product picture upload failed: %s", e, exc_info=True)
+        response = PictureUploadResponse(
+            success=False,
+            message="上傳失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/list")
 def get_waiting_product_list(
     vendorCode: Optional[int] = Query(default=None),
     productName: Optional[str] = Query(default=None),
     status: Optional[str] = Query(default=None),
+    includePictures: bool = Query(default=False),
 ):
     try:
         products = waiting_product_service.get_waiting_product_list(
             vendor_code=vendorCode,
             product_name=productName,
             status=status,
+            include_pictures=includePictures,
         )
         response = WaitingProductListResponse(
             success=True,
@@ -124,6 +272,71 @@ def get_waiting_product_list(
         )
 
 
+@router.get("/{product_code}/picture/{slot}")
+def get_waiting_product_picture(product_code: str, slot: int, request: Request):
+    try:
+        picture = waiting_product_service.get_waiting_product_picture(product_code, slot)
+        digest = picture_store.parse_picture_ref(picture)
+        if not picture or (digest is not None and not picture_store.picture_exists(digest)):
+            response = WaitingProductPictureResponse(
+                success=False,
+                message=f"圖片不存在：{product_code} 第 {slot} 張",
+                error=ErrorInfo(code="NOT_FOUND", details=f"{product_code}/picture/{slot}"),
+            )
+            return JSONResponse(
+                status_code=404,
+                content=response.model_dump(by_alias=True, exclude_none=True),
+            )
+
+        # Legacy rows hold base64 text; decode it and use its hash as the ETag
+        content = None
+        if digest is None:
+            content = picture_store.decode_base64_picture(picture)
+            digest = hashlib.sha256(content).hexdigest()
+
+        # The slot can be replaced, so clients revalidate with If-None-Match
+        etag = f'"{digest}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if picture_store.etag_matches(request.headers.get("if-none-match", ""), etag):
+            return Response(status_code=304, headers=headers)
+
+        if content is not None:
+            return Response(
+                content=content,
+                media_type=picture_store.sniff_media_type(content[:16]),
+                headers=headers,
+            )
+        headers["Content-Length"] = str(picture_store.picture_path(digest).stat().st_size)
+        return StreamingResponse(
+            picture_store.iter_picture(digest),
+            media_type=picture_store.picture_media_type(digest),
+            headers=headers,
+        )
+
+    except ValueError as e:
+        response = WaitingProductPictureResponse(
+            success=False,
+            message=f"查詢失敗：{e}",
+            error=ErrorInfo(code="VALIDATION_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=400,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+    except Exception as e:
+        logger.error("Waiting product picture query failed: %s", e, exc_info=True)
+        response = WaitingProductPictureResponse(
+            success=False,
+            message="查詢失敗：伺服器內部錯誤",
+            error=ErrorInfo(code="INTERNAL_ERROR", details=str(e)),
+        )
+        return JSONResponse(
+            status_code=500,
+            content=response.model_dump(by_alias=True, exclude_none=True),
+        )
+
+
 @router.get("/health", response_class=PlainTextResponse)
 def health():
     return "OK"
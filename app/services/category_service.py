@@ -1,61 +1,129 @@
 import logging
+import threading
+from typing import Optional
 
+from app.database.batch import insert_many
 from app.database.connection import db_manager
+from app.models.category import CategoryData, CategoryImportNode, CategoryTreeNode
+from app.services.category_tree import CategoryTree
+from utils.collation import collation_key
 
 logger = logging.getLogger(__name__)
 
+# Categories are read from the in-process tree. API writes update it in
+# place; a full reload after this many seconds picks up edits made by the
+# desktop client.
+CATEGORY_TREE_MAX_AGE = 600.0
 
-def _get_parent_category(parent_id: str, expected_layer: int) -> dict:
-    """Fetch a parent category and verify it exists at the expected layer."""
+category_tree = CategoryTree()
+_tree_lock = threading.Lock()
+# Serializes writes (create/update/delete/import) within this process; ids and
+# name uniqueness are still checked against ProductCategory, since the
+# desktop client writes categories too
+_write_lock = threading.Lock()
+
+# Validation errors listed in one import failure message
+MAX_IMPORT_ERRORS = 20
+
+# store_category column holding the category of each layer
+_STORE_CATEGORY_COLUMNS = {1: "FirstCategory_Id", 2: "SecondCategory_Id", 3: "ThirdCategory_Id"}
+
+
+def _row_to_category(row: dict) -> CategoryData:
+    parent_id = row["ParentCategoryID"]
+    return CategoryData(
+        categoryId=row["CategoryID"].strip(),
+        categoryName=row["CategoryName"],
+        level=row["CategoryLayer"],
+        parentId=parent_id.strip() if parent_id else None,
+    )
+
+
+def load_category_tree(for_update: bool = False) -> None:
+    """Load every category into the category tree.
+
+    ``for_update`` reads under UPDLOCK/HOLDLOCK, so inside a transaction
+    the loaded ids and names stay current until it commits.
+    """
+    hint = " WITH (UPDLOCK, HOLDLOCK)" if for_update else ""
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "SELECT CategoryID, CategoryLayer, CategoryName "
-            "FROM ProductCategory "
-            "WHERE CategoryID = %s AND CategoryLayer = %s",
-            (parent_id, expected_layer),
+            "SELECT CategoryID, CategoryName, CategoryLayer, ParentCategoryID "
+            f"FROM ProductCategory{hint} "
+            "WHERE CategoryLayer IN (1, 2, 3)"
         )
-        row = cursor.fetchone()
-    if row is None:
+        rows = cursor.fetchall()
+    category_tree.replace_all([_row_to_category(row) for row in rows])
+    logger.info("Category tree loaded: %d categories", len(category_tree))
+
+
+def _get_tree() -> CategoryTree:
+    """The category tree, (re)loaded when missing or older than CATEGORY_TREE_MAX_AGE."""
+    age = category_tree.age
+    if age is None or age > CATEGORY_TREE_MAX_AGE:
+        with _tree_lock:
+            age = category_tree.age
+            if age is None or age > CATEGORY_TREE_MAX_AGE:
+                load_category_tree()
+    return category_tree
+
+
+def _get_parent_category(parent_id: str, expected_layer: int) -> CategoryData:
+    """Fetch a parent category and verify it exists at the expected layer."""
+    parent = _get_tree().get(expected_layer, parent_id.strip())
+    if parent is None:
         layer_name = {1: "大類別", 2: "中類別"}[expected_layer]
         raise ValueError(f"父類別不存在：CategoryID={parent_id} (Layer {expected_layer} {layer_name})")
-    return row
+    return parent
+
 
+def _check_duplicate_name(category_name: str, layer: int, exclude_id: Optional[str] = None) -> None:
+    """Check if a category with the same name exists at the same layer.
 
-def _check_duplicate_name(category_name: str, layer: int) -> None:
-    """Check if a category with the same name exists at the same layer."""
+    Reads ProductCategory rather than the tree, which can miss categories
+    the desktop client added since the last load. UPDLOCK/HOLDLOCK keep the
+    answer valid until the enclosing write transaction commits.
+    """
+    query = (
+        "SELECT 1 AS cnt FROM ProductCategory WITH (UPDLOCK, HOLDLOCK) "
+        "WHERE CategoryName = %s AND CategoryLayer = %s"
+    )
+    params: tuple = (category_name, layer)
+    if exclude_id is not None:
+        query += " AND CategoryID <> %s"
+        params += (exclude_id,)
     with db_manager.cursor() as cursor:
-        cursor.execute(
-            "SELECT 1 AS cnt FROM ProductCategory "
-            "WHERE CategoryName = %s AND CategoryLayer = %s",
-            (category_name, layer),
-        )
+        cursor.execute(query, params)
         if cursor.fetchone() is not None:
             raise ValueError(f"同層級已存在相同名稱的分類：{category_name}")
 
 
+def _format_category_id(layer: int, number: int) -> str:
+    """Layer 1 & 2: 2-digit zero-padded (01, 02, ...); Layer 3: 3-digit (001, 002, ...)."""
+    if layer in (1, 2):
+        return str(number).zfill(2)
+    else:
+        return str(number).zfill(3)
+
+
 def _generate_category_id(layer: int) -> str:
     """Generate the next CategoryID for the given layer.
 
-    Layer 1 & 2: 2-digit zero-padded (01, 02, ...)
-    Layer 3: 3-digit zero-padded (001, 002, ...)
-    IDs are unique within each layer (not grouped by parent).
+    IDs are unique within each layer (not grouped by parent). The maximum is
+    read from ProductCategory under UPDLOCK/HOLDLOCK, so call this inside
+    the write transaction that inserts the category.
     """
     with db_manager.cursor() as cursor:
         cursor.execute(
             "SELECT MAX(CAST(CategoryID AS int)) AS max_id "
-            "FROM ProductCategory "
+            "FROM ProductCategory WITH (UPDLOCK, HOLDLOCK) "
             "WHERE CategoryLayer = %s",
             (layer,),
         )
         row = cursor.fetchone()
 
     max_id = row["max_id"] if row and row["max_id"] is not None else 0
-    next_id = max_id + 1
-
-    if layer in (1, 2):
-        return str(next_id).zfill(2)
-    else:
-        return str(next_id).zfill(3)
+    return _format_category_id(layer, max_id + 1)
 
 
 def create_category(request) -> dict:
@@ -72,44 +140,52 @@ def create_category(request) -> dict:
     if not category_name:
         raise ValueError("分類名稱不能為空")
 
-    # Validate parent-child relationship
-    if level == 1:
-        if parent_id is not None:
-            raise ValueError("大類別（level=1）不需要指定 parentId")
-    elif level == 2:
-        if parent_id is None:
-            raise ValueError("中類別（level=2）必須指定 parentId（大類別 ID）")
-        _get_parent_category(parent_id, expected_layer=1)
-    elif level == 3:
-        if parent_id is None:
-            raise ValueError("小類別（level=3）必須指定 parentId（中類別 ID）")
-        _get_parent_category(parent_id, expected_layer=2)
-
-    # Check duplicate name within same layer
-    _check_duplicate_name(category_name, level)
-
-    # Generate new CategoryID
-    category_id = _generate_category_id(level)
-
-    # Insert into ProductCategory
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            "INSERT INTO ProductCategory ("
-            "CategoryID, CategoryName, CategoryLayer, "
-            "DiscountQuantity, Discount, PreferentialDiscount, VipDiscount, "
-            "ParentCategoryID"
-            ") VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
-            (
-                category_id,
-                category_name,
-                level,
-                0,    # DiscountQuantity
-                1,    # Discount
-                1,    # PreferentialDiscount
-                1,    # VipDiscount
-                parent_id,
-            ),
-        )
+    with _write_lock:
+        # Validate parent-child relationship
+        if level == 1:
+            if parent_id is not None:
+                raise ValueError("大類別（level=1）不需要指定 parentId")
+        elif level == 2:
+            if parent_id is None:
+                raise ValueError("中類別（level=2）必須指定 parentId（大類別 ID）")
+            _get_parent_category(parent_id, expected_layer=1)
+        elif level == 3:
+            if parent_id is None:
+                raise ValueError("小類別（level=3）必須指定 parentId（中類別 ID）")
+            _get_parent_category(parent_id, expected_layer=2)
+
+        with db_manager.transaction():
+            # Check duplicate name within same layer
+            _check_duplicate_name(category_name, level)
+
+            # Generate new CategoryID
+            category_id = _generate_category_id(level)
+
+            # Insert into ProductCategory
+            with db_manager.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO ProductCategory ("
+                    "CategoryID, CategoryName, CategoryLayer, "
+                    "DiscountQuantity, Discount, PreferentialDiscount, VipDiscount, "
+                    "ParentCategoryID"
+                    ") VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    (
+                        category_id,
+                        category_name,
+                        level,
+                        0,    # DiscountQuantity
+                        1,    # Discount
+                        1,    # PreferentialDiscount
+                        1,    # VipDiscount
+                        parent_id,
+                    ),
+                )
+
+            category = CategoryData(
+                categoryId=category_id, categoryName=category_name, level=level,
+                parentId=parent_id.strip() if parent_id else None,
+            )
+            db_manager.after_commit(lambda: category_tree.put(category))
 
     logger.info(
         "Category created - ID: %s, Name: %s, Layer: %s, ParentID: %s",
@@ -124,19 +200,26 @@ def create_category(request) -> dict:
     }
 
 
-def _get_category_by_id(category_id: str) -> dict:
-    """Fetch a category by its ID. Raises ValueError if not found."""
+def _get_category_by_id(category_id: str) -> CategoryData:
+    """Fetch a category by its ID from ProductCategory. Raises ValueError if not found.
+
+    The tree may not have categories the desktop client added since the
+    last load, so writes look the row up here, under UPDLOCK/HOLDLOCK when
+    called inside their transaction. Like CategoryTree.find, the topmost
+    layer wins when the id exists in several.
+    """
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "SELECT CategoryID, CategoryName, CategoryLayer, ParentCategoryID "
-            "FROM ProductCategory "
-            "WHERE CategoryID = %s",
+            "SELECT TOP 1 CategoryID, CategoryName, CategoryLayer, ParentCategoryID "
+            "FROM ProductCategory WITH (UPDLOCK, HOLDLOCK) "
+            "WHERE CategoryID = %s AND CategoryLayer IN (1, 2, 3) "
+            "ORDER BY CategoryLayer",
             (category_id,),
         )
         row = cursor.fetchone()
     if row is None:
         raise ValueError(f"分類不存在：CategoryID={category_id}")
-    return row
+    return _row_to_category(row)
 
 
 def update_category(request) -> dict:
@@ -146,46 +229,44 @@ def update_category(request) -> dict:
     if not category_id:
         raise ValueError("categoryId 不能為空")
 
-    # Verify category exists
-    existing = _get_category_by_id(category_id)
-
     category_name = request.category_name
     if category_name is not None:
         category_name = category_name.strip()
         if not category_name:
             raise ValueError("分類名稱不能為空")
 
-        # Check duplicate name within same layer (exclude self)
-        layer = existing["CategoryLayer"]
-        with db_manager.cursor() as cursor:
-            cursor.execute(
-                "SELECT 1 AS cnt FROM ProductCategory "
-                "WHERE CategoryName = %s AND CategoryLayer = %s AND CategoryID != %s",
-                (category_name, layer, category_id),
-            )
-            if cursor.fetchone() is not None:
-                raise ValueError(f"同層級已存在相同名稱的分類：{category_name}")
+    with _write_lock, db_manager.transaction():
+        # Verify category exists
+        existing = _get_category_by_id(category_id)
 
-        # Update
-        with db_manager.cursor() as cursor:
-            cursor.execute(
-                "UPDATE ProductCategory SET CategoryName = %s WHERE CategoryID = %s",
-                (category_name, category_id),
-            )
+        if category_name is not None:
+            # Check duplicate name within same layer (exclude self)
+            _check_duplicate_name(category_name, existing.level, exclude_id=category_id)
 
-        logger.info(
-            "Category updated - ID: %s, Name: %s -> %s",
-            category_id, existing["CategoryName"], category_name,
-        )
-    else:
-        # Nothing to update
-        category_name = existing["CategoryName"]
+            # Update
+            with db_manager.cursor() as cursor:
+                cursor.execute(
+                    "UPDATE ProductCategory SET CategoryName = %s "
+                    "WHERE CategoryID = %s AND CategoryLayer = %s",
+                    (category_name, category_id, existing.level),
+                )
+
+            updated = existing.model_copy(update={"category_name": category_name})
+            db_manager.after_commit(lambda: category_tree.put(updated))
+
+            logger.info(
+                "Category updated - ID: %s, Name: %s -> %s",
+                category_id, existing.category_name, category_name,
+            )
+        else:
+            # Nothing to update
+            category_name = existing.category_name
 
     return {
         "categoryId": category_id,
         "categoryName": category_name,
-        "level": existing["CategoryLayer"],
-        "parentId": existing["ParentCategoryID"],
+        "level": existing.level,
+        "parentId": existing.parent_id,
     }
 
 
@@ -196,44 +277,217 @@ def delete_category(category_id: str) -> None:
     if not category_id:
         raise ValueError("categoryId 不能為空")
 
-    # Verify category exists
-    existing = _get_category_by_id(category_id)
-    layer = existing["CategoryLayer"]
-
-    # Check for child categories
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            "SELECT COUNT(*) AS cnt FROM ProductCategory "
-            "WHERE ParentCategoryID = %s",
-            (category_id,),
-        )
-        row = cursor.fetchone()
-        if row and row["cnt"] > 0:
-            raise ValueError(f"此分類下尚有 {row['cnt']} 個子分類，無法刪除")
-
-    # Check for related products in store_category
-    column_map = {1: "FirstCategory_Id", 2: "SecondCategory_Id", 3: "ThirdCategory_Id"}
-    column_name = column_map.get(layer)
+    with _write_lock, db_manager.transaction():
+        # Verify category exists
+        existing = _get_category_by_id(category_id)
+        layer = existing.level
 
-    if column_name:
         with db_manager.cursor() as cursor:
+            # Check for child categories; the tree may not have those the
+            # desktop client added, so ask ProductCategory
+            if layer < 3:
+                cursor.execute(
+                    "SELECT COUNT(*) AS cnt FROM ProductCategory WITH (UPDLOCK, HOLDLOCK) "
+                    "WHERE ParentCategoryID = %s AND CategoryLayer = %s",
+                    (category_id, layer + 1),
+                )
+                row = cursor.fetchone()
+                if row and row["cnt"] > 0:
+                    raise ValueError(f"此分類下尚有 {row['cnt']} 個子分類，無法刪除")
+
+            # Check for related products in store_category
+            column_name = _STORE_CATEGORY_COLUMNS.get(layer)
+            if column_name:
+                cursor.execute(
+                    f"SELECT COUNT(*) AS cnt FROM store_category "
+                    f"WHERE {column_name} = %s",
+                    (category_id,),
+                )
+                row = cursor.fetchone()
+                if row and row["cnt"] > 0:
+                    raise ValueError(f"此分類下尚有 {row['cnt']} 個關聯商品，無法刪除")
+
+            # Delete the category
             cursor.execute(
-                f"SELECT COUNT(*) AS cnt FROM store_category "
-                f"WHERE {column_name} = %s",
-                (category_id,),
+                "DELETE FROM ProductCategory WHERE CategoryID = %s AND CategoryLayer = %s",
+                (category_id, layer),
             )
-            row = cursor.fetchone()
-            if row and row["cnt"] > 0:
-                raise ValueError(f"此分類下尚有 {row['cnt']} 個關聯商品，無法刪除")
 
-    # Delete the category
+        db_manager.after_commit(lambda: category_tree.remove(layer, category_id))
+
+    logger.info(
+        "Category deleted - ID: %s, Name: %s, Layer: %s",
+        category_id, existing.category_name, layer,
+    )
+
+
+def _count_products() -> dict[tuple[int, str], int]:
+    """Distinct products per (layer, CategoryID) from store_category, in one grouped query."""
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "DELETE FROM ProductCategory WHERE CategoryID = %s",
-            (category_id,),
+            "SELECT FirstCategory_Id, SecondCategory_Id, ThirdCategory_Id, "
+            "GROUPING(FirstCategory_Id) AS g1, GROUPING(SecondCategory_Id) AS g2, "
+            "COUNT(DISTINCT store_id) AS cnt "
+            "FROM store_category "
+            "GROUP BY GROUPING SETS ((FirstCategory_Id), (SecondCategory_Id), (ThirdCategory_Id))"
+        )
+        rows = cursor.fetchall()
+
+    counts = {}
+    for row in rows:
+        if not row["g1"]:
+            layer, value = 1, row["FirstCategory_Id"]
+        elif not row["g2"]:
+            layer, value = 2, row["SecondCategory_Id"]
+        else:
+            layer, value = 3, row["ThirdCategory_Id"]
+        if value is None:
+            continue
+        # store_category may hold the id as a number; CategoryID is zero-padded text
+        key = str(value).strip()
+        if key.isdigit():
+            key = _format_category_id(layer, int(key))
+        counts[(layer, key)] = counts.get((layer, key), 0) + row["cnt"]
+    return counts
+
+
+def get_category_tree(include_counts: bool = False) -> tuple[list[CategoryTreeNode], int]:
+    """Return the nested category tree and the total number of categories.
+
+    Layer 2 and 3 categories hang under their ParentCategoryID. Categories
+    whose parent is missing (e.g. rows created before ParentCategoryID
+    existed) are listed at the top level with their own level.
+
+    Args:
+        include_counts: Attach productCount per node from store_category
+
+    Returns:
+        Tuple of (top-level nodes, total category count)
+    """
+    categories = _get_tree().snapshot()
+    counts = _count_products() if include_counts else None
+
+    nodes = {}
+    for category in categories:
+        nodes[(category.level, category.category_id)] = CategoryTreeNode(
+            categoryId=category.category_id,
+            categoryName=category.category_name,
+            level=category.level,
+            parentId=category.parent_id,
+            productCount=counts.get((category.level, category.category_id), 0) if counts is not None else None,
         )
 
+    roots = []
+    for category in categories:
+        node = nodes[(category.level, category.category_id)]
+        parent = None
+        if category.level > 1 and category.parent_id:
+            parent = nodes.get((category.level - 1, category.parent_id))
+        if parent is not None:
+            parent.children.append(node)
+        else:
+            roots.append(node)
+    return roots, len(categories)
+
+
+def import_categories(request) -> tuple[list[CategoryData], int]:
+    """Import a nested category tree in one transaction.
+
+    Top-level nodes are layer 1, their children layer 2 and grandchildren
+    layer 3. A node whose name already exists in its layer under the same
+    parent reuses that category, so re-importing a tree only adds what is
+    missing. The category tree is reloaded from ProductCategory inside the
+    import transaction and the whole import is validated against it before
+    anything is written; new CategoryIDs are allocated per layer in one
+    pass and inserted with multi-row statements.
+
+    Returns:
+        Tuple of (created categories, number of nodes matched to existing ones)
+
+    Raises:
+        ValueError: If any node is invalid; nothing is imported
+    """
+    if not request.categories:
+        raise ValueError("categories 不能為空")
+
+    with _write_lock, db_manager.transaction():
+        # Reload from ProductCategory first: the tree may be missing categories
+        # the desktop client added, which would clash with the ids and names below
+        load_category_tree(for_update=True)
+        tree = category_tree
+        next_ids = {level: tree.max_id(level) for level in (1, 2, 3)}
+        created: list[CategoryData] = []
+        new_names: set[tuple[int, str]] = set()
+        errors: list[str] = []
+        existing_count = 0
+
+        def visit(nodes: list[CategoryImportNode], level: int, parent: Optional[CategoryData], path: str) -> None:
+            nonlocal existing_count
+            for node in nodes:
+                category_name = node.category_name.strip()
+                node_path = f"{path} > {category_name}" if path else category_name
+                if not category_name:
+                    errors.append(f"分類名稱不能為空：{path or '大類別'}")
+                    continue
+                if level > 3:
+                    errors.append(f"分類最多三層：{node_path}")
+                    continue
+
+                parent_id = parent.category_id if parent is not None else None
+                category = tree.find_by_name(level, category_name)
+                if category is not None:
+                    if category.parent_id != parent_id:
+                        errors.append(f"同層級已存在相同名稱的分類：{node_path}")
+                        continue
+                    existing_count += 1
+                else:
+                    name_key = (level, collation_key(category_name))
+                    if name_key in new_names:
+                        errors.append(f"匯入資料中同層級分類名稱重複：{node_path}")
+                        continue
+                    new_names.add(name_key)
+                    next_ids[level] += 1
+                    category = CategoryData(
+                        categoryId=_format_category_id(level, next_ids[level]),
+                        categoryName=category_name,
+                        level=level,
+                        parentId=parent_id,
+                    )
+                    created.append(category)
+                visit(node.children, level + 1, category, node_path)
+
+        visit(request.categories, 1, None, "")
+
+        if errors:
+            message = "；".join(errors[:MAX_IMPORT_ERRORS])
+            if len(errors) > MAX_IMPORT_ERRORS:
+                message += f"（共 {len(errors)} 項錯誤）"
+            raise ValueError(message)
+
+        if created:
+            with db_manager.cursor() as cursor:
+                insert_many(
+                    cursor,
+                    "ProductCategory",
+                    [
+                        "CategoryID", "CategoryName", "CategoryLayer",
+                        "DiscountQuantity", "Discount", "PreferentialDiscount", "VipDiscount",
+                        "ParentCategoryID",
+                    ],
+                    [
+                        (c.category_id, c.category_name, c.level, 0, 1, 1, 1, c.parent_id)
+                        for c in sorted(created, key=lambda c: c.level)
+                    ],
+                )
+
+            def add_to_tree() -> None:
+                for category in created:
+                    category_tree.put(category)
+
+            db_manager.after_commit(add_to_tree)
+
     logger.info(
-        "Category deleted - ID: %s, Name: %s, Layer: %s",
-        category_id, existing["CategoryName"], layer,
+        "Categories imported - created: %d, existing: %d",
+        len(created), existing_count,
     )
+    return created, existing_count
@@ -0,0 +1,117 @@
+"""In-process product category tree.
+
+Holds every ProductCategory row so category validation, duplicate-name
+checks and id allocation are answered from memory. category_service loads
+it and keeps it current on writes; this module only holds the data
+structures.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from app.models.category import CategoryData
+from utils.collation import collation_key
+
+
+def _id_order(category_id: str) -> tuple:
+    """Sort numeric CategoryIDs by value, anything else after them."""
+    category_id = category_id.strip()
+    return (0, int(category_id), "") if category_id.isdigit() else (1, 0, category_id)
+
+
+class CategoryTree:
+    """Categories of the three layers keyed by (layer, CategoryID).
+
+    CategoryIDs are only unique within a layer; a layer 2 or 3 category
+    points at its parent in the layer above through ParentCategoryID.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._nodes: dict[tuple[int, str], CategoryData] = {}
+        # layer -> name key -> CategoryID
+        self._names: dict[int, dict[str, str]] = {}
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last full load, or None if never loaded."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def _remove(self, level: int, category_id: str) -> None:
+        category = self._nodes.pop((level, category_id), None)
+        if category is None:
+            return
+        names = self._names.get(level, {})
+        key = collation_key(category.category_name)
+        if names.get(key) == category_id:
+            del names[key]
+
+    def _add(self, category: CategoryData) -> None:
+        self._nodes[(category.level, category.category_id)] = category
+        self._names.setdefault(category.level, {})[collation_key(category.category_name)] = category.category_id
+
+    def replace_all(self, categories: list[CategoryData]) -> None:
+        with self._lock:
+            self._nodes.clear()
+            self._names.clear()
+            for category in categories:
+                self._add(category)
+            self._loaded_at = time.monotonic()
+
+    def put(self, category: CategoryData) -> None:
+        """Insert or replace a category."""
+        with self._lock:
+            self._remove(category.level, category.category_id)
+            self._add(category)
+
+    def remove(self, level: int, category_id: str) -> None:
+        with self._lock:
+            self._remove(level, category_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._nodes.clear()
+            self._names.clear()
+            self._loaded_at = None
+
+    def get(self, level: int, category_id: str) -> Optional[CategoryData]:
+        return self._nodes.get((level, category_id))
+
+    def find(self, category_id: str) -> Optional[CategoryData]:
+        """Category with this id in the topmost layer that has one (layer 1 first)."""
+        for level in (1, 2, 3):
+            category = self._nodes.get((level, category_id))
+            if category is not None:
+                return category
+        return None
+
+    def find_by_name(self, level: int, category_name: str) -> Optional[CategoryData]:
+        category_id = self._names.get(level, {}).get(collation_key(category_name))
+        return self._nodes.get((level, category_id)) if category_id is not None else None
+
+    def max_id(self, level: int) -> int:
+        """Largest numeric CategoryID in the layer, 0 if there is none."""
+        with self._lock:
+            ids = [int(category_id) for layer, category_id in self._nodes
+                   if layer == level and category_id.strip().isdigit()]
+        return max(ids, default=0)
+
+    def children(self, category: CategoryData) -> list[CategoryData]:
+        """Categories in the layer below whose parent is ``category``."""
+        with self._lock:
+            children = [node for (layer, _), node in self._nodes.items()
+                        if layer == category.level + 1 and node.parent_id == category.category_id]
+        return sorted(children, key=lambda node: _id_order(node.category_id))
+
+    def snapshot(self) -> list[CategoryData]:
+        """All categories ordered by layer, then CategoryID."""
+        with self._lock:
+            categories = list(self._nodes.values())
+        return sorted(categories, key=lambda node: (node.level, _id_order(node.category_id)))
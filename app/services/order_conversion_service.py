@@ -4,6 +4,7 @@ import logging
 from datetime import datetime
 from typing import Optional
 
+from app.database.batch import MAX_PARAMS
 from app.database.connection import db_manager
 from app.models.order_conversion import (
     ConversionResultDTO,
@@ -25,11 +26,10 @@ from app.services.order_service import (
 )
 from app.services.stock_service import (
     check_stock_for_items,
-    update_waiting_shipment_quantity,
-    update_waiting_into_in_stock,
-    update_in_stock,
+    apply_stock_deltas,
 )
-from app.services.purchase_order_service import generate_purchase_quotation
+from app.services.order_number_service import allocate_order_number, allocate_order_numbers
+from app.services.purchase_order_service import create_purchase_orders, group_shortage_by_supplier
 
 logger = logging.getLogger(__name__)
 
@@ -37,68 +37,57 @@ logger = logging.getLogger(__name__)
 ESTABLISH_SOURCE_SYSTEM = 0
 
 
-def _generate_order_number(order_source: int, order_date: str) -> int:
-    """Generate order number based on source type and date. Returns bigint."""
-    date_str = order_date.replace("-", "/")
-    try:
-        dt = datetime.strptime(date_str, "%Y/%m/%d")
-    except ValueError:
-        dt = datetime.now()
-
-    prefix = dt.strftime("%Y%m%d")
-
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            """SELECT MAX(OrderNumber) AS MaxNum FROM dbo.Orders
-               WHERE OrderSource = %s AND OrderNumber LIKE %s""",
-            (order_source, f"{prefix}%"),
-        )
-        row = cursor.fetchone()
-
-    if row and row.get("MaxNum"):
-        max_num = str(row["MaxNum"])
-        seq = int(max_num[len(prefix):]) + 1
-    else:
-        seq = 1
-
-    return int(f"{prefix}{seq:04d}")
-
-
 def _create_new_order(
     source_order_id: int,
     target_order_source: int,
+    order_number: int,
+    order_date: str,
     items: Optional[list[dict]] = None,
-) -> tuple[int, str, str]:
+) -> int:
     """Create a new order based on source order.
 
+    Items and price rows are copied server-side with INSERT ... SELECT, so
+    the statement count does not grow with the number of items.
+
     Args:
         source_order_id: Source order ID
         target_order_source: Target order source type
+        order_number: Order number allocated before the unit of work started
+        order_date: Order date (yyyy/mm/dd)
         items: Optional list of items with quantity overrides
 
     Returns:
-        Tuple of (new_order_id, order_number, order_date)
+        ID of the new order
     """
-    source_order = get_order_by_id(source_order_id)
-    if not source_order:
-        raise ValueError(f"來源訂單 #{source_order_id} 不存在")
-
-    source_items = get_order_items(source_order_id)
-    if not source_items:
-        raise ValueError(f"來源訂單 #{source_order_id} 沒有商品項目")
-
-    order_date = datetime.now().strftime("%Y/%m/%d")
-    order_number = _generate_order_number(target_order_source, order_date)
-
-    # Build items map for quantity overrides
-    items_map = {}
+    # Quantity overrides, keyed by ISBN or by item number (ISBN wins when both match)
+    isbn_overrides: dict[str, int] = {}
+    item_number_overrides: dict[int, int] = {}
     if items:
         for item in items:
-            key = item.get("isbn") or item.get("item_number")
-            if key:
-                items_map[key] = item.get("quantity")
+            quantity = item.get("quantity")
+            if quantity is None:
+                continue
+            if item.get("isbn"):
+                isbn_overrides[item["isbn"]] = quantity
+            elif item.get("item_number"):
+                item_number_overrides[item["item_number"]] = quantity
+
+    if 2 * (len(isbn_overrides) + len(item_number_overrides)) > MAX_PARAMS:
+        raise ValueError("數量覆寫項目過多，請分批轉換")
 
     with db_manager.cursor() as cursor:
+        cursor.execute(
+            """SELECT o.ObjectID,
+                      (SELECT COUNT(*) FROM dbo.Orders_Items i WHERE i.Order_id = o.id) AS ItemCount
+               FROM dbo.Orders o WHERE o.id = %s""",
+            (source_order_id,),
+        )
+        source_row = cursor.fetchone()
+        if not source_row:
+            raise ValueError(f"來源訂單 #{source_order_id} 不存在")
+        if not source_row["ItemCount"]:
+            raise ValueError(f"來源訂單 #{source_order_id} 沒有商品項目")
+
         # Insert into Orders table
         cursor.execute(
             """INSERT INTO dbo.Orders (
@@ -114,9 +103,9 @@ def _create_new_order(
                 order_number,
                 order_date,
                 target_order_source,
-                source_order.object_id,
+                source_row["ObjectID"],
                 0,  # isCheckout
-                len(source_items),
+                source_row["ItemCount"],
                 ESTABLISH_SOURCE_SYSTEM,
                 0,  # isBorrowed
                 0,  # isOffset
@@ -130,64 +119,58 @@ def _create_new_order(
         cursor.execute("SELECT SCOPE_IDENTITY() AS id")
         new_order_id = int(cursor.fetchone()["id"])
 
-        # Insert into Orders_Price table (copy from source)
+        # Copy Orders_Price from source (zeros when the source has none)
         cursor.execute(
-            """SELECT * FROM dbo.Orders_Price WHERE Order_id = %s""",
-            (source_order_id,),
+            """INSERT INTO dbo.Orders_Price (
+                Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
+            )
+            SELECT TOP 1 %s, %s, ISNULL(TotalPriceNoneTax, 0), ISNULL(Tax, 0),
+                   ISNULL(Discount, 0), ISNULL(TotalPriceIncludeTax, 0)
+            FROM dbo.Orders_Price WHERE Order_id = %s;
+            IF @@ROWCOUNT = 0
+                INSERT INTO dbo.Orders_Price (
+                    Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
+                ) VALUES (%s, %s, 0, 0, 0, 0);""",
+            (new_order_id, order_number, source_order_id, new_order_id, order_number),
         )
-        price_row = cursor.fetchone()
 
-        if price_row:
-            cursor.execute(
-                """INSERT INTO dbo.Orders_Price (
-                    Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
-                ) VALUES (%s, %s, %s, %s, %s, %s)""",
-                (
-                    new_order_id,
-                    order_number,
-                    price_row.get("TotalPriceNoneTax", 0),
-                    price_row.get("Tax", 0),
-                    price_row.get("Discount", 0),
-                    price_row.get("TotalPriceIncludeTax", 0),
-                ),
+        # Copy order items, applying quantity overrides through joined VALUES lists
+        joins = []
+        join_params: list = []
+        quantity_sources = []
+        if isbn_overrides:
+            joins.append(
+                f"LEFT JOIN (VALUES {', '.join(['(%s, %s)'] * len(isbn_overrides))}) "
+                "AS qi (ISBN, Quantity) ON qi.ISBN = i.ISBN"
             )
-        else:
-            cursor.execute(
-                """INSERT INTO dbo.Orders_Price (
-                    Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
-                ) VALUES (%s, %s, %s, %s, %s, %s)""",
-                (new_order_id, order_number, 0, 0, 0, 0),
+            for isbn, quantity in isbn_overrides.items():
+                join_params.extend((isbn, quantity))
+            quantity_sources.append("qi.Quantity")
+        if item_number_overrides:
+            joins.append(
+                f"LEFT JOIN (VALUES {', '.join(['(%s, %s)'] * len(item_number_overrides))}) "
+                "AS qn (ItemNumber, Quantity) ON qn.ItemNumber = i.ItemNumber"
             )
+            for item_number, quantity in item_number_overrides.items():
+                join_params.extend((item_number, quantity))
+            quantity_sources.append("qn.Quantity")
+        quantity_expr = f"COALESCE({', '.join(quantity_sources + ['i.Quantity'])})"
 
-        # Insert order items
-        for item in source_items:
-            # Check for quantity override
-            quantity = item.quantity
-            if item.isbn and item.isbn in items_map:
-                quantity = items_map[item.isbn]
-            elif item.item_number and item.item_number in items_map:
-                quantity = items_map[item.item_number]
-
-            cursor.execute(
-                """INSERT INTO dbo.Orders_Items (
-                    Order_id, OrderNumber, ItemNumber, ISBN, ProductName,
-                    Quantity, Unit, BatchPrice, SinglePrice, Pricing, PriceAmount, Remark
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-                (
-                    new_order_id,
-                    order_number,
-                    item.item_number,
-                    item.isbn,
-                    item.product_name,
-                    quantity,
-                    item.unit or "",
-                    item.batch_price or 0.0,
-                    item.single_price or 0.0,
-                    item.pricing or 0.0,
-                    item.price_amount or 0,
-                    item.remark or "",
-                ),
+        cursor.execute(
+            f"""INSERT INTO dbo.Orders_Items (
+                Order_id, OrderNumber, ItemNumber, ISBN, ProductName,
+                Quantity, Unit, BatchPrice, SinglePrice, Pricing, PriceAmount, Remark
             )
+            SELECT %s, %s, i.ItemNumber, i.ISBN, i.ProductName,
+                   {quantity_expr}, ISNULL(i.Unit, ''), ISNULL(i.BatchPrice, 0),
+                   ISNULL(i.SinglePrice, 0), ISNULL(i.Pricing, 0), ISNULL(i.PriceAmount, 0),
+                   ISNULL(i.Remark, '')
+            FROM dbo.Orders_Items i
+            {" ".join(joins)}
+            WHERE i.Order_id = %s
+            ORDER BY i.ItemNumber""",
+            (new_order_id, order_number, *join_params, source_order_id),
+        )
 
         # Create reference to source order
         create_order_reference(new_order_id, source_order_id, None)
@@ -199,7 +182,44 @@ def _create_new_order(
         source_order_id,
     )
 
-    return new_order_id, str(order_number), order_date
+    return new_order_id
+
+
+def _plan_purchases(
+    source_items: list,
+    auto_generate_purchase: bool,
+) -> tuple[list[StockCheckResultDTO], list[dict]]:
+    """Check stock for the items and group the shortages by supplier.
+
+    Returns:
+        Tuple of (stock check results, one supplier group per purchase order to create)
+    """
+    stock_check_items = [
+        {"isbn": item.isbn, "quantity": item.quantity or 0}
+        for item in source_items
+        if item.isbn
+    ]
+    stock_results = check_stock_for_items(stock_check_items)
+
+    # Identify shortage items
+    shortage_items = [
+        {
+            "isbn": r.isbn,
+            "quantity": r.requested_quantity,
+            "shortage_quantity": r.shortage_quantity,
+        }
+        for r in stock_results
+        if not r.is_sufficient and r.shortage_quantity and r.shortage_quantity > 0
+    ]
+
+    purchase_suppliers = []
+    if auto_generate_purchase and shortage_items:
+        purchase_suppliers = group_shortage_by_supplier(shortage_items)
+    return stock_results, purchase_suppliers
+
+
+def _item_snapshot(items: list) -> list[tuple]:
+    return [(item.item_number, item.isbn, item.quantity) for item in items]
 
 
 def convert_quotation_to_waiting_shipment(
@@ -211,6 +231,12 @@ def convert_quotation_to_waiting_shipment(
 
     報價單 → 待出貨單
 
+    Order numbers must be allocated before the unit of work starts, so the
+    number of purchase orders is estimated from a first read of the items.
+    Inside the unit of work the items are read again under lock and the
+    stock check and supplier grouping are redone; the conversion fails if
+    the quotation changed or needs more purchase orders than were allocated.
+
     Args:
         quotation_id: Quotation order ID
         items: Optional items with quantity overrides
@@ -219,7 +245,6 @@ def convert_quotation_to_waiting_shipment(
     Returns:
         ConversionResultDTO with result info
     """
-    # Validate source order
     source_order = get_order_by_id(quotation_id)
     if not source_order:
         raise ValueError(f"報價單 #{quotation_id} 不存在")
@@ -227,58 +252,58 @@ def convert_quotation_to_waiting_shipment(
     if source_order.order_source != ORDER_SOURCE_QUOTATION:
         raise ValueError(f"訂單 #{quotation_id} 不是報價單類型")
 
-    # Get source items
-    source_items = get_order_items(quotation_id)
-    if not source_items:
+    planned_items = get_order_items(quotation_id)
+    if not planned_items:
         raise ValueError(f"報價單 #{quotation_id} 沒有商品項目")
+    _, planned_suppliers = _plan_purchases(planned_items, auto_generate_purchase)
 
-    # Check stock for all items
-    stock_check_items = [
-        {"isbn": item.isbn, "quantity": item.quantity or 0}
-        for item in source_items
-        if item.isbn
-    ]
-    stock_results = check_stock_for_items(stock_check_items)
-
-    # Identify shortage items
-    shortage_items = [
-        {
-            "isbn": r.isbn,
-            "quantity": r.requested_quantity,
-            "shortage_quantity": r.shortage_quantity,
-        }
-        for r in stock_results
-        if not r.is_sufficient and r.shortage_quantity and r.shortage_quantity > 0
-    ]
-
-    # Auto-generate purchase orders if needed
-    auto_purchase_orders: list[AutoPurchaseOrderInfo] = []
-    if auto_generate_purchase and shortage_items:
-        auto_purchase_orders = generate_purchase_quotation(quotation_id, shortage_items)
+    order_date = datetime.now().strftime("%Y/%m/%d")
+    order_number = allocate_order_number(ORDER_SOURCE_WAITING_SHIPMENT, order_date)
+    purchase_numbers = allocate_order_numbers(ORDER_SOURCE_PURCHASE, order_date, len(planned_suppliers))
+
+    with db_manager.transaction():
+        # Re-read the items under lock: they drive the stock deltas and purchase orders
+        source_items = get_order_items(quotation_id, for_update=True)
+        if _item_snapshot(source_items) != _item_snapshot(planned_items):
+            raise ValueError(f"報價單 #{quotation_id} 在轉換期間已被修改，請重新轉換")
+
+        stock_results, purchase_suppliers = _plan_purchases(source_items, auto_generate_purchase)
+        if len(purchase_suppliers) > len(purchase_numbers):
+            raise ValueError(f"報價單 #{quotation_id} 的缺貨供應商在轉換期間有變動，請重新轉換")
+
+        # Auto-generate purchase orders if needed
+        auto_purchase_orders: list[AutoPurchaseOrderInfo] = create_purchase_orders(
+            quotation_id, purchase_suppliers, purchase_numbers, order_date,
+        )
 
-    # Create waiting shipment order
-    new_order_id, order_number, order_date = _create_new_order(
-        quotation_id,
-        ORDER_SOURCE_WAITING_SHIPMENT,
-        items,
-    )
+        # Create waiting shipment order
+        new_order_id = _create_new_order(
+            quotation_id,
+            ORDER_SOURCE_WAITING_SHIPMENT,
+            order_number,
+            order_date,
+            items,
+        )
 
-    # Update source quotation tracking fields
-    update_order_waiting_fields(quotation_id, order_date, order_number)
-
-    # Update WaitingShipmentQuantity for each product
-    for item in source_items:
-        if item.isbn and item.quantity:
-            update_waiting_shipment_quantity(item.isbn, item.quantity)
-
-    return ConversionResultDTO(
-        source_order_id=quotation_id,
-        target_order_id=new_order_id,
-        target_order_number=order_number,
-        target_order_date=order_date,
-        stock_check_results=stock_results,
-        auto_purchase_orders=auto_purchase_orders if auto_purchase_orders else None,
-    )
+        # Update source quotation tracking fields
+        update_order_waiting_fields(quotation_id, order_date, str(order_number))
+
+        # Increase WaitingShipmentQuantity for all products in one statement
+        unmatched = apply_stock_deltas([
+            (item.isbn, "WaitingShipmentQuantity", item.quantity)
+            for item in source_items
+            if item.isbn and item.quantity
+        ])
+
+        return ConversionResultDTO(
+            source_order_id=quotation_id,
+            target_order_id=new_order_id,
+            target_order_number=str(order_number),
+            target_order_date=order_date,
+            stock_check_results=stock_results,
+            auto_purchase_orders=auto_purchase_orders if auto_purchase_orders else None,
+            unmatched_isbns=unmatched or None,
+        )
 
 
 def convert_purchase_to_waiting_receipt(
@@ -304,22 +329,28 @@ def convert_purchase_to_waiting_receipt(
     if source_order.order_source != ORDER_SOURCE_PURCHASE:
         raise ValueError(f"訂單 #{purchase_order_id} 不是採購單類型")
 
-    # Create waiting receipt order
-    new_order_id, order_number, order_date = _create_new_order(
-        purchase_order_id,
-        ORDER_SOURCE_WAITING_RECEIPT,
-        items,
-    )
+    order_date = datetime.now().strftime("%Y/%m/%d")
+    order_number = allocate_order_number(ORDER_SOURCE_WAITING_RECEIPT, order_date)
+
+    with db_manager.transaction():
+        # Create waiting receipt order
+        new_order_id = _create_new_order(
+            purchase_order_id,
+            ORDER_SOURCE_WAITING_RECEIPT,
+            order_number,
+            order_date,
+            items,
+        )
 
-    # Update source purchase order tracking fields
-    update_order_waiting_fields(purchase_order_id, order_date, order_number)
+        # Update source purchase order tracking fields
+        update_order_waiting_fields(purchase_order_id, order_date, str(order_number))
 
-    return ConversionResultDTO(
-        source_order_id=purchase_order_id,
-        target_order_id=new_order_id,
-        target_order_number=order_number,
-        target_order_date=order_date,
-    )
+        return ConversionResultDTO(
+            source_order_id=purchase_order_id,
+            target_order_id=new_order_id,
+            target_order_number=str(order_number),
+            target_order_date=order_date,
+        )
 
 
 def convert_waiting_shipment_to_shipment(
@@ -347,33 +378,40 @@ def convert_waiting_shipment_to_shipment(
     if source_order.order_source != ORDER_SOURCE_WAITING_SHIPMENT:
         raise ValueError(f"訂單 #{waiting_order_id} 不是待出貨單類型")
 
-    # Get source items
-    source_items = get_order_items(waiting_order_id)
+    order_date = datetime.now().strftime("%Y/%m/%d")
+    order_number = allocate_order_number(ORDER_SOURCE_SHIPMENT, order_date)
+
+    with db_manager.transaction():
+        # Get source items
+        source_items = get_order_items(waiting_order_id)
+
+        # Create shipment order
+        new_order_id = _create_new_order(
+            waiting_order_id,
+            ORDER_SOURCE_SHIPMENT,
+            order_number,
+            order_date,
+            items,
+        )
 
-    # Create shipment order
-    new_order_id, order_number, order_date = _create_new_order(
-        waiting_order_id,
-        ORDER_SOURCE_SHIPMENT,
-        items,
-    )
+        # Update source waiting order tracking fields
+        update_order_already_fields(waiting_order_id, order_date, str(order_number))
 
-    # Update source waiting order tracking fields
-    update_order_already_fields(waiting_order_id, order_date, order_number)
-
-    # Update stock quantities
-    for item in source_items:
-        if item.isbn and item.quantity:
-            # Decrease WaitingShipmentQuantity
-            update_waiting_shipment_quantity(item.isbn, -item.quantity)
-            # Decrease InStock
-            update_in_stock(item.isbn, -item.quantity)
-
-    return ConversionResultDTO(
-        source_order_id=waiting_order_id,
-        target_order_id=new_order_id,
-        target_order_number=order_number,
-        target_order_date=order_date,
-    )
+        # Decrease WaitingShipmentQuantity and InStock in one statement
+        deltas = []
+        for item in source_items:
+            if item.isbn and item.quantity:
+                deltas.append((item.isbn, "WaitingShipmentQuantity", -item.quantity))
+                deltas.append((item.isbn, "InStock", -item.quantity))
+        unmatched = apply_stock_deltas(deltas)
+
+        return ConversionResultDTO(
+            source_order_id=waiting_order_id,
+            target_order_id=new_order_id,
+            target_order_number=str(order_number),
+            target_order_date=order_date,
+            unmatched_isbns=unmatched or None,
+        )
 
 
 def convert_waiting_receipt_to_receipt(
@@ -401,30 +439,37 @@ def convert_waiting_receipt_to_receipt(
     if source_order.order_source != ORDER_SOURCE_WAITING_RECEIPT:
         raise ValueError(f"訂單 #{waiting_order_id} 不是待入倉單類型")
 
-    # Get source items
-    source_items = get_order_items(waiting_order_id)
+    order_date = datetime.now().strftime("%Y/%m/%d")
+    order_number = allocate_order_number(ORDER_SOURCE_RECEIPT, order_date)
+
+    with db_manager.transaction():
+        # Get source items
+        source_items = get_order_items(waiting_order_id)
+
+        # Create receipt order
+        new_order_id = _create_new_order(
+            waiting_order_id,
+            ORDER_SOURCE_RECEIPT,
+            order_number,
+            order_date,
+            items,
+        )
 
-    # Create receipt order
-    new_order_id, order_number, order_date = _create_new_order(
-        waiting_order_id,
-        ORDER_SOURCE_RECEIPT,
-        items,
-    )
+        # Update source waiting order tracking fields
+        update_order_already_fields(waiting_order_id, order_date, str(order_number))
 
-    # Update source waiting order tracking fields
-    update_order_already_fields(waiting_order_id, order_date, order_number)
-
-    # Update stock quantities
-    for item in source_items:
-        if item.isbn and item.quantity:
-            # Decrease WaitingIntoInStock
-            update_waiting_into_in_stock(item.isbn, -item.quantity)
-            # Increase InStock
-            update_in_stock(item.isbn, item.quantity)
-
-    return ConversionResultDTO(
-        source_order_id=waiting_order_id,
-        target_order_id=new_order_id,
-        target_order_number=order_number,
-        target_order_date=order_date,
-    )
+        # Decrease WaitingIntoInStock and increase InStock in one statement
+        deltas = []
+        for item in source_items:
+            if item.isbn and item.quantity:
+                deltas.append((item.isbn, "WaitingIntoInStock", -item.quantity))
+                deltas.append((item.isbn, "InStock", item.quantity))
+        unmatched = apply_stock_deltas(deltas)
+
+        return ConversionResultDTO(
+            source_order_id=waiting_order_id,
+            target_order_id=new_order_id,
+            target_order_number=str(order_number),
+            target_order_date=order_date,
+            unmatched_isbns=unmatched or None,
+        )
@@ -0,0 +1,176 @@
+"""Order number allocation service.
+
+Order numbers are bigint ``yyyymmdd`` + 4-digit sequence, counted per
+OrderSource and day. Sequences are reserved atomically in
+dbo.OrderNumberSequence (see doc/migration_add_order_number_sequence.sql)
+and handed out from an in-process block cache.
+"""
+
+import contextlib
+import logging
+import threading
+from datetime import datetime
+
+import pymssql
+
+from app.database.config import OrderNumberConfig
+from app.database.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+# Sequence numbers reserved per database round trip (see configure). Unused
+# numbers of a cached block are skipped when the process restarts. Writers
+# that still use MAX(OrderNumber) + 1 (the desktop client) can collide with
+# numbers that sit in a cached block, so larger blocks are opt-in.
+_block_size = OrderNumberConfig().block_size
+
+# 4-digit daily sequence
+MAX_DAILY_SEQUENCE = 9999
+
+_locks_guard = threading.Lock()
+# order_source -> lock guarding that source's cached block
+_locks: dict[int, threading.Lock] = {}
+# order_source -> (date_prefix, [next_seq, last_seq]) of its cached block
+_blocks: dict[int, tuple[str, list[int]]] = {}
+
+
+def configure(config: OrderNumberConfig) -> None:
+    """Apply order number settings; cached blocks of the old size are dropped."""
+    global _block_size
+    if config.block_size < 1:
+        raise ValueError("order_number.block_size must be at least 1")
+    # Hold every source lock (and the guard, so no new source appears) while
+    # the cache is swapped; allocators only ever hold one source lock
+    with _locks_guard, contextlib.ExitStack() as stack:
+        for lock in _locks.values():
+            stack.enter_context(lock)
+        _block_size = config.block_size
+        _blocks.clear()
+
+
+def _source_lock(order_source: int) -> threading.Lock:
+    with _locks_guard:
+        return _locks.setdefault(order_source, threading.Lock())
+
+
+def _date_prefix(order_date: str) -> str:
+    """Return the yyyymmdd prefix for an order date (yyyy/mm/dd or yyyy-mm-dd); today if unparsable."""
+    date_str = order_date.replace("-", "/")
+    try:
+        dt = datetime.strptime(date_str, "%Y/%m/%d")
+    except ValueError:
+        dt = datetime.now()
+    return dt.strftime("%Y%m%d")
+
+
+def _reserve(order_source: int, prefix: str, count: int) -> int:
+    """Reserve ``count`` sequence numbers in the database. Returns the last reserved sequence.
+
+    The counter row is bumped under UPDLOCK, and resynced with orders created
+    outside this allocator through a range seek on
+    [yyyymmdd0000, yyyymmdd9999]. Commits on its own connection before the
+    caller's unit of work starts, so reserved numbers stay reserved even if
+    that unit of work rolls back; READPAST keeps it from waiting on orders
+    other units of work have inserted but not committed yet.
+    """
+    base = int(prefix) * 10000
+    params = (
+        base, order_source, base, base + MAX_DAILY_SEQUENCE, count, order_source, prefix,
+        base, count, order_source, base, base + MAX_DAILY_SEQUENCE, order_source, prefix,
+    )
+    query = """SET NOCOUNT ON;
+        DECLARE @last int;
+        UPDATE s
+           SET @last = s.LastSeq = (
+                   SELECT MAX(v) FROM (VALUES
+                       (s.LastSeq),
+                       ((SELECT ISNULL(MAX(o.OrderNumber) - %s, 0) FROM dbo.Orders o WITH (READPAST)
+                          WHERE o.OrderSource = %s AND o.OrderNumber BETWEEN %s AND %s))
+                   ) AS x (v)
+               ) + %s
+          FROM dbo.OrderNumberSequence s WITH (UPDLOCK, ROWLOCK)
+         WHERE s.OrderSource = %s AND s.DatePrefix = %s;
+        IF @@ROWCOUNT = 0
+        BEGIN
+            SELECT @last = ISNULL(MAX(OrderNumber) - %s, 0) + %s
+              FROM dbo.Orders WITH (READPAST)
+             WHERE OrderSource = %s AND OrderNumber BETWEEN %s AND %s;
+            INSERT INTO dbo.OrderNumberSequence (OrderSource, DatePrefix, LastSeq)
+            VALUES (%s, %s, @last);
+        END
+        SELECT @last AS LastSeq;"""
+
+    for attempt in range(2):
+        try:
+            with db_manager.cursor() as cursor:
+                cursor.execute(query, params)
+                row = cursor.fetchone()
+            break
+        except pymssql.IntegrityError:
+            # Another request seeded the same (source, day) row first; retry takes the UPDATE path
+            if attempt:
+                raise
+
+    last = int(row["LastSeq"])
+    if last > MAX_DAILY_SEQUENCE:
+        raise ValueError(f"{prefix} 當日單號已用盡（OrderSource={order_source}）")
+    return last
+
+
+def allocate_order_numbers(order_source: int, order_date: str, count: int) -> list[int]:
+    """Allocate ``count`` unique order numbers for an order source and date.
+
+    Must be called before the unit of work that inserts the orders starts:
+    a reservation checks out its own pooled connection, which must not wait
+    on the pool while the caller already holds one.
+
+    Args:
+        order_source: OrderSource ordinal
+        order_date: Order date (yyyy/mm/dd or yyyy-mm-dd)
+        count: Number of order numbers to allocate
+
+    Returns:
+        List of bigint order numbers in ascending order
+
+    Raises:
+        RuntimeError: If called inside a db_manager.transaction()
+    """
+    if count < 1:
+        return []
+    if db_manager.in_transaction:
+        raise RuntimeError("Order numbers must be allocated before the unit of work starts")
+
+    prefix = _date_prefix(order_date)
+    base = int(prefix) * 10000
+    lock = _source_lock(order_source)
+
+    sequences = []
+    with lock:
+        cached = _blocks.get(order_source)
+        if cached and cached[0] == prefix:
+            block = cached[1]
+            take = min(count, block[1] - block[0] + 1)
+            sequences.extend(range(block[0], block[0] + take))
+            block[0] += take
+
+    missing = count - len(sequences)
+    if missing:
+        # The round trip runs without the lock; concurrent misses each reserve their own range
+        reserve = max(missing, _block_size)
+        last = _reserve(order_source, prefix, reserve)
+        first = last - reserve + 1
+        sequences.extend(range(first, first + missing))
+
+        if first + missing <= last:
+            with lock:
+                cached = _blocks.get(order_source)
+                # Keep a live block cached meanwhile; this remainder is then skipped
+                if not cached or cached[0] != prefix or cached[1][0] > cached[1][1]:
+                    _blocks[order_source] = (prefix, [first + missing, last])
+
+    return [base + seq for seq in sorted(sequences)]
+
+
+def allocate_order_number(order_source: int, order_date: str) -> int:
+    """Allocate a single order number for an order source and date. Returns bigint."""
+    return allocate_order_numbers(order_source, order_date, 1)[0]
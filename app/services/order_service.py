@@ -1,16 +1,25 @@
 """Order CRUD and query service."""
 
+import base64
+import json
 import logging
-from typing import Optional
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Optional, Sequence
 
+from app.database.batch import MAX_PARAMS, chunked, placeholders
 from app.database.connection import db_manager
 from app.models.order import (
     OrderDTO,
     OrderItemDTO,
     OrderReferenceDTO,
     OrderDetailDTO,
+    OrderLineageDTO,
+    OrderLineageEdgeDTO,
+    OrderLineageNodeDTO,
     OrderTraceabilityDTO,
 )
+from utils.lru_cache import LRUTTLCache
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +32,74 @@ ORDER_SOURCE_SHIPMENT = 4  # 出貨單
 ORDER_SOURCE_WAITING_RECEIPT = 5  # 待入倉單
 ORDER_SOURCE_RECEIPT = 6  # 進貨單
 
+# Read-through cache for order details, traceability and lineage. Entries are
+# tagged with every order id they contain and dropped by invalidate_order_cache().
+ORDER_CACHE_MAX_SIZE = 2048
+ORDER_CACHE_TTL = 300.0  # seconds
+order_cache = LRUTTLCache(max_size=ORDER_CACHE_MAX_SIZE, ttl=ORDER_CACHE_TTL)
+
+# Upper bound for ids in one get_order_details call
+MAX_ORDER_BATCH_SIZE = 1000
+
+# Lineage walks stay below SQL Server's default MAXRECURSION of 100
+MAX_LINEAGE_DEPTH = 50
+DEFAULT_LINEAGE_NODE_LIMIT = 200
+MAX_LINEAGE_NODE_LIMIT = 1000
+
+
+# DTO field -> column, so queries select only what the DTOs map
+ORDER_COLUMNS = {
+    "id": "id",
+    "order_number": "OrderNumber",
+    "order_date": "OrderDate",
+    "order_source": "OrderSource",
+    "object_id": "ObjectID",
+    "is_checkout": "isCheckout",
+    "number_of_items": "NumberOfItems",
+    "establish_source": "EstablishSource",
+    "is_borrowed": "isBorrowed",
+    "is_offset": "isOffset",
+    "remark": "Remark",
+    "cashier_remark": "CashierRemark",
+    "status": "status",
+    "waiting_order_date": "WaitingOrderDate",
+    "waiting_order_number": "WaitingOrderNumber",
+    "already_order_date": "AlreadyOrderDate",
+    "already_order_number": "AlreadyOrderNumber",
+}
+
+ORDER_ITEM_COLUMNS = {
+    "item_number": "ItemNumber",
+    "isbn": "ISBN",
+    "product_name": "ProductName",
+    "quantity": "Quantity",
+    "unit": "Unit",
+    "batch_price": "BatchPrice",
+    "single_price": "SinglePrice",
+    "pricing": "Pricing",
+    "price_amount": "PriceAmount",
+    "remark": "Remark",
+}
+
+ORDER_REFERENCE_COLUMNS = ("id", "Order_Id", "Order_Reference_Id", "SubBill_Reference_Id")
+
+
+def _order_columns(fields: Optional[set[str]] = None, alias: str = "") -> str:
+    """Select list for dbo.Orders, optionally narrowed to OrderDTO field names.
+
+    id and OrderDate are always selected; list_orders sorts and pages on them.
+    """
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(
+        prefix + column
+        for field, column in ORDER_COLUMNS.items()
+        if fields is None or field in fields or field in ("id", "order_date")
+    )
+
+
+def _item_columns() -> str:
+    return ", ".join(("Order_id", *ORDER_ITEM_COLUMNS.values()))
+
 
 def _row_to_order_dto(row: dict) -> OrderDTO:
     """Convert a database row to OrderDTO."""
@@ -32,11 +109,11 @@ def _row_to_order_dto(row: dict) -> OrderDTO:
         order_date=str(row.get("OrderDate")) if row.get("OrderDate") else None,
         order_source=row.get("OrderSource"),
         object_id=row.get("ObjectID"),
-        is_checkout=bool(row.get("isCheckout")),
+        is_checkout=bool(row["isCheckout"]) if "isCheckout" in row else None,
         number_of_items=row.get("NumberOfItems"),
         establish_source=row.get("EstablishSource"),
-        is_borrowed=bool(row.get("isBorrowed")),
-        is_offset=bool(row.get("isOffset")),
+        is_borrowed=bool(row["isBorrowed"]) if "isBorrowed" in row else None,
+        is_offset=bool(row["isOffset"]) if "isOffset" in row else None,
         remark=row.get("Remark"),
         cashier_remark=row.get("CashierRemark"),
         status=row.get("status"),
@@ -63,6 +140,16 @@ def _row_to_item_dto(row: dict) -> OrderItemDTO:
     )
 
 
+def _row_to_reference_dto(row: dict) -> OrderReferenceDTO:
+    """Convert a database row to OrderReferenceDTO."""
+    return OrderReferenceDTO(
+        id=row.get("id"),
+        order_id=row.get("Order_Id"),
+        order_reference_id=row.get("Order_Reference_Id"),
+        sub_bill_reference_id=row.get("SubBill_Reference_Id"),
+    )
+
+
 def get_order_by_id(order_id: int) -> Optional[OrderDTO]:
     """Get order by ID.
 
@@ -74,7 +161,7 @@ def get_order_by_id(order_id: int) -> Optional[OrderDTO]:
     """
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "SELECT * FROM dbo.Orders WHERE id = %s",
+            f"SELECT {_order_columns()} FROM dbo.Orders WHERE id = %s",
             (order_id,),
         )
         row = cursor.fetchone()
@@ -85,18 +172,21 @@ def get_order_by_id(order_id: int) -> Optional[OrderDTO]:
     return _row_to_order_dto(row)
 
 
-def get_order_items(order_id: int) -> list[OrderItemDTO]:
+def get_order_items(order_id: int, for_update: bool = False) -> list[OrderItemDTO]:
     """Get items for an order.
 
     Args:
         order_id: Order ID
+        for_update: Read under UPDLOCK/HOLDLOCK, so inside a transaction the
+            items cannot change until it commits
 
     Returns:
         List of OrderItemDTO
     """
+    hint = " WITH (UPDLOCK, HOLDLOCK)" if for_update else ""
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "SELECT * FROM dbo.Orders_Items WHERE Order_id = %s ORDER BY ItemNumber",
+            f"SELECT {_item_columns()} FROM dbo.Orders_Items{hint} WHERE Order_id = %s ORDER BY ItemNumber",
             (order_id,),
         )
         rows = cursor.fetchall()
@@ -115,20 +205,118 @@ def get_order_references(order_id: int) -> list[OrderReferenceDTO]:
     """
     with db_manager.cursor() as cursor:
         cursor.execute(
-            "SELECT * FROM dbo.Orders_Reference WHERE Order_Id = %s",
+            f"SELECT {', '.join(ORDER_REFERENCE_COLUMNS)} FROM dbo.Orders_Reference WHERE Order_Id = %s",
             (order_id,),
         )
         rows = cursor.fetchall()
 
-    return [
-        OrderReferenceDTO(
-            id=row.get("id"),
-            order_id=row.get("Order_Id"),
-            order_reference_id=row.get("Order_Reference_Id"),
-            sub_bill_reference_id=row.get("SubBill_Reference_Id"),
+    return [_row_to_reference_dto(row) for row in rows]
+
+
+def invalidate_order_cache(*order_ids: Optional[int]) -> None:
+    """Drop cached details, traceability and lineage entries that include any of the orders.
+
+    Inside a unit of work the entries are dropped again after it commits, so
+    a concurrent reader can't re-cache the pre-commit rows in between.
+    """
+    def invalidate():
+        for order_id in order_ids:
+            if order_id is not None:
+                order_cache.invalidate_tag(order_id)
+
+    invalidate()
+    if db_manager.in_transaction:
+        db_manager.after_commit(invalidate)
+
+
+def _cache_put(key: tuple, value, order_ids, generation: int) -> None:
+    # Rows read inside a unit of work may never be committed
+    if not db_manager.in_transaction:
+        order_cache.put(key, value, tags=set(order_ids), generation=generation)
+
+
+def load_order_details(order_ids: Sequence[int]) -> dict[int, OrderDetailDTO]:
+    """Load orders with their items and references, keyed by order id.
+
+    Each chunk of ids is one batch of three SELECTs (orders, items,
+    references) read back with cursor.nextset(), so any number of orders
+    costs one round trip per chunk. Ids that don't exist are absent from
+    the result.
+
+    Args:
+        order_ids: Order IDs (duplicates are ignored)
+
+    Returns:
+        Dict of order id -> OrderDetailDTO
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+    orders: dict[int, OrderDTO] = {}
+    items_by_order: dict[int, list[OrderItemDTO]] = defaultdict(list)
+    references_by_order: dict[int, list[OrderReferenceDTO]] = defaultdict(list)
+
+    with db_manager.cursor() as cursor:
+        # The id list is bound once per SELECT
+        for chunk in chunked(unique_ids, MAX_PARAMS // 3):
+            in_list = placeholders(len(chunk))
+            cursor.execute(
+                f"""SELECT {_order_columns()} FROM dbo.Orders WHERE id IN ({in_list});
+                    SELECT {_item_columns()} FROM dbo.Orders_Items
+                     WHERE Order_id IN ({in_list}) ORDER BY Order_id, ItemNumber;
+                    SELECT {', '.join(ORDER_REFERENCE_COLUMNS)} FROM dbo.Orders_Reference
+                     WHERE Order_Id IN ({in_list});""",
+                tuple(chunk) * 3,
+            )
+            for row in cursor.fetchall():
+                orders[row["id"]] = _row_to_order_dto(row)
+            cursor.nextset()
+            for row in cursor.fetchall():
+                items_by_order[row["Order_id"]].append(_row_to_item_dto(row))
+            cursor.nextset()
+            for row in cursor.fetchall():
+                references_by_order[row["Order_Id"]].append(_row_to_reference_dto(row))
+
+    return {
+        order_id: OrderDetailDTO(
+            order=order,
+            items=items_by_order.get(order_id, []),
+            references=references_by_order.get(order_id, []),
         )
-        for row in rows
-    ]
+        for order_id, order in orders.items()
+    }
+
+
+def get_order_details(order_ids: Sequence[int]) -> tuple[list[OrderDetailDTO], list[int]]:
+    """Get full order details for several orders.
+
+    Args:
+        order_ids: Order IDs, at most MAX_ORDER_BATCH_SIZE distinct ones
+
+    Returns:
+        Tuple of (details in request order, ids that were not found)
+    """
+    unique_ids = list(dict.fromkeys(order_ids))
+    if len(unique_ids) > MAX_ORDER_BATCH_SIZE:
+        raise ValueError(f"一次最多查詢 {MAX_ORDER_BATCH_SIZE} 筆訂單")
+
+    generation = order_cache.generation
+    details = {}
+    misses = []
+    for order_id in unique_ids:
+        detail = order_cache.get(("detail", order_id))
+        if detail is None:
+            misses.append(order_id)
+        else:
+            details[order_id] = detail
+
+    if misses:
+        loaded = load_order_details(misses)
+        for order_id, detail in loaded.items():
+            _cache_put(("detail", order_id), detail, (order_id,), generation)
+        details.update(loaded)
+
+    found = [details[order_id] for order_id in unique_ids if order_id in details]
+    missing = [order_id for order_id in unique_ids if order_id not in details]
+    return found, missing
 
 
 def get_order_detail(order_id: int) -> Optional[OrderDetailDTO]:
@@ -140,18 +328,40 @@ def get_order_detail(order_id: int) -> Optional[OrderDetailDTO]:
     Returns:
         OrderDetailDTO or None if not found
     """
-    order = get_order_by_id(order_id)
-    if not order:
-        return None
-
-    items = get_order_items(order_id)
-    references = get_order_references(order_id)
-
-    return OrderDetailDTO(
-        order=order,
-        items=items,
-        references=references,
-    )
+    found, _ = get_order_details([order_id])
+    return found[0] if found else None
+
+
+def _encode_order_cursor(row: dict) -> str:
+    """Encode the (OrderDate, id) keyset position of a row as an opaque cursor token."""
+    order_date = row.get("OrderDate")
+    if isinstance(order_date, datetime):
+        key = {"t": "datetime", "v": order_date.isoformat()}
+    elif isinstance(order_date, date):
+        key = {"t": "date", "v": order_date.isoformat()}
+    elif order_date is None:
+        key = {"t": "null", "v": None}
+    else:
+        key = {"t": "str", "v": str(order_date)}
+    key["id"] = row["id"]
+    payload = json.dumps(key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+
+def _decode_order_cursor(token: str) -> tuple[object, int]:
+    """Decode a cursor token into (OrderDate, id). Raises ValueError if malformed."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(token.encode("ascii")))
+        kind, value, order_id = key["t"], key["v"], int(key["id"])
+        if kind == "datetime":
+            return datetime.fromisoformat(value), order_id
+        if kind == "date":
+            return date.fromisoformat(value), order_id
+        if kind == "null":
+            return None, order_id
+        return str(value), order_id
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("分頁游標格式錯誤") from e
 
 
 def list_orders(
@@ -162,20 +372,31 @@ def list_orders(
     status: Optional[int] = None,
     page: int = 1,
     page_size: int = 20,
-) -> tuple[list[OrderDTO], int]:
+    cursor: Optional[str] = None,
+    include_total: bool = True,
+    fields: Optional[set[str]] = None,
+) -> tuple[list[OrderDTO], Optional[int], Optional[str]]:
     """List orders with filtering and pagination.
 
+    Orders are sorted by OrderDate DESC, id DESC. Passing the ``cursor``
+    returned with the previous page seeks straight to the next one on
+    (OrderDate, id); otherwise ``page`` is applied with OFFSET. The total is
+    computed with COUNT(*) OVER() in the same statement.
+
     Args:
         order_source: Filter by order source
         object_id: Filter by customer/supplier ID
         start_date: Filter by start date (inclusive)
         end_date: Filter by end date (inclusive)
         status: Filter by status
-        page: Page number (1-based)
+        page: Page number (1-based), ignored when cursor is given
         page_size: Page size
+        cursor: Cursor token of the next page, from a previous call
+        include_total: False skips counting the matching orders
+        fields: OrderDTO field names to select; None selects all
 
     Returns:
-        Tuple of (list of OrderDTO, total count)
+        Tuple of (list of OrderDTO, total count or None, next page cursor or None)
     """
     conditions = []
     params = []
@@ -201,29 +422,59 @@ def list_orders(
         params.append(status)
 
     where_clause = " AND ".join(conditions) if conditions else "1=1"
-
-    # Get total count
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            f"SELECT COUNT(*) AS cnt FROM dbo.Orders WHERE {where_clause}",
-            tuple(params),
-        )
-        total = cursor.fetchone()["cnt"]
-
-    # Get page of results
-    offset = (page - 1) * page_size
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            f"""SELECT * FROM dbo.Orders
-                WHERE {where_clause}
-                ORDER BY OrderDate DESC, id DESC
-                OFFSET %s ROWS FETCH NEXT %s ROWS ONLY""",
-            tuple(params) + (offset, page_size),
-        )
-        rows = cursor.fetchall()
+    columns = _order_columns(fields)
+    total_column = ", COUNT(*) OVER() AS TotalCount" if include_total else ""
+
+    # One extra row tells whether a next page exists
+    if cursor:
+        after_date, after_id = _decode_order_cursor(cursor)
+        if after_date is None:
+            # NULL dates sort last in DESC order
+            seek = "o.OrderDate IS NULL AND o.id < %s"
+            seek_params = (after_id,)
+        else:
+            seek = "o.OrderDate < %s OR (o.OrderDate = %s AND o.id < %s) OR o.OrderDate IS NULL"
+            seek_params = (after_date, after_date, after_id)
+        # The window runs in the derived table so the total covers every match, not just the rest
+        query = f"""SELECT TOP ({page_size + 1}) * FROM (
+                        SELECT {columns}{total_column} FROM dbo.Orders WHERE {where_clause}
+                    ) o
+                    WHERE {seek}
+                    ORDER BY o.OrderDate DESC, o.id DESC"""
+        query_params = tuple(params) + seek_params
+    else:
+        offset = (page - 1) * page_size
+        query = f"""SELECT {columns}{total_column} FROM dbo.Orders
+                    WHERE {where_clause}
+                    ORDER BY OrderDate DESC, id DESC
+                    OFFSET %s ROWS FETCH NEXT %s ROWS ONLY"""
+        query_params = tuple(params) + (offset, page_size + 1)
+
+    with db_manager.cursor() as db_cursor:
+        db_cursor.execute(query, query_params)
+        rows = db_cursor.fetchall()
+
+        total = None
+        if include_total:
+            if rows:
+                total = rows[0]["TotalCount"]
+            elif cursor or page > 1:
+                # Past the last page the window has no row to ride on
+                db_cursor.execute(
+                    f"SELECT COUNT(*) AS cnt FROM dbo.Orders WHERE {where_clause}",
+                    tuple(params),
+                )
+                total = db_cursor.fetchone()["cnt"]
+            else:
+                total = 0
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = _encode_order_cursor(rows[-1])
 
     orders = [_row_to_order_dto(row) for row in rows]
-    return orders, total
+    return orders, total, next_cursor
 
 
 def get_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
@@ -235,6 +486,20 @@ def get_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
     Returns:
         OrderTraceabilityDTO with source and derived orders
     """
+    key = ("traceability", order_id)
+    traceability = order_cache.get(key)
+    if traceability is not None:
+        return traceability
+
+    generation = order_cache.generation
+    traceability = _load_order_traceability(order_id)
+    if traceability is not None:
+        related = [order.id for order in traceability.source_orders + traceability.derived_orders]
+        _cache_put(key, traceability, [order_id, *related], generation)
+    return traceability
+
+
+def _load_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
     current = get_order_by_id(order_id)
     if not current:
         return None
@@ -242,7 +507,7 @@ def get_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
     # Get orders this one was derived from (source orders)
     with db_manager.cursor() as cursor:
         cursor.execute(
-            """SELECT o.* FROM dbo.Orders o
+            f"""SELECT {_order_columns(alias="o")} FROM dbo.Orders o
                INNER JOIN dbo.Orders_Reference r ON o.id = r.Order_Reference_Id
                WHERE r.Order_Id = %s AND r.Order_Reference_Id IS NOT NULL""",
             (order_id,),
@@ -252,7 +517,7 @@ def get_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
     # Get orders derived from this one
     with db_manager.cursor() as cursor:
         cursor.execute(
-            """SELECT o.* FROM dbo.Orders o
+            f"""SELECT {_order_columns(alias="o")} FROM dbo.Orders o
                INNER JOIN dbo.Orders_Reference r ON o.id = r.Order_Id
                WHERE r.Order_Reference_Id = %s""",
             (order_id,),
@@ -269,6 +534,110 @@ def get_order_traceability(order_id: int) -> Optional[OrderTraceabilityDTO]:
     )
 
 
+def get_order_lineage(
+    order_id: int,
+    depth: int = MAX_LINEAGE_DEPTH,
+    node_limit: int = DEFAULT_LINEAGE_NODE_LIMIT,
+) -> Optional[OrderLineageDTO]:
+    """Get the order graph connected to an order through Orders_Reference.
+
+    A recursive CTE walks references in both directions (sources and
+    derivations) up to ``depth`` hops. Each walk path carries the ids it has
+    visited, so cycles are cut off. Nodes are kept nearest-first up to
+    ``node_limit``. Nodes and the edges between them come back as two result
+    sets of one batch.
+
+    Args:
+        order_id: Root order ID
+        depth: Maximum hops from the root (capped at MAX_LINEAGE_DEPTH)
+        node_limit: Maximum number of orders returned (capped at MAX_LINEAGE_NODE_LIMIT)
+
+    Returns:
+        OrderLineageDTO, or None if the root order does not exist
+    """
+    depth = max(0, min(depth, MAX_LINEAGE_DEPTH))
+    node_limit = max(1, min(node_limit, MAX_LINEAGE_NODE_LIMIT))
+
+    key = ("lineage", order_id, depth, node_limit)
+    lineage = order_cache.get(key)
+    if lineage is not None:
+        return lineage
+
+    generation = order_cache.generation
+    lineage = _load_order_lineage(order_id, depth, node_limit)
+    if lineage is not None:
+        _cache_put(key, lineage, [node.id for node in lineage.nodes], generation)
+    return lineage
+
+
+def _load_order_lineage(order_id: int, depth: int, node_limit: int) -> Optional[OrderLineageDTO]:
+    with db_manager.cursor() as cursor:
+        cursor.execute(
+            f"""SET NOCOUNT ON;
+            DECLARE @nodes TABLE (id int PRIMARY KEY, Depth int NOT NULL);
+
+            WITH walk (id, Depth, Path) AS (
+                SELECT CAST(o.id AS int), 0, CAST('/' + CAST(o.id AS varchar(20)) + '/' AS varchar(max))
+                  FROM dbo.Orders o
+                 WHERE o.id = %s
+                UNION ALL
+                -- Source orders this one was derived from
+                SELECT CAST(r.Order_Reference_Id AS int), w.Depth + 1, w.Path + CAST(r.Order_Reference_Id AS varchar(20)) + '/'
+                  FROM walk w
+                  INNER JOIN dbo.Orders_Reference r ON r.Order_Id = w.id
+                 WHERE r.Order_Reference_Id IS NOT NULL
+                   AND w.Depth < %s
+                   AND w.Path NOT LIKE '%%/' + CAST(r.Order_Reference_Id AS varchar(20)) + '/%%'
+                UNION ALL
+                -- Orders derived from this one
+                SELECT CAST(r.Order_Id AS int), w.Depth + 1, w.Path + CAST(r.Order_Id AS varchar(20)) + '/'
+                  FROM walk w
+                  INNER JOIN dbo.Orders_Reference r ON r.Order_Reference_Id = w.id
+                 WHERE w.Depth < %s
+                   AND w.Path NOT LIKE '%%/' + CAST(r.Order_Id AS varchar(20)) + '/%%'
+            )
+            INSERT INTO @nodes (id, Depth)
+            SELECT TOP (%s) id, MIN(Depth)
+              FROM walk
+             GROUP BY id
+             ORDER BY MIN(Depth), id;
+
+            SELECT {_order_columns(alias="o")}, n.Depth AS LineageDepth
+              FROM @nodes n
+              INNER JOIN dbo.Orders o ON o.id = n.id
+             ORDER BY n.Depth, n.id;
+
+            SELECT r.Order_Id, r.Order_Reference_Id
+              FROM dbo.Orders_Reference r
+              INNER JOIN @nodes a ON a.id = r.Order_Id
+              INNER JOIN @nodes b ON b.id = r.Order_Reference_Id;""",
+            # One extra node tells whether the graph was cut at node_limit
+            (order_id, depth, depth, node_limit + 1),
+        )
+        node_rows = cursor.fetchall()
+        cursor.nextset()
+        edge_rows = cursor.fetchall()
+
+    if not node_rows:
+        return None
+
+    truncated = len(node_rows) > node_limit
+    node_rows = node_rows[:node_limit]
+    kept_ids = {row["id"] for row in node_rows}
+
+    nodes = [
+        OrderLineageNodeDTO(**_row_to_order_dto(row).model_dump(), depth=row["LineageDepth"])
+        for row in node_rows
+    ]
+    edges = [
+        OrderLineageEdgeDTO(order_id=row["Order_Id"], order_reference_id=row["Order_Reference_Id"])
+        for row in edge_rows
+        if row["Order_Id"] in kept_ids and row["Order_Reference_Id"] in kept_ids
+    ]
+
+    return OrderLineageDTO(root_order_id=order_id, nodes=nodes, edges=edges, truncated=truncated)
+
+
 def update_order_waiting_fields(
     order_id: int,
     waiting_order_date: str,
@@ -282,7 +651,7 @@ def update_order_waiting_fields(
         waiting_order_number: Number of waiting order
 
     Returns:
-        True if update succeeded
+        True if update succeeded; inside db_manager.transaction() failures raise instead
     """
     try:
         with db_manager.cursor() as cursor:
@@ -292,10 +661,13 @@ def update_order_waiting_fields(
                    WHERE id = %s""",
                 (waiting_order_date, waiting_order_number, order_id),
             )
+        invalidate_order_cache(order_id)
         logger.info("Updated waiting fields for order %d", order_id)
         return True
     except Exception as e:
         logger.error("Failed to update waiting fields for order %d: %s", order_id, e)
+        if db_manager.in_transaction:
+            raise
         return False
 
 
@@ -312,7 +684,7 @@ def update_order_already_fields(
         already_order_number: Number of already order
 
     Returns:
-        True if update succeeded
+        True if update succeeded; inside db_manager.transaction() failures raise instead
     """
     try:
         with db_manager.cursor() as cursor:
@@ -322,10 +694,13 @@ def update_order_already_fields(
                    WHERE id = %s""",
                 (already_order_date, already_order_number, order_id),
             )
+        invalidate_order_cache(order_id)
         logger.info("Updated already fields for order %d", order_id)
         return True
     except Exception as e:
         logger.error("Failed to update already fields for order %d: %s", order_id, e)
+        if db_manager.in_transaction:
+            raise
         return False
 
 
@@ -342,7 +717,7 @@ def create_order_reference(
         sub_bill_reference_id: The referenced sub-bill ID
 
     Returns:
-        True if insert succeeded
+        True if insert succeeded; inside db_manager.transaction() failures raise instead
     """
     try:
         with db_manager.cursor() as cursor:
@@ -352,6 +727,7 @@ def create_order_reference(
                    VALUES (%s, %s, %s)""",
                 (order_id, order_reference_id, sub_bill_reference_id),
             )
+        invalidate_order_cache(order_id, order_reference_id)
         logger.info(
             "Created order reference: %d -> %s (sub: %s)",
             order_id,
@@ -361,4 +737,6 @@ def create_order_reference(
         return True
     except Exception as e:
         logger.error("Failed to create order reference: %s", e)
+        if db_manager.in_transaction:
+            raise
         return False
@@ -0,0 +1,215 @@
+"""Content-addressed picture store on local disk.
+
+Pictures are stored once per distinct content under
+``data/pictures/<first two hex digits>/<sha256 hex>`` and referenced from
+the database as ``sha256:<hex>`` (Orders_Picture.Picture,
+CheckStore.Picture1..3) instead of base64 text.
+"""
+
+import base64
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
+
+from app.database.connection import db_manager
+
+logger = logging.getLogger(__name__)
+
+PICTURE_DIR = Path(__file__).parent.parent.parent / "data" / "pictures"
+
+PICTURE_REF_PREFIX = "sha256:"
+
+# Largest picture accepted, in bytes
+MAX_PICTURE_SIZE = 20 * 1024 * 1024
+
+# Read/write granularity for streaming pictures to and from disk
+PICTURE_CHUNK_SIZE = 64 * 1024
+
+_HASH_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes -> media type, for the formats the ERP client accepts
+_MAGIC_TYPES = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+]
+
+
+def is_picture_hash(value: str) -> bool:
+    return bool(_HASH_PATTERN.match(value))
+
+
+def parse_picture_ref(value: Optional[str]) -> Optional[str]:
+    """Hex digest of a ``sha256:<hex>`` reference, or None if ``value`` is not one."""
+    if not value or not value.startswith(PICTURE_REF_PREFIX):
+        return None
+    digest = value[len(PICTURE_REF_PREFIX):].strip().lower()
+    return digest if is_picture_hash(digest) else None
+
+
+def picture_path(digest: str) -> Path:
+    return PICTURE_DIR / digest[:2] / digest
+
+
+def picture_exists(digest: str) -> bool:
+    return is_picture_hash(digest) and picture_path(digest).is_file()
+
+
+def _spool_picture(chunks: Iterable[bytes]) -> tuple[str, str]:
+    """Hash picture content while writing it to a temporary file in PICTURE_DIR.
+
+    Returns:
+        Tuple of (sha256 hex digest, temporary file path)
+
+    Raises:
+        ValueError: If the content is empty or larger than MAX_PICTURE_SIZE
+    """
+    PICTURE_DIR.mkdir(parents=True, exist_ok=True)
+    sha256 = hashlib.sha256()
+    size = 0
+    fd, temp_path = tempfile.mkstemp(dir=PICTURE_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            for chunk in chunks:
+                if chunk:
+                    size += len(chunk)
+                    if size > MAX_PICTURE_SIZE:
+                        raise ValueError(f"圖片大小超過上限 {MAX_PICTURE_SIZE // (1024 * 1024)} MB")
+                    sha256.update(chunk)
+                    temp_file.write(chunk)
+        if size == 0:
+            raise ValueError("圖片內容不能為空")
+        return sha256.hexdigest(), temp_path
+    except BaseException:
+        _discard_temp(temp_path)
+        raise
+
+
+def _discard_temp(temp_path: str) -> None:
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+
+
+def _publish_picture(digest: str, temp_path: str) -> None:
+    """Move a spooled picture into the store; content already there is not written twice."""
+    path = picture_path(digest)
+    if path.exists():
+        _discard_temp(temp_path)
+    else:
+        path.parent.mkdir(exist_ok=True)
+        os.replace(temp_path, path)
+        logger.info("Picture stored - sha256: %s, size: %d", digest, path.stat().st_size)
+
+
+def store_picture_chunks(chunks: Iterable[bytes]) -> str:
+    """Write picture content to the store and return its ``sha256:<hex>`` reference.
+
+    The content is hashed while it is spooled to a temporary file, which is
+    then renamed into place. Inside a db_manager.transaction() the rename
+    waits until the unit of work commits and a rollback deletes the file,
+    so rows that are never written leave no pictures behind.
+
+    Raises:
+        ValueError: If the content is empty or larger than MAX_PICTURE_SIZE
+    """
+    digest, temp_path = _spool_picture(chunks)
+    if db_manager.in_transaction:
+        db_manager.after_commit(lambda: _publish_picture(digest, temp_path))
+        db_manager.after_rollback(lambda: _discard_temp(temp_path))
+    else:
+        _publish_picture(digest, temp_path)
+    return PICTURE_REF_PREFIX + digest
+
+
+def store_picture_file(file: BinaryIO) -> str:
+    """Store the remaining content of a binary file object, read in chunks."""
+    return store_picture_chunks(iter(lambda: file.read(PICTURE_CHUNK_SIZE), b""))
+
+
+def decode_base64_picture(value: str) -> bytes:
+    """Decode a base64 picture, with or without a ``data:image/...;base64,`` prefix.
+
+    Raises:
+        ValueError: If the value is not valid base64
+    """
+    if "," in value:
+        value = value.split(",", 1)[1]
+    try:
+        return base64.b64decode("".join(value.split()), validate=True)
+    except ValueError:
+        raise ValueError("圖片 Base64 格式錯誤")
+
+
+def prepare_picture(value: str) -> Union[str, bytes]:
+    """Validate a base64 picture or picture reference without storing anything.
+
+    Lets callers check every picture of a row before the first one is
+    written.
+
+    Returns:
+        The normalized reference for an already stored picture, otherwise
+        the decoded picture content
+
+    Raises:
+        ValueError: If the value is neither a valid picture nor a known reference
+    """
+    value = value.strip()
+    if value.startswith(PICTURE_REF_PREFIX):
+        digest = parse_picture_ref(value)
+        if digest is None or not picture_exists(digest):
+            raise ValueError(f"圖片不存在：{value}")
+        return PICTURE_REF_PREFIX + digest
+    content = decode_base64_picture(value)
+    if not content:
+        raise ValueError("圖片內容不能為空")
+    if len(content) > MAX_PICTURE_SIZE:
+        raise ValueError(f"圖片大小超過上限 {MAX_PICTURE_SIZE // (1024 * 1024)} MB")
+    return content
+
+
+def store_prepared_picture(prepared: Union[str, bytes]) -> str:
+    """Store the result of prepare_picture and return its reference."""
+    if isinstance(prepared, str):
+        return prepared
+    return store_picture_chunks([prepared])
+
+
+def picture_media_type(digest: str) -> str:
+    """Media type of a stored picture, sniffed from its first bytes."""
+    with open(picture_path(digest), "rb") as f:
+        head = f.read(16)
+    return sniff_media_type(head)
+
+
+def sniff_media_type(head: bytes) -> str:
+    for magic, media_type in _MAGIC_TYPES:
+        if head.startswith(magic):
+            return media_type
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """True if an If-None-Match header value matches ``etag`` (weak comparison)."""
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*" or candidate.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+def iter_picture(digest: str) -> Iterator[bytes]:
+    """Yield a stored picture's content in PICTURE_CHUNK_SIZE chunks."""
+    with open(picture_path(digest), "rb") as f:
+        while True:
+            chunk = f.read(PICTURE_CHUNK_SIZE)
+            if not chunk:
+                break
+            yield chunk
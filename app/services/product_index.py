@@ -0,0 +1,145 @@
+"""In-process product search index.
+
+Mirrors the rows of the product search join so /api/product/list can answer
+ISBN prefix, FirmCode substring and product name keyword searches without a
+round trip. product_service loads and refreshes it; this module only holds
+the data structures.
+"""
+
+import bisect
+import threading
+from typing import Optional
+
+from app.models.product import ProductDTO
+from utils.ngram_index import NgramIndex
+
+# LIKE wildcards; search terms containing them are left to the database
+_LIKE_WILDCARDS = frozenset("%_[")
+
+
+def _has_wildcard(term: str) -> bool:
+    return any(ch in _LIKE_WILDCARDS for ch in term)
+
+
+class ProductSearchIndex:
+    """Products keyed by Store.id with ISBN prefix and n-gram substring lookups.
+
+    Matching follows product_service._build_search_query: ISBN LIKE 'x%',
+    FirmCode LIKE '%x%', any of the ProductName keywords, or every product
+    with a FirmCode when no filter is given. Comparisons are case-insensitive
+    like the database collation.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._products: dict[int, ProductDTO] = {}
+        # Sorted (casefolded ISBN, store id) pairs for bisect prefix search
+        self._isbns: list[tuple[str, int]] = []
+        self._names = NgramIndex()
+        # Only rows with a non-NULL FirmCode are indexed here
+        self._firm_codes = NgramIndex()
+        self._ready = False
+
+    @property
+    def ready(self) -> bool:
+        return self._ready
+
+    def __len__(self) -> int:
+        return len(self._products)
+
+    def _remove(self, store_id: int) -> None:
+        dto = self._products.pop(store_id, None)
+        if dto is None:
+            return
+        entry = (dto.isbn.casefold(), store_id)
+        pos = bisect.bisect_left(self._isbns, entry)
+        if pos < len(self._isbns) and self._isbns[pos] == entry:
+            del self._isbns[pos]
+        self._names.remove(store_id)
+        self._firm_codes.remove(store_id)
+
+    def _add(self, store_id: int, dto: ProductDTO, firm_code: Optional[str]) -> None:
+        self._products[store_id] = dto
+        self._names.add(store_id, dto.product_name)
+        if firm_code is not None:
+            self._firm_codes.add(store_id, firm_code)
+
+    def replace_all(self, products: list[tuple[int, ProductDTO, Optional[str]]]) -> None:
+        """Rebuild from (store id, dto, raw FirmCode) tuples and mark the index ready."""
+        with self._lock:
+            self._products.clear()
+            self._names.clear()
+            self._firm_codes.clear()
+            for store_id, dto, firm_code in products:
+                self._add(store_id, dto, firm_code)
+            self._isbns = sorted((dto.isbn.casefold(), store_id) for store_id, dto in self._products.items())
+            self._ready = True
+
+    def upsert(self, products: list[tuple[int, ProductDTO, Optional[str]]]) -> None:
+        """Insert or replace (store id, dto, raw FirmCode) tuples."""
+        with self._lock:
+            for store_id, dto, firm_code in products:
+                self._remove(store_id)
+                self._add(store_id, dto, firm_code)
+                bisect.insort(self._isbns, (dto.isbn.casefold(), store_id))
+
+    def retain(self, store_ids: set[int]) -> int:
+        """Drop products whose store id is not in ``store_ids``. Returns the number dropped."""
+        with self._lock:
+            stale = [store_id for store_id in self._products if store_id not in store_ids]
+            for store_id in stale:
+                self._remove(store_id)
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._products.clear()
+            self._isbns = []
+            self._names.clear()
+            self._firm_codes.clear()
+            self._ready = False
+
+    def search(self, isbn: Optional[str], firm_code: Optional[str],
+               product_name: Optional[str]) -> Optional[list[tuple[int, ProductDTO]]]:
+        """Return matching (store id, dto) pairs ordered by store id.
+
+        Returns None when the index cannot answer (not loaded yet, or a term
+        contains LIKE wildcards) and the caller should query the database.
+        """
+        if not self._ready:
+            return None
+
+        if isbn:
+            if _has_wildcard(isbn):
+                return None
+            prefix = isbn.casefold()
+            with self._lock:
+                pos = bisect.bisect_left(self._isbns, (prefix,))
+                ids = set()
+                for value, store_id in self._isbns[pos:]:
+                    if not value.startswith(prefix):
+                        break
+                    ids.add(store_id)
+                return self._collect(ids)
+
+        if firm_code:
+            if _has_wildcard(firm_code):
+                return None
+            with self._lock:
+                return self._collect(self._firm_codes.search(firm_code))
+
+        if product_name:
+            keywords = product_name.strip().split()
+            if any(_has_wildcard(kw) for kw in keywords):
+                return None
+            with self._lock:
+                ids = set()
+                for kw in keywords:
+                    ids |= self._names.search(kw)
+                return self._collect(ids)
+
+        with self._lock:
+            return self._collect(self._firm_codes.keys())
+
+    def _collect(self, ids) -> list[tuple[int, ProductDTO]]:
+        return [(store_id, self._products[store_id]) for store_id in sorted(ids)]
@@ -1,11 +1,26 @@
 import logging
-from typing import Optional
+import threading
+from typing import Iterator, Optional
 
 from app.database.connection import db_manager
 from app.models.product import ProductDTO
+from app.services.product_index import ProductSearchIndex
 
 logger = logging.getLogger(__name__)
 
+# Upper bound for one page of get_product_list
+MAX_PAGE_SIZE = 1000
+
+# Rows fetched per round trip by iter_product_list and the search index loader
+STREAM_BATCH_SIZE = 500
+
+# Optional in-process index consulted before the database (see start_search_index)
+search_index = ProductSearchIndex()
+_index_updated_since = None  # highest store_date.UpdateDate seen by the index
+_index_max_id = 0  # highest Store.id seen by the index
+_index_stop: Optional[threading.Event] = None
+_index_thread: Optional[threading.Thread] = None
+
 
 def _round_price(value) -> str:
     """Round a numeric value to string, matching Java ToolKit.RoundingString."""
@@ -20,24 +35,63 @@ def _round_price(value) -> str:
         return "0"
 
 
-def _build_search_query(isbn: Optional[str], firm_code: Optional[str], product_name: Optional[str]) -> tuple[str, list]:
+# ProductDTO field -> column. The names are unique across the joined tables,
+# so they are selected unqualified.
+PRODUCT_COLUMNS = {
+    "isbn": "ISBN",
+    "international_code": "InternationalCode",
+    "firm_code": "FirmCode",
+    "product_code": "ProductCode",
+    "product_name": "ProductName",
+    "unit": "Unit",
+    "vendor_code": "VendorCode",
+    "vendor_name": "Vendor",
+    "first_category": "NewFirstCategory",
+    "second_category": "NewSecondCategory",
+    "third_category": "NewThirdCategory",
+    "batch_price": "BatchPrice",
+    "single_price": "SinglePrice",
+    "pricing": "Pricing",
+    "vip_price1": "VipPrice1",
+    "vip_price2": "VipPrice2",
+    "vip_price3": "VipPrice3",
+    "in_stock": "InStock",
+    "safety_stock": "SafetyStock",
+    "discount": "Discount",
+}
+
+_SEARCH_JOINS = (
+    "FROM Store A "
+    "INNER JOIN store_price B ON A.id = B.store_id "
+    "INNER JOIN store_category C ON A.id = C.store_id "
+    "INNER JOIN store_date D ON A.id = D.store_id "
+    "INNER JOIN ProductPicture E ON A.id = E.store_id "
+    "INNER JOIN ProductBookCase F ON A.id = F.store_id"
+)
+
+
+def _search_columns(fields: Optional[set[str]] = None) -> str:
+    """Select list for the search join, optionally narrowed to ProductDTO field names."""
+    columns = [column for field, column in PRODUCT_COLUMNS.items() if fields is None or field in fields]
+    columns.append("A.id AS StoreId")
+    return ", ".join(columns)
+
+
+def _build_search_query(isbn: Optional[str], firm_code: Optional[str], product_name: Optional[str],
+                        after_id: Optional[int] = None, limit: Optional[int] = None,
+                        ordered: bool = False, fields: Optional[set[str]] = None) -> tuple[str, list]:
     """Build the product search SQL query matching Java Product_Model.generateSearchProductQuery.
 
     Returns (query_string, params).
     Uses parameterized queries for safety.
+
+    ``after_id``/``limit`` turn it into a keyset page ordered by Store.id;
+    ``ordered`` orders an unpaged query the same way. A.id is selected as
+    StoreId because the joined tables may carry their own ``id`` column.
+    ``fields`` narrows the select list to those ProductDTO fields.
     """
-    base = (
-        "SELECT A.*, B.*, C.*, "
-        "D.InventoryDate, D.KeyinDate, D.UpdateDate, D.ShipmentDate, "
-        "E.*, F.* "
-        "FROM Store A "
-        "INNER JOIN store_price B ON A.id = B.store_id "
-        "INNER JOIN store_category C ON A.id = C.store_id "
-        "INNER JOIN store_date D ON A.id = D.store_id "
-        "INNER JOIN ProductPicture E ON A.id = E.store_id "
-        "INNER JOIN ProductBookCase F ON A.id = F.store_id "
-        "WHERE ("
-    )
+    top = f"TOP ({int(limit)}) " if limit is not None else ""
+    base = f"SELECT {top}{_search_columns(fields)} {_SEARCH_JOINS} WHERE ("
 
     params = []
 
@@ -56,52 +110,226 @@ def _build_search_query(isbn: Optional[str], firm_code: Optional[str], product_n
             params.append(f"%{kw}%")
         base += " OR ".join(conditions)
     else:
-        # No filter — match all via FirmCode LIKE '%%'
-        base += "A.FirmCode LIKE %s"
-        params.append("%%")
+        # No filter — match all rows with a FirmCode (same rows as Java's FirmCode LIKE '%%')
+        base += "A.FirmCode IS NOT NULL"
 
     base += ")"
+
+    if after_id is not None:
+        base += " AND A.id > %s"
+        params.append(after_id)
+    if ordered or after_id is not None or limit is not None:
+        base += " ORDER BY A.id"
+
     return base, params
 
 
+def _row_to_product_dto(row: dict) -> ProductDTO:
+    return ProductDTO(
+        isbn=row.get("ISBN") or "",
+        internationalCode=row.get("InternationalCode") or "",
+        firmCode=row.get("FirmCode") or "",
+        productCode=row.get("ProductCode") or "",
+        productName=row.get("ProductName") or "",
+        unit=row.get("Unit") or "",
+        vendorCode=str(row.get("VendorCode") or ""),
+        vendorName=row.get("Vendor") or "",
+        firstCategory=row.get("NewFirstCategory") or "",
+        secondCategory=row.get("NewSecondCategory") or "",
+        thirdCategory=row.get("NewThirdCategory") or "",
+        batchPrice=_round_price(row.get("BatchPrice")),
+        singlePrice=_round_price(row.get("SinglePrice")),
+        pricing=_round_price(row.get("Pricing")),
+        vipPrice1=_round_price(row.get("VipPrice1")),
+        vipPrice2=_round_price(row.get("VipPrice2")),
+        vipPrice3=_round_price(row.get("VipPrice3")),
+        inStock=str(row.get("InStock") or 0),
+        safetyStock=str(row.get("SafetyStock") or 0),
+        discount=float(row.get("Discount") or 0.0),
+    )
+
+
 def get_product_list(isbn: Optional[str] = None,
                      firm_code: Optional[str] = None,
-                     product_name: Optional[str] = None) -> list[ProductDTO]:
+                     product_name: Optional[str] = None,
+                     limit: Optional[int] = None,
+                     cursor: Optional[int] = None,
+                     fields: Optional[set[str]] = None) -> tuple[list[ProductDTO], Optional[int]]:
     """Query product list from database.
 
     Priority: isbn > firmCode > productName.
     No params returns all products.
+
+    Args:
+        limit: Page size; None returns every match
+        cursor: Store id of the last product of the previous page
+        fields: ProductDTO field names to select; other fields keep their defaults
+
+    Returns:
+        (products, next_cursor); next_cursor is None on the last page
     """
-    query, params = _build_search_query(isbn, firm_code, product_name)
+    if limit is not None:
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    indexed = search_index.search(isbn, firm_code, product_name)
+    if indexed is not None:
+        if cursor is not None:
+            indexed = [item for item in indexed if item[0] > cursor]
+        next_cursor = None
+        if limit is not None and len(indexed) > limit:
+            indexed = indexed[:limit]
+            next_cursor = indexed[-1][0]
+        return [dto for _, dto in indexed], next_cursor
+
+    # Fetch one extra row to know whether another page follows
+    query, params = _build_search_query(isbn, firm_code, product_name, after_id=cursor,
+                                        limit=limit + 1 if limit is not None else None, fields=fields)
     logger.info("Product search query: %s | params: %s", query, params)
 
-    products = []
+    with db_manager.cursor() as db_cursor:
+        db_cursor.execute(query, tuple(params))
+        rows = db_cursor.fetchall()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["StoreId"]
+
+    return [_row_to_product_dto(row) for row in rows], next_cursor
+
+
+def iter_product_list(isbn: Optional[str] = None,
+                      firm_code: Optional[str] = None,
+                      product_name: Optional[str] = None,
+                      batch_size: int = STREAM_BATCH_SIZE,
+                      fields: Optional[set[str]] = None) -> Iterator[ProductDTO]:
+    """Yield matching products ordered by store id, reading ``batch_size`` rows at a time.
+
+    Holds a pooled connection until the generator is exhausted or closed.
+    It bypasses db_manager.cursor() because a StreamingResponse resumes the
+    generator on different worker threads.
+    """
+    indexed = search_index.search(isbn, firm_code, product_name)
+    if indexed is not None:
+        for _, dto in indexed:
+            yield dto
+        return
+
+    query, params = _build_search_query(isbn, firm_code, product_name, ordered=True, fields=fields)
+    logger.info("Product stream query: %s | params: %s", query, params)
+
+    with db_manager.connection() as conn:
+        cursor = conn.cursor(as_dict=True)
+        completed = False
+        try:
+            cursor.execute(query, tuple(params))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield _row_to_product_dto(row)
+            conn.commit()
+            completed = True
+        finally:
+            cursor.close()
+            if not completed:
+                # Closed early (client disconnected) or failed: end the read
+                # transaction before the connection goes back to the pool
+                conn.rollback()
+
+
+def _load_index_rows(where: str = "", params: tuple = ()) -> list[tuple[int, ProductDTO, Optional[str]]]:
+    """Read search join rows as (store id, dto, raw FirmCode) and advance the index watermark."""
+    global _index_updated_since, _index_max_id
+
+    entries = []
+    with db_manager.cursor() as cursor:
+        cursor.execute(f"SELECT {_search_columns()}, D.UpdateDate {_SEARCH_JOINS}{where}", params)
+        while True:
+            rows = cursor.fetchmany(STREAM_BATCH_SIZE)
+            if not rows:
+                break
+            for row in rows:
+                entries.append((row["StoreId"], _row_to_product_dto(row), row.get("FirmCode")))
+                updated = row.get("UpdateDate")
+                if updated is not None and (_index_updated_since is None or updated > _index_updated_since):
+                    _index_updated_since = updated
+                _index_max_id = max(_index_max_id, row["StoreId"])
+    return entries
+
+
+def load_search_index() -> None:
+    """Load every product of the search join into the search index."""
+    global _index_updated_since, _index_max_id
+
+    _index_updated_since = None
+    _index_max_id = 0
+    search_index.replace_all(_load_index_rows())
+    logger.info("Product search index loaded: %d products", len(search_index))
+
+
+def refresh_search_index() -> int:
+    """Apply products changed since the last load or refresh and drop deleted ones.
+
+    Changes are picked up through store_date.UpdateDate, plus any Store.id
+    above the highest one indexed so far for rows inserted without an
+    UpdateDate. Returns the number of products re-read.
+    """
+    if _index_updated_since is None:
+        entries = _load_index_rows(" WHERE A.id > %s", (_index_max_id,))
+    else:
+        entries = _load_index_rows(" WHERE D.UpdateDate >= %s OR A.id > %s",
+                                   (_index_updated_since, _index_max_id))
+
     with db_manager.cursor() as cursor:
-        cursor.execute(query, tuple(params))
-        rows = cursor.fetchall()
-        for row in rows:
-            dto = ProductDTO(
-                isbn=row.get("ISBN") or "",
-                internationalCode=row.get("InternationalCode") or "",
-                firmCode=row.get("FirmCode") or "",
-                productCode=row.get("ProductCode") or "",
-                productName=row.get("ProductName") or "",
-                unit=row.get("Unit") or "",
-                vendorCode=str(row.get("VendorCode") or ""),
-                vendorName=row.get("Vendor") or "",
-                firstCategory=row.get("NewFirstCategory") or "",
-                secondCategory=row.get("NewSecondCategory") or "",
-                thirdCategory=row.get("NewThirdCategory") or "",
-                batchPrice=_round_price(row.get("BatchPrice")),
-                singlePrice=_round_price(row.get("SinglePrice")),
-                pricing=_round_price(row.get("Pricing")),
-                vipPrice1=_round_price(row.get("VipPrice1")),
-                vipPrice2=_round_price(row.get("VipPrice2")),
-                vipPrice3=_round_price(row.get("VipPrice3")),
-                inStock=str(row.get("InStock") or 0),
-                safetyStock=str(row.get("SafetyStock") or 0),
-                discount=float(row.get("Discount") or 0.0),
-            )
-            products.append(dto)
-
-    return products
+        cursor.execute("SELECT id FROM Store")
+        store_ids = {row["id"] for row in cursor.fetchall()}
+
+    search_index.upsert(entries)
+    removed = search_index.retain(store_ids)
+    if removed:
+        logger.info("Product search index dropped %d deleted products", removed)
+    return len(entries)
+
+
+def _run_search_index(refresh_interval: float, stop: threading.Event) -> None:
+    while not stop.is_set():
+        try:
+            if search_index.ready:
+                refresh_search_index()
+            else:
+                load_search_index()
+        except Exception as e:
+            logger.error("Product search index refresh failed: %s", e, exc_info=True)
+        stop.wait(refresh_interval)
+    # A load that outlived stop_search_index() must not leave a stale index behind
+    search_index.clear()
+
+
+def start_search_index(refresh_interval: float) -> None:
+    """Load the search index in a background thread and refresh it every ``refresh_interval`` seconds.
+
+    Searches go to the database until the first load finishes.
+    """
+    global _index_stop, _index_thread
+
+    stop_search_index()
+    _index_stop = threading.Event()
+    _index_thread = threading.Thread(
+        target=_run_search_index, args=(refresh_interval, _index_stop),
+        name="product-search-index", daemon=True,
+    )
+    _index_thread.start()
+
+
+def stop_search_index() -> None:
+    """Stop refreshing and empty the search index so searches go back to the database."""
+    global _index_stop, _index_thread
+
+    if _index_stop is not None:
+        _index_stop.set()
+        _index_thread.join(timeout=5)
+        _index_stop = None
+        _index_thread = None
+    search_index.clear()
@@ -1,16 +1,16 @@
 """Auto purchase order generation service."""
 
 import logging
-from datetime import datetime
 from typing import Optional
 
+from app.database.batch import insert_many
 from app.database.connection import db_manager
 from app.models.order_conversion import AutoPurchaseOrderInfo
 from app.services.order_service import (
     ORDER_SOURCE_PURCHASE,
     create_order_reference,
 )
-from app.services.stock_service import update_waiting_into_in_stock
+from app.services.stock_service import apply_stock_deltas
 
 logger = logging.getLogger(__name__)
 
@@ -50,51 +50,19 @@ def _get_supplier_for_product(isbn: str) -> Optional[dict]:
     }
 
 
-def _generate_purchase_order_number(order_date: str) -> int:
-    """Generate purchase order number based on date. Returns bigint."""
-    date_str = order_date.replace("-", "/")
-    try:
-        dt = datetime.strptime(date_str, "%Y/%m/%d")
-    except ValueError:
-        dt = datetime.now()
+def group_shortage_by_supplier(shortage_items: list[dict]) -> list[dict]:
+    """Group shortage items by supplier, one entry per purchase order to create.
 
-    prefix = dt.strftime("%Y%m%d")
-
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            """SELECT MAX(OrderNumber) AS MaxNum FROM dbo.Orders
-               WHERE OrderSource = %s AND OrderNumber LIKE %s""",
-            (ORDER_SOURCE_PURCHASE, f"{prefix}%"),
-        )
-        row = cursor.fetchone()
-
-    if row and row.get("MaxNum"):
-        max_num = str(row["MaxNum"])
-        seq = int(max_num[len(prefix):]) + 1
-    else:
-        seq = 1
-
-    return int(f"{prefix}{seq:04d}")
-
-
-def generate_purchase_quotation(
-    source_quotation_id: int,
-    shortage_items: list[dict],
-) -> list[AutoPurchaseOrderInfo]:
-    """Generate purchase orders for shortage items.
+    Read-only, so it can run before the unit of work that creates the
+    orders (their numbers have to be allocated in between).
 
     Args:
-        source_quotation_id: ID of the source quotation
         shortage_items: List of dicts with isbn, quantity, shortage_quantity
 
     Returns:
-        List of AutoPurchaseOrderInfo for created orders
+        List of dicts with supplier_id, supplier_name and items
     """
-    if not shortage_items:
-        return []
-
-    # Group items by supplier
-    supplier_items: dict[str, list[dict]] = {}
+    supplier_items: dict[str, dict] = {}
 
     for item in shortage_items:
         isbn = item.get("isbn", "")
@@ -125,106 +93,138 @@ def generate_purchase_quotation(
             "quantity": shortage,
         })
 
-    # Create purchase order for each supplier
-    created_orders = []
-    order_date = datetime.now().strftime("%Y/%m/%d")
+    return [data for data in supplier_items.values() if data["items"]]
 
-    for supplier_id, supplier_data in supplier_items.items():
-        items = supplier_data["items"]
-        supplier_name = supplier_data["supplier_name"]
 
-        if not items:
-            continue
+def create_purchase_orders(
+    source_quotation_id: int,
+    suppliers: list[dict],
+    order_numbers: list[int],
+    order_date: str,
+) -> list[AutoPurchaseOrderInfo]:
+    """Create one purchase order per supplier group in one unit of work.
 
-        order_number = _generate_purchase_order_number(order_date)
-
-        try:
-            with db_manager.cursor() as cursor:
-                # Insert into Orders table
-                cursor.execute(
-                    """INSERT INTO dbo.Orders (
-                        OrderNumber, OrderDate, OrderSource, ObjectID,
-                        isCheckout, NumberOfItems, EstablishSource, isBorrowed, isOffset,
-                        Remark, CashierRemark, status
-                    ) VALUES (
-                        %s, %s, %s, %s,
-                        %s, %s, %s, %s, %s,
-                        %s, %s, %s
-                    )""",
-                    (
-                        order_number,
-                        order_date,
-                        ORDER_SOURCE_PURCHASE,
-                        supplier_id,
-                        0,  # isCheckout
-                        len(items),
-                        ESTABLISH_SOURCE_SYSTEM,
-                        0,  # isBorrowed
-                        0,  # isOffset
-                        f"由報價單 #{source_quotation_id} 自動產生",
-                        "",
-                        0,  # status
-                    ),
-                )
+    Args:
+        source_quotation_id: ID of the source quotation
+        suppliers: Groups from group_shortage_by_supplier
+        order_numbers: One pre-allocated order number per group
+        order_date: Order date (yyyy/mm/dd)
 
-                # Get inserted order ID
-                cursor.execute("SELECT SCOPE_IDENTITY() AS id")
-                order_id = int(cursor.fetchone()["id"])
+    Returns:
+        List of AutoPurchaseOrderInfo for created orders
+    """
+    if not suppliers:
+        return []
 
-                # Insert into Orders_Price table
-                cursor.execute(
-                    """INSERT INTO dbo.Orders_Price (
-                        Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
-                    ) VALUES (%s, %s, %s, %s, %s, %s)""",
-                    (order_id, order_number, 0, 0, 0, 0),
-                )
+    with db_manager.transaction():
+        created_orders = []
+        stock_deltas: list[tuple[str, str, int]] = []
 
-                # Insert order items
-                for i, prod in enumerate(items):
+        for supplier_data, order_number in zip(suppliers, order_numbers):
+            supplier_id = supplier_data["supplier_id"]
+            items = supplier_data["items"]
+            supplier_name = supplier_data["supplier_name"]
+
+            try:
+                with db_manager.cursor() as cursor:
+                    # Insert into Orders table
                     cursor.execute(
-                        """INSERT INTO dbo.Orders_Items (
-                            Order_id, OrderNumber, ItemNumber, ISBN, ProductName,
-                            Quantity, Unit, BatchPrice, SinglePrice, Pricing, PriceAmount, Remark
-                        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+                        """INSERT INTO dbo.Orders (
+                            OrderNumber, OrderDate, OrderSource, ObjectID,
+                            isCheckout, NumberOfItems, EstablishSource, isBorrowed, isOffset,
+                            Remark, CashierRemark, status
+                        ) VALUES (
+                            %s, %s, %s, %s,
+                            %s, %s, %s, %s, %s,
+                            %s, %s, %s
+                        )""",
                         (
-                            order_id,
                             order_number,
-                            i + 1,
-                            prod["isbn"],
-                            prod["product_name"],
-                            prod["quantity"],
-                            "",  # unit
-                            0.0,  # batch_price
-                            0.0,  # single_price
-                            0.0,  # pricing
-                            0,  # price_amount
-                            "",  # remark
+                            order_date,
+                            ORDER_SOURCE_PURCHASE,
+                            supplier_id,
+                            0,  # isCheckout
+                            len(items),
+                            ESTABLISH_SOURCE_SYSTEM,
+                            0,  # isBorrowed
+                            0,  # isOffset
+                            f"由報價單 #{source_quotation_id} 自動產生",
+                            "",
+                            0,  # status
                         ),
                     )
 
-                    # Update WaitingIntoInStock for product
-                    update_waiting_into_in_stock(prod["isbn"], prod["quantity"])
+                    # Get inserted order ID
+                    cursor.execute("SELECT SCOPE_IDENTITY() AS id")
+                    order_id = int(cursor.fetchone()["id"])
+
+                    # Insert into Orders_Price table
+                    cursor.execute(
+                        """INSERT INTO dbo.Orders_Price (
+                            Order_id, OrderNumber, TotalPriceNoneTax, Tax, Discount, TotalPriceIncludeTax
+                        ) VALUES (%s, %s, %s, %s, %s, %s)""",
+                        (order_id, order_number, 0, 0, 0, 0),
+                    )
 
-                # Create reference to source quotation
-                create_order_reference(order_id, source_quotation_id, None)
+                    # Insert order items
+                    insert_many(
+                        cursor,
+                        "dbo.Orders_Items",
+                        (
+                            "Order_id", "OrderNumber", "ItemNumber", "ISBN", "ProductName",
+                            "Quantity", "Unit", "BatchPrice", "SinglePrice", "Pricing", "PriceAmount", "Remark",
+                        ),
+                        [
+                            (
+                                order_id,
+                                order_number,
+                                i + 1,
+                                prod["isbn"],
+                                prod["product_name"],
+                                prod["quantity"],
+                                "",  # unit
+                                0.0,  # batch_price
+                                0.0,  # single_price
+                                0.0,  # pricing
+                                0,  # price_amount
+                                "",  # remark
+                            )
+                            for i, prod in enumerate(items)
+                        ],
+                    )
+                    stock_deltas.extend(
+                        (prod["isbn"], "WaitingIntoInStock", prod["quantity"]) for prod in items
+                    )
 
-            logger.info(
-                "Created purchase order %d for supplier %s with %d items",
-                order_id,
-                supplier_id,
-                len(items),
-            )
+                    # Create reference to source quotation
+                    create_order_reference(order_id, source_quotation_id, None)
 
-            created_orders.append(AutoPurchaseOrderInfo(
-                order_id=order_id,
-                order_number=str(order_number),
-                supplier_id=supplier_id,
-                supplier_name=supplier_name,
-                items_count=len(items),
-            ))
+                logger.info(
+                    "Created purchase order %d for supplier %s with %d items",
+                    order_id,
+                    supplier_id,
+                    len(items),
+                )
 
-        except Exception as e:
-            logger.error("Failed to create purchase order for supplier %s: %s", supplier_id, e)
-            raise
+                created_orders.append(AutoPurchaseOrderInfo(
+                    order_id=order_id,
+                    order_number=str(order_number),
+                    supplier_id=supplier_id,
+                    supplier_name=supplier_name,
+                    items_count=len(items),
+                ))
+
+            except Exception as e:
+                logger.error("Failed to create purchase order for supplier %s: %s", supplier_id, e)
+                raise
+
+        # Increase WaitingIntoInStock for all purchased products in one statement
+        unmatched = apply_stock_deltas(stock_deltas)
+        if unmatched:
+            logger.warning(
+                "Purchase orders for quotation %d reference unknown products: %s",
+                source_quotation_id,
+                unmatched,
+            )
 
-    return created_orders
+        return created_orders
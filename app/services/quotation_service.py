@@ -1,11 +1,13 @@
 import logging
-from datetime import datetime
-
 from collections import defaultdict
-from typing import Optional
+from typing import BinaryIO, Optional
 
+from app.database.batch import insert_many
 from app.database.connection import db_manager
 from app.models.quotation import CreateQuotationRequest, QuotationItemDTO, QuotationListDTO
+from app.services.order_number_service import allocate_order_number
+from app.services import picture_store
+from app.services.order_service import invalidate_order_cache
 
 logger = logging.getLogger(__name__)
 
@@ -141,38 +143,18 @@ def _create_customer(object_id: str, info) -> None:
     )
 
 
-def _generate_order_number(order_date: str) -> int:
-    """Generate order number based on date. Returns bigint."""
-    date_str = order_date.replace("-", "/")
-    try:
-        dt = datetime.strptime(date_str, "%Y/%m/%d")
-    except ValueError:
-        dt = datetime.now()
-
-    prefix = dt.strftime("%Y%m%d")
-
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            """SELECT MAX(OrderNumber) AS MaxNum FROM dbo.Orders
-               WHERE OrderSource = %s AND OrderNumber LIKE %s""",
-            (ORDER_SOURCE_QUOTATION, f"{prefix}%"),
-        )
-        row = cursor.fetchone()
-
-    if row and row.get("MaxNum"):
-        max_num = str(row["MaxNum"])
-        seq = int(max_num[len(prefix):]) + 1
-    else:
-        seq = 1
-
-    return int(f"{prefix}{seq:04d}")
-
-
 def create_quotation(request: CreateQuotationRequest) -> dict:
     """Create a quotation order. Returns dict with orderId, orderNumber, orderDate."""
 
     object_id = request.object_id.strip()
 
+    # Validate pictures up front; they are stored with the order rows below
+    prepared_pictures = [
+        (pic.item_number or 0, picture_store.prepare_picture(pic.base64_image))
+        for pic in request.pictures or []
+        if pic.base64_image
+    ]
+
     # Check customer existence
     if not _customer_exists(object_id):
         if request.customer_info is None:
@@ -188,7 +170,7 @@ def create_quotation(request: CreateQuotationRequest) -> dict:
     if request.order_number and request.order_number.strip():
         order_number = int(request.order_number.strip())
     else:
-        order_number = _generate_order_number(request.order_date)
+        order_number = allocate_order_number(ORDER_SOURCE_QUOTATION, request.order_date)
 
     # EstablishSource (bit: 0=系統建立, 1=人工建立)
     establish_source = ESTABLISH_SOURCE_SYSTEM
@@ -323,17 +305,18 @@ def create_quotation(request: CreateQuotationRequest) -> dict:
         )
 
         # Insert order items into Orders_Items table
-        for i, product in enumerate(request.products):
-            item_number = product.item_number if product.item_number is not None else (i + 1)
-            cursor.execute(
-                """INSERT INTO dbo.Orders_Items (
-                    Order_id, OrderNumber, ItemNumber, ISBN, ProductName,
-                    Quantity, Unit, BatchPrice, SinglePrice, Pricing, PriceAmount, Remark
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
+        insert_many(
+            cursor,
+            "dbo.Orders_Items",
+            (
+                "Order_id", "OrderNumber", "ItemNumber", "ISBN", "ProductName",
+                "Quantity", "Unit", "BatchPrice", "SinglePrice", "Pricing", "PriceAmount", "Remark",
+            ),
+            [
                 (
                     order_id,
                     order_number,
-                    item_number,
+                    product.item_number if product.item_number is not None else (i + 1),
                     product.isbn or "",
                     product.product_name or "",
                     product.quantity or 0,
@@ -343,41 +326,40 @@ def create_quotation(request: CreateQuotationRequest) -> dict:
                     product.pricing or 0.0,
                     product.price_amount or 0,
                     product.remark or "",
-                ),
-            )
+                )
+                for i, product in enumerate(request.products)
+            ],
+        )
 
         # Insert order references into Orders_Reference table
         if request.order_references:
-            if request.order_references.quotation_ids:
-                for ref_id in request.order_references.quotation_ids:
-                    cursor.execute(
-                        """INSERT INTO dbo.Orders_Reference (
-                            Order_Id, Order_Reference_Id, SubBill_Reference_Id
-                        ) VALUES (%s, %s, %s)""",
-                        (order_id, ref_id, None),
-                    )
-            if request.order_references.sub_bill_ids:
-                for ref_id in request.order_references.sub_bill_ids:
-                    cursor.execute(
-                        """INSERT INTO dbo.Orders_Reference (
-                            Order_Id, Order_Reference_Id, SubBill_Reference_Id
-                        ) VALUES (%s, %s, %s)""",
-                        (order_id, None, ref_id),
-                    )
-
-        # Insert pictures into Orders_Picture table
-        if request.pictures:
-            for pic in request.pictures:
-                if pic.base64_image:
-                    base64_data = pic.base64_image
-                    if "," in base64_data:
-                        base64_data = base64_data.split(",", 1)[1]
-                    cursor.execute(
-                        """INSERT INTO dbo.Orders_Picture (
-                            Order_id, ItemNumber, Picture, Source
-                        ) VALUES (%s, %s, %s, %s)""",
-                        (order_id, pic.item_number or 0, base64_data, "API"),
-                    )
+            reference_rows = [
+                (order_id, ref_id, None)
+                for ref_id in request.order_references.quotation_ids or []
+            ] + [
+                (order_id, None, ref_id)
+                for ref_id in request.order_references.sub_bill_ids or []
+            ]
+            insert_many(
+                cursor,
+                "dbo.Orders_Reference",
+                ("Order_Id", "Order_Reference_Id", "SubBill_Reference_Id"),
+                reference_rows,
+            )
+            invalidate_order_cache(*(request.order_references.quotation_ids or []))
+
+        # Store the pictures in this unit of work (a rollback discards them);
+        # Orders_Picture keeps only the hash
+        pictures = [
+            (item_number, picture_store.store_prepared_picture(prepared))
+            for item_number, prepared in prepared_pictures
+        ]
+        insert_many(
+            cursor,
+            "dbo.Orders_Picture",
+            ("Order_id", "ItemNumber", "Picture", "Source"),
+            [(order_id, item_number, picture_ref, "API") for item_number, picture_ref in pictures],
+        )
 
     logger.info("Quotation created - OrderID: %s, OrderNumber: %s", order_id, order_number)
     return {
@@ -494,3 +476,50 @@ def list_quotations(
         )
 
     return result
+
+
+def add_quotation_pictures(order_id: int, item_number: int, files: list[BinaryIO]) -> list[str]:
+    """Store uploaded pictures and attach them to an order, or to one of its items.
+
+    Args:
+        order_id: Orders.id the pictures belong to
+        item_number: Orders_Items.ItemNumber, or 0 for the order as a whole
+        files: Uploaded picture files, read in chunks
+
+    Returns:
+        Picture references in upload order
+    """
+    if not files:
+        raise ValueError("未提供圖片檔案")
+    if item_number < 0:
+        raise ValueError("itemNumber 不能為負數")
+
+    with db_manager.cursor() as cursor:
+        cursor.execute(
+            """SELECT o.id,
+                (SELECT COUNT(*) FROM dbo.Orders_Items i
+                 WHERE i.Order_id = o.id AND i.ItemNumber = %s) AS item_count
+            FROM dbo.Orders o
+            WHERE o.id = %s""",
+            (item_number, order_id),
+        )
+        row = cursor.fetchone()
+    if row is None:
+        raise ValueError(f"訂單不存在：{order_id}")
+    if item_number and not row["item_count"]:
+        raise ValueError(f"訂單 {order_id} 沒有第 {item_number} 項商品")
+
+    with db_manager.cursor() as cursor:
+        picture_refs = [picture_store.store_picture_file(file) for file in files]
+        insert_many(
+            cursor,
+            "dbo.Orders_Picture",
+            ("Order_id", "ItemNumber", "Picture", "Source"),
+            [(order_id, item_number, picture_ref, "API") for picture_ref in picture_refs],
+        )
+
+    logger.info(
+        "Quotation pictures added - OrderID: %s, ItemNumber: %s, Count: %d",
+        order_id, item_number, len(picture_refs),
+    )
+    return picture_refs
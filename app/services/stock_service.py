@@ -3,11 +3,37 @@
 import logging
 from typing import Optional
 
+from app.database.batch import MAX_PARAMS, chunked, placeholders
 from app.database.connection import db_manager
 from app.models.stock import ProductStockDTO, StockCheckResultDTO
+from utils.collation import collation_key
 
 logger = logging.getLogger(__name__)
 
+# dbo.Product counter columns that apply_stock_deltas may adjust
+STOCK_COLUMNS = ("InStock", "WaitingIntoInStock", "WaitingShipmentQuantity")
+
+
+def _row_to_stock_dto(row: dict) -> ProductStockDTO:
+    """Convert a dbo.Product row to ProductStockDTO."""
+    in_stock = row.get("InStock") or 0
+    safety_stock = row.get("SafetyStock") or 0
+    waiting_into = row.get("WaitingIntoInStock") or 0
+    waiting_shipment = row.get("WaitingShipmentQuantity") or 0
+
+    # Available = InStock - SafetyStock + WaitingIntoInStock - WaitingShipmentQuantity
+    available = in_stock - safety_stock + waiting_into - waiting_shipment
+
+    return ProductStockDTO(
+        isbn=row.get("ISBN"),
+        product_name=row.get("ProductName"),
+        in_stock=in_stock,
+        safety_stock=safety_stock,
+        waiting_into_in_stock=waiting_into,
+        waiting_shipment_quantity=waiting_shipment,
+        available_quantity=max(0, available),
+    )
+
 
 def get_product_stock(isbn: str) -> Optional[ProductStockDTO]:
     """Get stock information for a product by ISBN.
@@ -30,23 +56,40 @@ def get_product_stock(isbn: str) -> Optional[ProductStockDTO]:
     if not row:
         return None
 
-    in_stock = row.get("InStock") or 0
-    safety_stock = row.get("SafetyStock") or 0
-    waiting_into = row.get("WaitingIntoInStock") or 0
-    waiting_shipment = row.get("WaitingShipmentQuantity") or 0
+    return _row_to_stock_dto(row)
 
-    # Available = InStock - SafetyStock + WaitingIntoInStock - WaitingShipmentQuantity
-    available = in_stock - safety_stock + waiting_into - waiting_shipment
 
-    return ProductStockDTO(
-        isbn=row.get("ISBN"),
-        product_name=row.get("ProductName"),
-        in_stock=in_stock,
-        safety_stock=safety_stock,
-        waiting_into_in_stock=waiting_into,
-        waiting_shipment_quantity=waiting_shipment,
-        available_quantity=max(0, available),
-    )
+def get_product_stocks(isbns: list[str]) -> dict[str, ProductStockDTO]:
+    """Get stock information for many products with one query per chunk of ISBNs.
+
+    Args:
+        isbns: Product ISBNs (duplicates and empty values are ignored)
+
+    Returns:
+        Dict mapping each requested ISBN that exists to its ProductStockDTO
+    """
+    unique = list(dict.fromkeys(isbn for isbn in isbns if isbn))
+    if not unique:
+        return {}
+
+    rows_by_key: dict[str, dict] = {}
+    with db_manager.cursor() as cursor:
+        for chunk in chunked(unique, MAX_PARAMS):
+            cursor.execute(
+                f"""SELECT ISBN, ProductName, InStock, SafetyStock,
+                          WaitingIntoInStock, WaitingShipmentQuantity
+                   FROM dbo.Product WHERE ISBN IN ({placeholders(len(chunk))})""",
+                tuple(chunk),
+            )
+            for row in cursor.fetchall():
+                rows_by_key.setdefault(collation_key(row.get("ISBN") or ""), row)
+
+    stocks = {}
+    for isbn in unique:
+        row = rows_by_key.get(collation_key(isbn))
+        if row:
+            stocks[isbn] = _row_to_stock_dto(row)
+    return stocks
 
 
 def is_shipment_in_stock_enough(isbn: str, quantity: int) -> tuple[bool, int]:
@@ -70,19 +113,29 @@ def is_shipment_in_stock_enough(isbn: str, quantity: int) -> tuple[bool, int]:
 def check_stock_for_items(items: list[dict]) -> list[StockCheckResultDTO]:
     """Check stock availability for multiple items.
 
+    Quantities of ISBNs that SQL Server treats as equal (see collation_key) are
+    summed before comparing against the available stock, and all ISBNs are
+    looked up in batched queries.
+
     Args:
         items: List of dicts with 'isbn' and 'quantity' keys
 
     Returns:
-        List of StockCheckResultDTO for each item
+        List of StockCheckResultDTO, one per distinct ISBN in request order,
+        reported under the first spelling of each ISBN
     """
-    results = []
-
+    # collation_key -> [first spelling, summed quantity]
+    requested_by_key: dict[str, list] = {}
     for item in items:
         isbn = item.get("isbn", "")
-        requested = item.get("quantity", 0)
+        entry = requested_by_key.setdefault(collation_key(isbn), [isbn, 0])
+        entry[1] += item.get("quantity", 0) or 0
 
-        stock = get_product_stock(isbn)
+    stocks = get_product_stocks([isbn for isbn, _ in requested_by_key.values()])
+
+    results = []
+    for isbn, requested in requested_by_key.values():
+        stock = stocks.get(isbn)
 
         if stock:
             available = stock.available_quantity or 0
@@ -111,76 +164,66 @@ def check_stock_for_items(items: list[dict]) -> list[StockCheckResultDTO]:
     return results
 
 
-def update_waiting_shipment_quantity(isbn: str, delta: int) -> bool:
-    """Update the WaitingShipmentQuantity for a product.
-
-    Args:
-        isbn: Product ISBN
-        delta: Amount to add (positive) or subtract (negative)
-
-    Returns:
-        True if update succeeded
-    """
-    try:
-        with db_manager.cursor() as cursor:
-            cursor.execute(
-                """UPDATE dbo.Product
-                   SET WaitingShipmentQuantity = ISNULL(WaitingShipmentQuantity, 0) + %s
-                   WHERE ISBN = %s""",
-                (delta, isbn),
-            )
-        logger.info("Updated WaitingShipmentQuantity for %s by %d", isbn, delta)
-        return True
-    except Exception as e:
-        logger.error("Failed to update WaitingShipmentQuantity for %s: %s", isbn, e)
-        return False
-
-
-def update_waiting_into_in_stock(isbn: str, delta: int) -> bool:
-    """Update the WaitingIntoInStock for a product.
-
-    Args:
-        isbn: Product ISBN
-        delta: Amount to add (positive) or subtract (negative)
-
-    Returns:
-        True if update succeeded
-    """
-    try:
-        with db_manager.cursor() as cursor:
-            cursor.execute(
-                """UPDATE dbo.Product
-                   SET WaitingIntoInStock = ISNULL(WaitingIntoInStock, 0) + %s
-                   WHERE ISBN = %s""",
-                (delta, isbn),
-            )
-        logger.info("Updated WaitingIntoInStock for %s by %d", isbn, delta)
-        return True
-    except Exception as e:
-        logger.error("Failed to update WaitingIntoInStock for %s: %s", isbn, e)
-        return False
-
+def apply_stock_deltas(deltas: list[tuple[str, str, int]]) -> list[str]:
+    """Apply stock counter deltas with a single UPDATE ... FROM (VALUES ...) statement.
 
-def update_in_stock(isbn: str, delta: int) -> bool:
-    """Update the InStock for a product.
+    Deltas are summed per ISBN and column first, so each product row is
+    updated once. Very large batches are split into chunks under the
+    parameter limit. Database errors propagate to the caller.
 
     Args:
-        isbn: Product ISBN
-        delta: Amount to add (positive) or subtract (negative)
+        deltas: (isbn, column, delta) tuples; column must be one of STOCK_COLUMNS
 
     Returns:
-        True if update succeeded
+        ISBNs that matched no dbo.Product row (their deltas were not applied)
     """
-    try:
-        with db_manager.cursor() as cursor:
+    totals: dict[str, dict[str, int]] = {}
+    spelling: dict[str, str] = {}
+    for isbn, column, delta in deltas:
+        if column not in STOCK_COLUMNS:
+            raise ValueError(f"Unknown stock column: {column}")
+        if not isbn or not delta:
+            continue
+        key = collation_key(isbn)
+        spelling.setdefault(key, isbn)
+        per_column = totals.setdefault(key, {})
+        per_column[column] = per_column.get(column, 0) + delta
+
+    columns = [col for col in STOCK_COLUMNS if any(t.get(col) for t in totals.values())]
+    keys = [key for key, per_column in totals.items() if any(per_column.values())]
+    if not keys:
+        return []
+
+    row_params = 1 + len(columns)
+    row_sql = "(" + placeholders(row_params) + ")"
+    set_clause = ", ".join(f"{col} = ISNULL(p.{col}, 0) + v.{col}" for col in columns)
+    column_list = ", ".join(["ISBN"] + columns)
+
+    matched: set[str] = set()
+    with db_manager.cursor() as cursor:
+        for chunk in chunked(keys, MAX_PARAMS // row_params):
+            params = []
+            for key in chunk:
+                params.append(spelling[key])
+                params.extend(totals[key].get(col, 0) for col in columns)
             cursor.execute(
-                """UPDATE dbo.Product
-                   SET InStock = ISNULL(InStock, 0) + %s
-                   WHERE ISBN = %s""",
-                (delta, isbn),
+                f"""SET NOCOUNT ON;
+                DECLARE @matched TABLE (ISBN nvarchar(255));
+                UPDATE p SET {set_clause}
+                OUTPUT inserted.ISBN INTO @matched
+                FROM dbo.Product p
+                INNER JOIN (VALUES {", ".join([row_sql] * len(chunk))}) AS v ({column_list})
+                    ON p.ISBN = v.ISBN;
+                SELECT ISBN FROM @matched;""",
+                tuple(params),
             )
-        logger.info("Updated InStock for %s by %d", isbn, delta)
-        return True
-    except Exception as e:
-        logger.error("Failed to update InStock for %s: %s", isbn, e)
-        return False
+            matched.update(collation_key(row["ISBN"] or "") for row in cursor.fetchall())
+
+    unmatched = [spelling[key] for key in keys if key not in matched]
+    logger.info(
+        "Applied stock deltas to %d products (%s)%s",
+        len(keys) - len(unmatched),
+        ", ".join(columns),
+        f"; unmatched ISBNs: {unmatched}" if unmatched else "",
+    )
+    return unmatched
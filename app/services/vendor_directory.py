@@ -0,0 +1,95 @@
+"""In-process vendor directory.
+
+Holds every Manufacturer as a VendorDTO so vendor reads are answered from
+memory. vendor_service loads it and keeps it current on writes; this module
+only holds the data structures.
+"""
+
+import threading
+import time
+from typing import Optional
+
+from app.models.vendor import VendorDTO
+from utils.collation import collation_key
+from utils.ngram_index import NgramIndex
+
+
+class VendorDirectory:
+    """Vendors keyed by id and code, with a bigram index over vendor names."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id: dict[int, VendorDTO] = {}
+        self._by_code: dict[str, VendorDTO] = {}
+        self._names = NgramIndex()
+        self._loaded_at: Optional[float] = None
+
+    @property
+    def age(self) -> Optional[float]:
+        """Seconds since the last full load, or None if never loaded."""
+        if self._loaded_at is None:
+            return None
+        return time.monotonic() - self._loaded_at
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def _remove(self, vendor_id: int) -> None:
+        vendor = self._by_id.pop(vendor_id, None)
+        if vendor is None:
+            return
+        key = collation_key(vendor.vendor_code or "")
+        if self._by_code.get(key) is vendor:
+            del self._by_code[key]
+        self._names.remove(vendor_id)
+
+    def _add(self, vendor: VendorDTO) -> None:
+        self._by_id[vendor.vendor_id] = vendor
+        self._by_code[collation_key(vendor.vendor_code or "")] = vendor
+        self._names.add(vendor.vendor_id, vendor.vendor_name or "")
+
+    def replace_all(self, vendors: list[VendorDTO]) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._by_code.clear()
+            self._names.clear()
+            for vendor in vendors:
+                self._add(vendor)
+            self._loaded_at = time.monotonic()
+
+    def put(self, vendor: VendorDTO) -> None:
+        """Insert or replace a vendor."""
+        with self._lock:
+            self._remove(vendor.vendor_id)
+            self._add(vendor)
+
+    def remove(self, vendor_id: int) -> None:
+        with self._lock:
+            self._remove(vendor_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._by_id.clear()
+            self._by_code.clear()
+            self._names.clear()
+            self._loaded_at = None
+
+    def get_by_id(self, vendor_id: int) -> Optional[VendorDTO]:
+        return self._by_id.get(vendor_id)
+
+    def get_by_code(self, vendor_code: str) -> Optional[VendorDTO]:
+        return self._by_code.get(collation_key(vendor_code))
+
+    def search(self, vendor_name: Optional[str] = None, vendor_code: Optional[str] = None) -> list[VendorDTO]:
+        """Vendors matching an exact code and/or a name substring, ordered by code."""
+        with self._lock:
+            if vendor_code:
+                vendor = self._by_code.get(collation_key(vendor_code))
+                vendors = [vendor] if vendor is not None else []
+                if vendor_name and vendors and vendor_name.casefold() not in (vendor.vendor_name or "").casefold():
+                    vendors = []
+            elif vendor_name:
+                vendors = [self._by_id[vendor_id] for vendor_id in self._names.search(vendor_name)]
+            else:
+                vendors = list(self._by_id.values())
+        return sorted(vendors, key=lambda v: collation_key(v.vendor_code or ""))
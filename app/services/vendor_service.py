@@ -1,32 +1,66 @@
 import logging
+import threading
 from typing import Optional
 
+from app.database.batch import MAX_PARAMS, chunked, placeholders
 from app.database.connection import db_manager
-from app.models.vendor import VendorDTO
+from app.models.vendor import BulkVendorResult, VendorDTO
+from app.services.vendor_directory import VendorDirectory
+from utils.collation import collation_key
 
 logger = logging.getLogger(__name__)
 
 
+_VENDOR_SELECT = """SELECT m.id, m.ObjectID, m.ObjectName, m.ObjectNickName,
+        m.PersonInCharge, m.ContactPerson, m.Email,
+        m.InvoiceTitle, m.TaxIDNumber, m.OrderTax,
+        m.PayableDiscount, m.Remark, m.DefaultPaymentMethod,
+        p.Telephone1, p.Telephone2, p.Cellphone, p.Fax,
+        a.CompanyAddress, a.DeliveryAddress, a.InvoiceAddress,
+        pi.PayableDay, pi.CheckTitle, pi.CheckDueDay,
+        pi.DiscountRemittanceFee, pi.RemittanceFee,
+        pi.DiscountPostage, pi.Postage,
+        pi.BankBranch, pi.AccountName, pi.BankAccount,
+        pi.IsCheckoutByMonth
+    FROM dbo.Manufacturer m
+    LEFT JOIN dbo.Manufacturer_Phone p ON m.id = p.Manufacturer_id
+    LEFT JOIN dbo.Manufacturer_Address a ON m.id = a.Manufacturer_id
+    LEFT JOIN dbo.Manufacturer_PayInfo pi ON m.id = pi.Manufacturer_id"""
+
+# Vendors are read from the in-process directory. API writes update it in
+# place; a full reload after this many seconds picks up edits made by the
+# desktop client.
+VENDOR_DIRECTORY_MAX_AGE = 600.0
+
+vendor_directory = VendorDirectory()
+_directory_lock = threading.Lock()
+
+
+def load_vendor_directory() -> None:
+    """Load every vendor into the vendor directory."""
+    with db_manager.cursor() as cursor:
+        cursor.execute(f"{_VENDOR_SELECT} ORDER BY m.ObjectID")
+        rows = cursor.fetchall()
+    vendor_directory.replace_all([_row_to_dto(row) for row in rows])
+    logger.info("Vendor directory loaded: %d vendors", len(vendor_directory))
+
+
+def _get_directory() -> VendorDirectory:
+    """The vendor directory, (re)loaded when missing or older than VENDOR_DIRECTORY_MAX_AGE."""
+    age = vendor_directory.age
+    if age is None or age > VENDOR_DIRECTORY_MAX_AGE:
+        with _directory_lock:
+            age = vendor_directory.age
+            if age is None or age > VENDOR_DIRECTORY_MAX_AGE:
+                load_vendor_directory()
+    return vendor_directory
+
+
 def _get_vendor_by_code(vendor_code: str) -> Optional[dict]:
     """Fetch vendor by ObjectID (vendorCode)."""
     with db_manager.cursor() as cursor:
         cursor.execute(
-            """SELECT m.id, m.ObjectID, m.ObjectName, m.ObjectNickName,
-                m.PersonInCharge, m.ContactPerson, m.Email,
-                m.InvoiceTitle, m.TaxIDNumber, m.OrderTax,
-                m.PayableDiscount, m.Remark, m.DefaultPaymentMethod,
-                p.Telephone1, p.Telephone2, p.Cellphone, p.Fax,
-                a.CompanyAddress, a.DeliveryAddress, a.InvoiceAddress,
-                pi.PayableDay, pi.CheckTitle, pi.CheckDueDay,
-                pi.DiscountRemittanceFee, pi.RemittanceFee,
-                pi.DiscountPostage, pi.Postage,
-                pi.BankBranch, pi.AccountName, pi.BankAccount,
-                pi.IsCheckoutByMonth
-            FROM dbo.Manufacturer m
-            LEFT JOIN dbo.Manufacturer_Phone p ON m.id = p.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_Address a ON m.id = a.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_PayInfo pi ON m.id = pi.Manufacturer_id
-            WHERE m.ObjectID = %s""",
+            f"{_VENDOR_SELECT} WHERE m.ObjectID = %s",
             (vendor_code,),
         )
         return cursor.fetchone()
@@ -36,22 +70,7 @@ def _get_vendor_by_id(vendor_id: int) -> Optional[dict]:
     """Fetch vendor by Manufacturer.id (vendorId)."""
     with db_manager.cursor() as cursor:
         cursor.execute(
-            """SELECT m.id, m.ObjectID, m.ObjectName, m.ObjectNickName,
-                m.PersonInCharge, m.ContactPerson, m.Email,
-                m.InvoiceTitle, m.TaxIDNumber, m.OrderTax,
-                m.PayableDiscount, m.Remark, m.DefaultPaymentMethod,
-                p.Telephone1, p.Telephone2, p.Cellphone, p.Fax,
-                a.CompanyAddress, a.DeliveryAddress, a.InvoiceAddress,
-                pi.PayableDay, pi.CheckTitle, pi.CheckDueDay,
-                pi.DiscountRemittanceFee, pi.RemittanceFee,
-                pi.DiscountPostage, pi.Postage,
-                pi.BankBranch, pi.AccountName, pi.BankAccount,
-                pi.IsCheckoutByMonth
-            FROM dbo.Manufacturer m
-            LEFT JOIN dbo.Manufacturer_Phone p ON m.id = p.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_Address a ON m.id = a.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_PayInfo pi ON m.id = pi.Manufacturer_id
-            WHERE m.id = %s""",
+            f"{_VENDOR_SELECT} WHERE m.id = %s",
             (vendor_id,),
         )
         return cursor.fetchone()
@@ -196,8 +215,23 @@ def create_vendor(request) -> VendorDTO:
         manufacturer_id, vendor_code, vendor_name,
     )
 
-    row = _get_vendor_by_code(vendor_code)
-    return _row_to_dto(row)
+    vendor = _row_to_dto({
+        "id": manufacturer_id, "ObjectID": vendor_code, "ObjectName": vendor_name,
+        "ObjectNickName": nick_name, "PersonInCharge": person_in_charge, "ContactPerson": contact_person,
+        "Email": email, "InvoiceTitle": invoice_title, "TaxIDNumber": tax_id_number,
+        "OrderTax": order_tax, "PayableDiscount": payable_discount,
+        "DefaultPaymentMethod": default_payment_method, "Remark": remark,
+        "Telephone1": telephone1, "Telephone2": telephone2, "Cellphone": cellphone, "Fax": fax,
+        "CompanyAddress": company_address, "DeliveryAddress": delivery_address,
+        "InvoiceAddress": invoice_address,
+        "PayableDay": payable_day, "CheckTitle": check_title, "CheckDueDay": check_due_day,
+        "DiscountRemittanceFee": discount_remittance_fee, "RemittanceFee": remittance_fee,
+        "DiscountPostage": discount_postage, "Postage": postage,
+        "BankBranch": bank_branch, "AccountName": account_name, "BankAccount": bank_account,
+        "IsCheckoutByMonth": is_checkout_by_month,
+    })
+    db_manager.after_commit(lambda: vendor_directory.put(vendor))
+    return vendor
 
 
 def update_vendor(request) -> VendorDTO:
@@ -226,6 +260,7 @@ def update_vendor(request) -> VendorDTO:
     # Build dynamic UPDATE for Manufacturer main table
     main_updates = []
     main_params = []
+    main_values = {}
     field_map = {
         "vendor_name": ("ObjectName", request.vendor_name),
         "nick_name": ("ObjectNickName", request.nick_name),
@@ -243,10 +278,12 @@ def update_vendor(request) -> VendorDTO:
         if val is not None:
             main_updates.append(f"{col} = %s")
             main_params.append(val)
+            main_values[col] = val
 
     # Build dynamic UPDATE for Phone
     phone_updates = []
     phone_params = []
+    phone_values = {}
     for attr, col in [
         ("telephone1", "Telephone1"), ("telephone2", "Telephone2"),
         ("cellphone", "Cellphone"), ("fax", "Fax"),
@@ -255,10 +292,12 @@ def update_vendor(request) -> VendorDTO:
         if val is not None:
             phone_updates.append(f"{col} = %s")
             phone_params.append(val)
+            phone_values[col] = val
 
     # Build dynamic UPDATE for Address
     addr_updates = []
     addr_params = []
+    addr_values = {}
     for attr, col in [
         ("company_address", "CompanyAddress"),
         ("delivery_address", "DeliveryAddress"),
@@ -268,10 +307,12 @@ def update_vendor(request) -> VendorDTO:
         if val is not None:
             addr_updates.append(f"{col} = %s")
             addr_params.append(val)
+            addr_values[col] = val
 
     # Build dynamic UPDATE for PayInfo
     pay_updates = []
     pay_params = []
+    pay_values = {}
     for attr, col in [
         ("payable_day", "PayableDay"), ("check_title", "CheckTitle"),
         ("check_due_day", "CheckDueDay"),
@@ -285,42 +326,56 @@ def update_vendor(request) -> VendorDTO:
         if val is not None:
             pay_updates.append(f"{col} = %s")
             pay_params.append(val)
+            pay_values[col] = val
 
     if request.is_checkout_by_month is not None:
         pay_updates.append("IsCheckoutByMonth = %s")
         pay_params.append(1 if request.is_checkout_by_month else 0)
+        pay_values["IsCheckoutByMonth"] = pay_params[-1]
 
     has_updates = main_updates or phone_updates or addr_updates or pay_updates
     if not has_updates:
         # Nothing to update, return existing
         return _row_to_dto(existing)
 
+    # Row as it reads after the update, for the returned DTO and the vendor
+    # directory. Satellite values only apply if the satellite row exists.
+    updated_row = dict(existing)
+
     with db_manager.cursor() as cursor:
         if main_updates:
             cursor.execute(
                 f"UPDATE dbo.Manufacturer SET {', '.join(main_updates)} WHERE id = %s",
                 tuple(main_params) + (manufacturer_id,),
             )
+            updated_row.update(main_values)
         if phone_updates:
             cursor.execute(
                 f"UPDATE dbo.Manufacturer_Phone SET {', '.join(phone_updates)} WHERE Manufacturer_id = %s",
                 tuple(phone_params) + (manufacturer_id,),
             )
+            if cursor.rowcount:
+                updated_row.update(phone_values)
         if addr_updates:
             cursor.execute(
                 f"UPDATE dbo.Manufacturer_Address SET {', '.join(addr_updates)} WHERE Manufacturer_id = %s",
                 tuple(addr_params) + (manufacturer_id,),
             )
+            if cursor.rowcount:
+                updated_row.update(addr_values)
         if pay_updates:
             cursor.execute(
                 f"UPDATE dbo.Manufacturer_PayInfo SET {', '.join(pay_updates)} WHERE Manufacturer_id = %s",
                 tuple(pay_params) + (manufacturer_id,),
             )
+            if cursor.rowcount:
+                updated_row.update(pay_values)
 
     logger.info("Vendor updated - ID: %s, Code: %s", manufacturer_id, object_id)
 
-    row = _get_vendor_by_code(object_id)
-    return _row_to_dto(row)
+    vendor = _row_to_dto(updated_row)
+    db_manager.after_commit(lambda: vendor_directory.put(vendor))
+    return vendor
 
 
 def delete_vendor(vendor_code: str) -> None:
@@ -375,6 +430,8 @@ def delete_vendor(vendor_code: str) -> None:
             (manufacturer_id,),
         )
 
+    db_manager.after_commit(lambda: vendor_directory.remove(manufacturer_id))
+
     logger.info(
         "Vendor deleted - ID: %s, Code: %s, Name: %s",
         manufacturer_id, vendor_code, existing["ObjectName"],
@@ -385,42 +442,195 @@ def list_vendors(
     vendor_name: Optional[str] = None,
     vendor_code: Optional[str] = None,
 ) -> list[VendorDTO]:
-    """Query vendor list with optional filters."""
-
-    conditions = []
-    params = []
-
-    if vendor_code and vendor_code.strip():
-        conditions.append("m.ObjectID = %s")
-        params.append(vendor_code.strip())
+    """Query vendor list with optional filters.
+
+    Answered from the vendor directory: vendorCode matches exactly, vendorName
+    as a case-insensitive substring, results ordered by vendor code.
+    """
+    return _get_directory().search(
+        vendor_name=vendor_name.strip() if vendor_name else None,
+        vendor_code=vendor_code.strip() if vendor_code else None,
+    )
 
-    if vendor_name and vendor_name.strip():
-        conditions.append("m.ObjectName LIKE %s")
-        params.append(f"%{vendor_name.strip()}%")
 
-    where_clause = " AND ".join(conditions) if conditions else "1=1"
+# Bulk upsert source columns per table: (column, VendorDTO attribute, SQL type,
+# default used when inserting a new vendor without the value; None = required).
+# Defaults follow create_vendor.
+_BULK_TABLES = {
+    "dbo.Manufacturer": [
+        ("ObjectName", "vendor_name", "nvarchar(max)", None),
+        ("ObjectNickName", "nick_name", "nvarchar(max)", "N''"),
+        ("PersonInCharge", "person_in_charge", "nvarchar(max)", "N''"),
+        ("ContactPerson", "contact_person", "nvarchar(max)", "N''"),
+        ("Email", "email", "nvarchar(max)", "N''"),
+        ("InvoiceTitle", "invoice_title", "nvarchar(max)", "N''"),
+        ("TaxIDNumber", "tax_id_number", "nvarchar(max)", "N''"),
+        ("OrderTax", "order_tax", "int", "0"),
+        ("PayableDiscount", "payable_discount", "float", "1.0"),
+        ("DefaultPaymentMethod", "default_payment_method", "int", "0"),
+        ("Remark", "remark", "nvarchar(max)", "N''"),
+    ],
+    "dbo.Manufacturer_Phone": [
+        ("Telephone1", "telephone1", "nvarchar(max)", "N''"),
+        ("Telephone2", "telephone2", "nvarchar(max)", "N''"),
+        ("Cellphone", "cellphone", "nvarchar(max)", "N''"),
+        ("Fax", "fax", "nvarchar(max)", "N''"),
+    ],
+    "dbo.Manufacturer_Address": [
+        ("CompanyAddress", "company_address", "nvarchar(max)", "N''"),
+        ("DeliveryAddress", "delivery_address", "nvarchar(max)", "N''"),
+        ("InvoiceAddress", "invoice_address", "nvarchar(max)", "N''"),
+    ],
+    "dbo.Manufacturer_PayInfo": [
+        ("PayableDay", "payable_day", "int", "25"),
+        ("CheckTitle", "check_title", "nvarchar(max)", "N''"),
+        ("CheckDueDay", "check_due_day", "int", "0"),
+        ("DiscountRemittanceFee", "discount_remittance_fee", "int", "0"),
+        ("RemittanceFee", "remittance_fee", "int", "0"),
+        ("DiscountPostage", "discount_postage", "int", "0"),
+        ("Postage", "postage", "int", "0"),
+        ("BankBranch", "bank_branch", "nvarchar(max)", "N''"),
+        ("AccountName", "account_name", "nvarchar(max)", "N''"),
+        ("BankAccount", "bank_account", "nvarchar(max)", "N''"),
+        ("IsCheckoutByMonth", "is_checkout_by_month", "bit", "0"),
+    ],
+}
+
+_BULK_SOURCE = [("RowNo", None, "int", None), ("ObjectID", "vendor_code", "nvarchar(max)", None)] + [
+    column for columns in _BULK_TABLES.values() for column in columns
+]
+_BULK_CHUNK_SIZE = MAX_PARAMS // len(_BULK_SOURCE)
+
+
+def _insert_value(column: str, default: Optional[str]) -> str:
+    return f"src.{column}" if default is None else f"COALESCE(src.{column}, {default})"
+
+
+def _build_bulk_merge_sql(row_count: int) -> str:
+    """Batch that stages ``row_count`` rows in @src and merges them into the four vendor tables.
+
+    Values left null keep the current value of an existing vendor and take
+    the create_vendor default for a new one. A new vendor needs ObjectName;
+    rows without it are not inserted and do not appear in the output.
+    Returns one result set: RowNo, MergeAction, id per merged row.
+    """
+    source_columns = ", ".join(column for column, _, _, _ in _BULK_SOURCE)
+    declarations = ",\n            ".join(f"{column} {sql_type}" for column, _, sql_type, _ in _BULK_SOURCE)
+    values = ", ".join([f"({placeholders(len(_BULK_SOURCE))})"] * row_count)
+
+    statements = []
+    for table, columns in _BULK_TABLES.items():
+        names = [column for column, _, _, _ in columns]
+        update = ", ".join(f"{column} = COALESCE(src.{column}, tgt.{column})" for column in names)
+        inserted = ", ".join(_insert_value(column, default) for column, _, _, default in columns)
+        if table == "dbo.Manufacturer":
+            statements.append(f"""MERGE dbo.Manufacturer WITH (HOLDLOCK) AS tgt
+        USING @src AS src ON tgt.ObjectID = src.ObjectID
+        WHEN MATCHED THEN UPDATE SET {update}
+        WHEN NOT MATCHED BY TARGET AND src.ObjectName IS NOT NULL THEN
+            INSERT (ObjectID, {", ".join(names)}) VALUES (src.ObjectID, {inserted})
+        OUTPUT src.RowNo, $action, inserted.id INTO @merged (RowNo, MergeAction, id);""")
+        else:
+            statements.append(f"""MERGE {table} WITH (HOLDLOCK) AS tgt
+        USING (
+            SELECT m.id AS Manufacturer_id, s.ObjectID, {", ".join(f"s.{column}" for column in names)}
+            FROM @merged m
+            JOIN @src s ON s.RowNo = m.RowNo
+        ) AS src ON tgt.Manufacturer_id = src.Manufacturer_id
+        WHEN MATCHED THEN UPDATE SET {update}
+        WHEN NOT MATCHED BY TARGET THEN
+            INSERT (Manufacturer_id, ObjectID, {", ".join(names)})
+            VALUES (src.Manufacturer_id, src.ObjectID, {inserted});""")
+
+    merges = "\n        ".join(statements)
+    return f"""SET NOCOUNT ON;
+        DECLARE @src TABLE (
+            {declarations}
+        );
+        DECLARE @merged TABLE (RowNo int, MergeAction nvarchar(10), id int);
+        INSERT INTO @src ({source_columns}) VALUES {values};
+        {merges}
+        SELECT RowNo, MergeAction, id FROM @merged;"""
+
+
+def _bulk_source_row(row_no: int, vendor: VendorDTO) -> tuple:
+    values = []
+    for column, attr, _, _ in _BULK_SOURCE:
+        if attr is None:
+            values.append(row_no)
+            continue
+        value = getattr(vendor, attr)
+        if attr in ("vendor_code", "vendor_name"):
+            value = (value.strip() or None) if value is not None else None
+        elif attr == "is_checkout_by_month" and value is not None:
+            value = 1 if value else 0
+        values.append(value)
+    return tuple(values)
+
+
+def bulk_upsert_vendors(rows: list[tuple[Optional[VendorDTO], Optional[str]]]) -> list[BulkVendorResult]:
+    """Create or update many vendors, matched by vendorCode.
+
+    Rows are merged with set-based MERGE statements into Manufacturer and its
+    Phone / Address / PayInfo tables, one batch per chunk, all in a single
+    transaction. Fields left out keep their current value on existing
+    vendors; new vendors get the create_vendor defaults and must carry a
+    vendorName. vendorId in the input is ignored.
+
+    Rows that fail validation, repeat an earlier vendorCode, or are new
+    without a name are reported as errors and skipped; the others are
+    still written.
+
+    Args:
+        rows: (vendor, None) or (None, parse error) per input row, in order
+
+    Returns:
+        One result per input row (1-based ``row``)
+    """
+    results = [BulkVendorResult(row=i + 1, status="error") for i in range(len(rows))]
+    pending = []
+    seen_codes = {}
+    for i, (vendor, error) in enumerate(rows):
+        result = results[i]
+        if vendor is None:
+            result.message = error
+            continue
+        vendor_code = (vendor.vendor_code or "").strip()
+        result.vendor_code = vendor_code or None
+        if not vendor_code:
+            result.message = "廠商代碼不能為空"
+            continue
+        key = collation_key(vendor_code)
+        if key in seen_codes:
+            result.message = f"廠商代碼與第 {seen_codes[key]} 筆重複：{vendor_code}"
+            continue
+        seen_codes[key] = i + 1
+        pending.append(_bulk_source_row(i + 1, vendor))
+
+    merged = 0
+    with db_manager.transaction():
+        with db_manager.cursor() as cursor:
+            for chunk in chunked(pending, _BULK_CHUNK_SIZE):
+                cursor.execute(
+                    _build_bulk_merge_sql(len(chunk)),
+                    tuple(value for row in chunk for value in row),
+                )
+                for row in cursor.fetchall():
+                    result = results[row["RowNo"] - 1]
+                    result.vendor_id = int(row["id"])
+                    result.status = "created" if row["MergeAction"] == "INSERT" else "updated"
+                    merged += 1
+        if merged:
+            # Rows were merged set-based, so reload the directory rather than patch it
+            db_manager.after_commit(vendor_directory.clear)
+
+    for row_no, *_ in pending:
+        result = results[row_no - 1]
+        if result.status == "error":
+            result.message = f"廠商不存在，新增需提供廠商名稱：{result.vendor_code}"
 
-    with db_manager.cursor() as cursor:
-        cursor.execute(
-            f"""SELECT m.id, m.ObjectID, m.ObjectName, m.ObjectNickName,
-                m.PersonInCharge, m.ContactPerson, m.Email,
-                m.InvoiceTitle, m.TaxIDNumber, m.OrderTax,
-                m.PayableDiscount, m.Remark, m.DefaultPaymentMethod,
-                p.Telephone1, p.Telephone2, p.Cellphone, p.Fax,
-                a.CompanyAddress, a.DeliveryAddress, a.InvoiceAddress,
-                pi.PayableDay, pi.CheckTitle, pi.CheckDueDay,
-                pi.DiscountRemittanceFee, pi.RemittanceFee,
-                pi.DiscountPostage, pi.Postage,
-                pi.BankBranch, pi.AccountName, pi.BankAccount,
-                pi.IsCheckoutByMonth
-            FROM dbo.Manufacturer m
-            LEFT JOIN dbo.Manufacturer_Phone p ON m.id = p.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_Address a ON m.id = a.Manufacturer_id
-            LEFT JOIN dbo.Manufacturer_PayInfo pi ON m.id = pi.Manufacturer_id
-            WHERE {where_clause}
-            ORDER BY m.ObjectID""",
-            tuple(params),
-        )
-        rows = cursor.fetchall()
-
-    return [_row_to_dto(row) for row in rows]
+    logger.info(
+        "Vendor bulk upsert - rows: %d, merged: %d, failed: %d",
+        len(rows), merged, len(rows) - merged,
+    )
+    return results
@@ -1,12 +1,18 @@
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import BinaryIO, Callable, Optional
 
+from app.database.batch import MAX_PARAMS, chunked, insert_many, placeholders
 from app.database.connection import db_manager
-from app.models.waiting_product import WaitingProductDTO
+from app.models.waiting_product import BulkWaitingProductResult, PromotedProductResult, WaitingProductDTO
+from app.services import picture_store
+from utils.collation import collation_key
 
 logger = logging.getLogger(__name__)
 
+# CheckStore has three picture columns, Picture1..Picture3
+PICTURE_SLOTS = 3
+
 # WaitConfirmStatus ordinal values matching Java Product_Enum.WaitConfirmStatus
 WAIT_CONFIRM_STATUS = {"新增": 0, "更新": 1, "封存": 2, "忽略": 3}
 WAIT_CONFIRM_STATUS_REVERSE = {v: k for k, v in WAIT_CONFIRM_STATUS.items()}
@@ -19,68 +25,94 @@ def _product_code_exists(product_code: str) -> bool:
         return cursor.fetchone() is not None
 
 
-def create_waiting_product(request) -> dict:
-    """Create a waiting product record. Returns dict with productCode and productName."""
+# CheckStore columns written for a new waiting product, in _checkstore_row order
+_CHECKSTORE_COLUMNS = (
+    "ProductCode", "ProductName", "VendorCode", "Vendor",
+    "Pricing", "SinglePrice", "BatchPrice", "VipPrice1", "VipPrice2", "VipPrice3",
+    "Unit", "Brand", "[Describe]", "Remark", "SupplyStatus", "NewFirstCategory",
+    "FirstCategory_Id", "SecondCategory_Id", "ThirdCategory_Id",
+    "Picture1", "Picture2", "Picture3",
+    "KeyinDate", "UpdateDate", "Status",
+)
 
-    if _product_code_exists(request.product_code):
-        raise ValueError(f"商品碼已存在：{request.product_code}")
 
-    # Validate newFirstCategory if provided
-    new_first_category = request.new_first_category
+def _normalize_new_first_category(new_first_category: Optional[str]) -> str:
+    """Validate newFirstCategory if provided; empty string when not."""
     if new_first_category is not None and new_first_category.strip():
         new_first_category = new_first_category.strip()
         if len(new_first_category) != 2:
             raise ValueError(f"總類編號長度必須為 2 位數，目前為 {len(new_first_category)} 位")
-    else:
-        new_first_category = ""
+        return new_first_category
+    return ""
+
+
+def _prepare_pictures(request) -> tuple:
+    """Validate picture1..3 before anything is written (see picture_store.prepare_picture)."""
+    return tuple(
+        picture_store.prepare_picture(picture) if picture and picture.strip() else None
+        for picture in (request.picture1, request.picture2, request.picture3)
+    )
+
+
+def _store_pictures(prepared: tuple) -> tuple[Optional[str], Optional[str], Optional[str]]:
+    """Put prepared pictures into the picture store; CheckStore keeps only the hash.
+
+    Call inside the unit of work that writes the row, so a rollback also
+    discards the pictures.
+    """
+    picture1, picture2, picture3 = (
+        picture_store.store_prepared_picture(picture) if picture is not None else None
+        for picture in prepared
+    )
+    return picture1, picture2, picture3
+
+
+def _checkstore_row(request, new_first_category: str, pictures: tuple, current_date: str) -> tuple:
+    """CheckStore values for a new waiting product, in _CHECKSTORE_COLUMNS order."""
+    return (
+        request.product_code,
+        request.product_name,
+        request.vendor_code,
+        request.vendor,
+        request.pricing if request.pricing is not None else 0,
+        request.single_price if request.single_price is not None else 0,
+        request.batch_price if request.batch_price is not None else 0,
+        request.vip_price1 if request.vip_price1 is not None else 0,
+        request.vip_price2 if request.vip_price2 is not None else 0,
+        request.vip_price3 if request.vip_price3 is not None else 0,
+        request.unit or "",
+        request.brand or "",
+        request.describe or "",
+        request.remark or "",
+        request.supply_status or "",
+        new_first_category,
+        request.first_category_id,
+        request.second_category_id,
+        request.third_category_id,
+        *pictures,
+        current_date,
+        current_date,
+        WAIT_CONFIRM_STATUS["新增"],
+    )
+
+
+def create_waiting_product(request) -> dict:
+    """Create a waiting product record. Returns dict with productCode and productName."""
+
+    if _product_code_exists(request.product_code):
+        raise ValueError(f"商品碼已存在：{request.product_code}")
 
+    new_first_category = _normalize_new_first_category(request.new_first_category)
+    prepared = _prepare_pictures(request)
     current_date = datetime.now().strftime("%Y/%m/%d")
-    status_ordinal = WAIT_CONFIRM_STATUS["新增"]
 
     with db_manager.cursor() as cursor:
-        cursor.execute(
-            "INSERT INTO CheckStore ("
-            "ProductCode, ProductName, VendorCode, Vendor, "
-            "Pricing, SinglePrice, BatchPrice, VipPrice1, VipPrice2, VipPrice3, "
-            "Unit, Brand, [Describe], Remark, SupplyStatus, NewFirstCategory, "
-            "FirstCategory_Id, SecondCategory_Id, ThirdCategory_Id, "
-            "Picture1, Picture2, Picture3, "
-            "KeyinDate, UpdateDate, Status"
-            ") VALUES ("
-            "%s, %s, %s, %s, "
-            "%s, %s, %s, %s, %s, %s, "
-            "%s, %s, %s, %s, %s, %s, "
-            "%s, %s, %s, "
-            "%s, %s, %s, "
-            "%s, %s, %s"
-            ")",
-            (
-                request.product_code,
-                request.product_name,
-                request.vendor_code,
-                request.vendor,
-                request.pricing if request.pricing is not None else 0,
-                request.single_price if request.single_price is not None else 0,
-                request.batch_price if request.batch_price is not None else 0,
-                request.vip_price1 if request.vip_price1 is not None else 0,
-                request.vip_price2 if request.vip_price2 is not None else 0,
-                request.vip_price3 if request.vip_price3 is not None else 0,
-                request.unit or "",
-                request.brand or "",
-                request.describe or "",
-                request.remark or "",
-                request.supply_status or "",
-                new_first_category,
-                request.first_category_id,
-                request.second_category_id,
-                request.third_category_id,
-                request.picture1,
-                request.picture2,
-                request.picture3,
-                current_date,
-                current_date,
-                status_ordinal,
-            ),
+        pictures = _store_pictures(prepared)
+        insert_many(
+            cursor,
+            "CheckStore",
+            _CHECKSTORE_COLUMNS,
+            [_checkstore_row(request, new_first_category, pictures, current_date)],
         )
 
     logger.info("Waiting product created - ProductCode: %s", request.product_code)
@@ -90,12 +122,34 @@ def create_waiting_product(request) -> dict:
     }
 
 
+def _picture_columns(include_pictures: bool) -> str:
+    """Picture1..3 in full, or only their picture-store references plus HasPictureN flags.
+
+    Legacy rows hold base64 text in the picture columns, so the summary form
+    keeps list payloads small whatever the rows contain.
+    """
+    if include_pictures:
+        return ", ".join(f"Picture{n}" for n in range(1, PICTURE_SLOTS + 1))
+    return ", ".join(
+        f"CASE WHEN Picture{n} LIKE 'sha256:%%' THEN CAST(Picture{n} AS nvarchar(80)) END AS Picture{n}, "
+        f"CASE WHEN DATALENGTH(Picture{n}) > 0 THEN 1 ELSE 0 END AS HasPicture{n}"
+        for n in range(1, PICTURE_SLOTS + 1)
+    )
+
+
 def get_waiting_product_list(
     vendor_code: Optional[int] = None,
     product_name: Optional[str] = None,
     status: Optional[str] = None,
+    include_pictures: bool = False,
 ) -> list[WaitingProductDTO]:
-    """Query waiting product list from CheckStore table."""
+    """Query waiting product list from CheckStore table.
+
+    Picture contents are only returned with ``include_pictures``; otherwise
+    each slot carries its picture reference (if stored in the picture store)
+    and a presence flag, and clients fetch the bytes from
+    get_waiting_product_picture.
+    """
 
     query = (
         "SELECT ProductCode, ProductName, VendorCode, Vendor, "
@@ -103,7 +157,7 @@ def get_waiting_product_list(
         "Unit, Brand, [Describe], Remark, SupplyStatus, NewFirstCategory, "
         "FirstCategory_Id, SecondCategory_Id, ThirdCategory_Id, "
         "KeyinDate, CONVERT(nvarchar, UpdateDate) as UpdateDate, Status, "
-        "Picture1, Picture2, Picture3 "
+        f"{_picture_columns(include_pictures)} "
         "FROM CheckStore WHERE 1=1"
     )
     params = []
@@ -162,7 +216,359 @@ def get_waiting_product_list(
                 picture1=row.get("Picture1"),
                 picture2=row.get("Picture2"),
                 picture3=row.get("Picture3"),
+                hasPicture1=bool(row.get("HasPicture1", row.get("Picture1"))),
+                hasPicture2=bool(row.get("HasPicture2", row.get("Picture2"))),
+                hasPicture3=bool(row.get("HasPicture3", row.get("Picture3"))),
             )
             results.append(dto)
 
     return results
+
+
+def get_waiting_product_picture(product_code: str, slot: int) -> Optional[str]:
+    """Raw value of a waiting product's picture slot (reference or legacy base64).
+
+    Returns:
+        The stored value, or None if the product does not exist or the slot is empty
+    """
+    if slot < 1 or slot > PICTURE_SLOTS:
+        raise ValueError(f"圖片位置必須介於 1 到 {PICTURE_SLOTS}")
+
+    with db_manager.cursor() as cursor:
+        cursor.execute(
+            f"SELECT Picture{slot} AS Picture FROM CheckStore WHERE ProductCode = %s",
+            (product_code.strip(),),
+        )
+        row = cursor.fetchone()
+    if row is None or not row["Picture"]:
+        return None
+    return row["Picture"]
+
+
+def set_waiting_product_pictures(product_code: str, files: list[BinaryIO], slot: Optional[int] = None) -> list[str]:
+    """Store uploaded pictures into a waiting product's picture slots.
+
+    Files fill consecutive slots starting at ``slot`` (default 1),
+    replacing whatever those slots held.
+
+    Returns:
+        Picture references in upload order
+    """
+    product_code = product_code.strip()
+    if not product_code:
+        raise ValueError("商品碼不能為空")
+    if not files:
+        raise ValueError("未提供圖片檔案")
+    first_slot = slot if slot is not None else 1
+    if first_slot < 1 or first_slot + len(files) - 1 > PICTURE_SLOTS:
+        raise ValueError(f"圖片位置必須介於 1 到 {PICTURE_SLOTS}，目前為 {first_slot} 起共 {len(files)} 張")
+    if not _product_code_exists(product_code):
+        raise ValueError(f"商品碼不存在：{product_code}")
+
+    with db_manager.cursor() as cursor:
+        picture_refs = [picture_store.store_picture_file(file) for file in files]
+        assignments = [f"Picture{first_slot + i} = %s" for i in range(len(picture_refs))]
+        cursor.execute(
+            f"UPDATE CheckStore SET {', '.join(assignments)}, UpdateDate = %s WHERE ProductCode = %s",
+            tuple(picture_refs) + (datetime.now().strftime("%Y/%m/%d"), product_code),
+        )
+        if not cursor.rowcount:
+            raise ValueError(f"商品碼不存在：{product_code}")
+
+    logger.info(
+        "Waiting product pictures set - ProductCode: %s, Slots: %d-%d",
+        product_code, first_slot, first_slot + len(picture_refs) - 1,
+    )
+    return picture_refs
+
+
+def _existing_product_codes(product_codes: list[str]) -> set[str]:
+    """Those of ``product_codes`` already in CheckStore (case-folded), via chunked IN queries."""
+    existing = set()
+    with db_manager.cursor() as cursor:
+        for chunk in chunked(product_codes, MAX_PARAMS):
+            cursor.execute(
+                f"SELECT ProductCode FROM CheckStore WHERE ProductCode IN ({placeholders(len(chunk))})",
+                tuple(chunk),
+            )
+            existing.update(collation_key(row["ProductCode"]) for row in cursor.fetchall())
+    return existing
+
+
+def bulk_create_waiting_products(
+    rows: list[tuple[Optional[object], Optional[str]]],
+    validate: Optional[Callable[[object], None]] = None,
+) -> list[BulkWaitingProductResult]:
+    """Create many waiting products in one transaction.
+
+    Every row is validated first (``validate``, then newFirstCategory and
+    pictures), all product codes are checked against CheckStore with one
+    chunked IN query, and the remaining rows are inserted with multi-row
+    INSERT statements. Invalid rows, codes already in CheckStore and codes
+    repeated within the request are reported per row and skipped.
+
+    Args:
+        rows: (request, None) or (None, parse error) per input row, in order
+        validate: Per-row request validation raising ValueError
+
+    Returns:
+        One result per input row (1-based ``row``)
+    """
+    results = [BulkWaitingProductResult(row=i + 1, status="error") for i in range(len(rows))]
+    candidates = []
+    seen_codes = {}
+    for i, (request, error) in enumerate(rows):
+        result = results[i]
+        if request is None:
+            result.message = error
+            continue
+        result.product_code = request.product_code.strip() or None
+        try:
+            if validate is not None:
+                validate(request)
+            if result.product_code is None:
+                raise ValueError("商品碼不能為空")
+            new_first_category = _normalize_new_first_category(request.new_first_category)
+        except ValueError as e:
+            result.message = str(e)
+            continue
+        key = collation_key(result.product_code)
+        if key in seen_codes:
+            result.message = f"商品碼與第 {seen_codes[key]} 筆重複：{result.product_code}"
+            continue
+        seen_codes[key] = i + 1
+        candidates.append((i, key, request.model_copy(update={"product_code": result.product_code}),
+                           new_first_category))
+
+    existing = _existing_product_codes([request.product_code for _, _, request, _ in candidates])
+
+    current_date = datetime.now().strftime("%Y/%m/%d")
+    insert_rows = []
+    with db_manager.transaction():
+        # Pictures are stored inside the unit of work, each row's only after
+        # all of them validated, so skipped rows and rollbacks leave none behind
+        for i, key, request, new_first_category in candidates:
+            result = results[i]
+            if key in existing:
+                result.message = f"商品碼已存在：{result.product_code}"
+                continue
+            try:
+                prepared = _prepare_pictures(request)
+            except ValueError as e:
+                result.message = str(e)
+                continue
+            pictures = _store_pictures(prepared)
+            insert_rows.append(_checkstore_row(request, new_first_category, pictures, current_date))
+            result.status = "created"
+
+        with db_manager.cursor() as cursor:
+            insert_many(cursor, "CheckStore", _CHECKSTORE_COLUMNS, insert_rows)
+
+    logger.info(
+        "Waiting products bulk created - rows: %d, created: %d, failed: %d",
+        len(rows), len(insert_rows), len(rows) - len(insert_rows),
+    )
+    return results
+
+
+# Waiting products in these states can be promoted into the live catalog;
+# promoted rows are flipped to PROMOTED_STATUS in the same transaction.
+PROMOTABLE_STATUSES = ("新增", "更新")
+PROMOTED_STATUS = "封存"
+
+# Live catalog columns filled from CheckStore (target column -> CheckStore
+# expression). Store rows are matched to CheckStore by ISBN = ProductCode.
+# The catalog and the search index only list rows with a FirmCode, so new
+# rows get the product code there, as the desktop client does.
+_PROMOTE_STORE_COLUMNS = {
+    "ISBN": "ProductCode",
+    "FirmCode": "ProductCode",
+    "ProductCode": "ProductCode",
+    "ProductName": "ProductName",
+    "Unit": "Unit",
+    "VendorCode": "VendorCode",
+    "Vendor": "Vendor",
+}
+_PROMOTE_SATELLITES = {
+    "store_price": {
+        "Pricing": "Pricing", "SinglePrice": "SinglePrice", "BatchPrice": "BatchPrice",
+        "VipPrice1": "VipPrice1", "VipPrice2": "VipPrice2", "VipPrice3": "VipPrice3",
+    },
+    "store_category": {
+        "NewFirstCategory": "NewFirstCategory", "FirstCategory_Id": "FirstCategory_Id",
+        "SecondCategory_Id": "SecondCategory_Id", "ThirdCategory_Id": "ThirdCategory_Id",
+    },
+}
+# Product search INNER JOINs these, so a promoted product needs a row in each
+_PROMOTE_PLACEHOLDER_TABLES = ("ProductPicture", "ProductBookCase")
+
+
+def _satellite_merge_sql(table: str, columns: dict[str, str]) -> str:
+    updates = ", ".join(f"tgt.{target} = src.{target}" for target in columns)
+    targets = ", ".join(columns)
+    selects = ", ".join(f"c.{source} AS {target}" for target, source in columns.items())
+    values = ", ".join(f"src.{target}" for target in columns)
+    return (
+        f"MERGE {table} WITH (HOLDLOCK) AS tgt "
+        f"USING (SELECT p.store_id, {selects} FROM @promoted p "
+        f"JOIN CheckStore c ON c.ProductCode = p.ProductCode) AS src "
+        f"ON tgt.store_id = src.store_id "
+        f"WHEN MATCHED THEN UPDATE SET {updates} "
+        f"WHEN NOT MATCHED THEN INSERT (store_id, {targets}) VALUES (src.store_id, {values});"
+    )
+
+
+def _build_promote_sql() -> str:
+    """One batch promoting every CheckStore row listed in #promote_codes.
+
+    Store is merged first and its OUTPUT (store id, product code, action)
+    drives the satellite tables and the CheckStore status flip, so each step
+    is a single set-based statement. Parameters: store_date UpdateDate,
+    KeyinDate and UpdateDate, then the promoted Status and CheckStore UpdateDate.
+    """
+    # An existing row keeps its ISBN, and its FirmCode unless it has none
+    store_updates = ", ".join(
+        f"tgt.{target} = ISNULL(tgt.{target}, src.{target})" if target == "FirmCode"
+        else f"tgt.{target} = src.{target}"
+        for target in _PROMOTE_STORE_COLUMNS if target != "ISBN"
+    )
+    store_targets = ", ".join(_PROMOTE_STORE_COLUMNS)
+    store_selects = ", ".join(f"c.{source} AS {target}" for target, source in _PROMOTE_STORE_COLUMNS.items())
+    store_values = ", ".join(f"src.{target}" for target in _PROMOTE_STORE_COLUMNS)
+
+    statements = [
+        "SET NOCOUNT ON;",
+        "DECLARE @promoted TABLE (store_id INT NOT NULL, ProductCode NVARCHAR(450) NOT NULL, "
+        "MergeAction NVARCHAR(10) NOT NULL);",
+        f"MERGE Store WITH (HOLDLOCK) AS tgt "
+        f"USING (SELECT {store_selects} FROM CheckStore c "
+        f"JOIN #promote_codes k ON k.ProductCode = c.ProductCode) AS src "
+        f"ON tgt.ISBN = src.ISBN "
+        f"WHEN MATCHED THEN UPDATE SET {store_updates} "
+        f"WHEN NOT MATCHED THEN INSERT ({store_targets}) VALUES ({store_values}) "
+        f"OUTPUT inserted.id, src.ProductCode, $action INTO @promoted;",
+    ]
+    statements.extend(_satellite_merge_sql(table, columns) for table, columns in _PROMOTE_SATELLITES.items())
+    statements.append(
+        "MERGE store_date WITH (HOLDLOCK) AS tgt "
+        "USING (SELECT DISTINCT store_id FROM @promoted) AS src "
+        "ON tgt.store_id = src.store_id "
+        "WHEN MATCHED THEN UPDATE SET tgt.UpdateDate = %s "
+        "WHEN NOT MATCHED THEN INSERT (store_id, KeyinDate, UpdateDate) VALUES (src.store_id, %s, %s);"
+    )
+    statements.extend(
+        f"INSERT INTO {table} (store_id) SELECT DISTINCT p.store_id FROM @promoted p "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE t.store_id = p.store_id);"
+        for table in _PROMOTE_PLACEHOLDER_TABLES
+    )
+    statements.append(
+        "UPDATE c SET c.Status = %s, c.UpdateDate = %s FROM CheckStore c "
+        "WHERE EXISTS (SELECT 1 FROM @promoted p WHERE p.ProductCode = c.ProductCode);"
+    )
+    statements.append("SELECT store_id, ProductCode, MergeAction FROM @promoted ORDER BY store_id;")
+    return "\n".join(statements)
+
+
+def promote_waiting_products(
+    status: Optional[str] = None,
+    product_codes: Optional[list[str]] = None,
+) -> list[PromotedProductResult]:
+    """Promote approved CheckStore rows into Store and its satellite tables.
+
+    The rows are selected either by status (新增 or 更新) or by product code;
+    their codes are collected in a session temp table, then Store,
+    store_price, store_category and store_date are merged with one
+    set-based statement each and the promoted CheckStore rows are set to
+    封存, all in one transaction. A product already in Store (same ISBN) is
+    updated, any other is inserted.
+
+    Args:
+        status: Promote every waiting product with this status
+        product_codes: Promote these waiting products
+
+    Returns:
+        One result per promoted product, then one per requested code that
+        was skipped (unknown, or not in a promotable status)
+
+    Raises:
+        ValueError: If neither or both selectors are given, or the status is invalid
+    """
+    if (status is None) == (product_codes is None):
+        raise ValueError("必須指定 status 或 productCodes 其中之一")
+
+    promotable = [WAIT_CONFIRM_STATUS[name] for name in PROMOTABLE_STATUSES]
+    codes = []
+    if status is not None:
+        status = status.strip()
+        if status not in PROMOTABLE_STATUSES:
+            raise ValueError(f"只能上架狀態為 {'、'.join(PROMOTABLE_STATUSES)} 的待確認商品")
+    else:
+        seen = set()
+        for code in product_codes:
+            code = code.strip()
+            if code and collation_key(code) not in seen:
+                seen.add(collation_key(code))
+                codes.append(code)
+        if not codes:
+            raise ValueError("商品碼不能為空")
+
+    current_date = datetime.now().strftime("%Y/%m/%d")
+    with db_manager.transaction():
+        with db_manager.cursor() as cursor:
+            # Created inside the transaction, so a rollback drops it as well
+            cursor.execute(
+                "CREATE TABLE #promote_codes "
+                "(ProductCode NVARCHAR(450) COLLATE DATABASE_DEFAULT NOT NULL PRIMARY KEY)"
+            )
+            if status is not None:
+                cursor.execute(
+                    "INSERT INTO #promote_codes (ProductCode) "
+                    "SELECT DISTINCT ProductCode FROM CheckStore WHERE Status = %s",
+                    (WAIT_CONFIRM_STATUS[status],),
+                )
+            else:
+                status_marks = placeholders(len(promotable))
+                for chunk in chunked(codes, MAX_PARAMS - len(promotable)):
+                    cursor.execute(
+                        f"INSERT INTO #promote_codes (ProductCode) "
+                        f"SELECT DISTINCT ProductCode FROM CheckStore "
+                        f"WHERE ProductCode IN ({placeholders(len(chunk))}) AND Status IN ({status_marks}) "
+                        f"AND NOT EXISTS (SELECT 1 FROM #promote_codes k WHERE k.ProductCode = CheckStore.ProductCode)",
+                        tuple(chunk) + tuple(promotable),
+                    )
+
+            cursor.execute(
+                _build_promote_sql(),
+                (current_date, current_date, current_date,
+                 WAIT_CONFIRM_STATUS[PROMOTED_STATUS], current_date),
+            )
+            promoted_rows = cursor.fetchall()
+            cursor.execute("DROP TABLE #promote_codes")
+
+    results = []
+    promoted_codes = set()
+    for row in promoted_rows:
+        code = row["ProductCode"].rstrip()
+        if collation_key(code) in promoted_codes:
+            continue
+        promoted_codes.add(collation_key(code))
+        results.append(PromotedProductResult(
+            product_code=code,
+            store_id=row["store_id"],
+            status="created" if row["MergeAction"] == "INSERT" else "updated",
+        ))
+    for code in codes:
+        if collation_key(code) not in promoted_codes:
+            results.append(PromotedProductResult(
+                product_code=code,
+                status="skipped",
+                message=f"商品碼不存在或狀態不可上架：{code}",
+            ))
+
+    logger.info(
+        "Waiting products promoted - created: %d, updated: %d, skipped: %d",
+        sum(r.status == "created" for r in results),
+        sum(r.status == "updated" for r in results),
+        sum(r.status == "skipped" for r in results),
+    )
+    return results
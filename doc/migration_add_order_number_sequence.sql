@@ -0,0 +1,14 @@
+-- Migration: Add OrderNumberSequence counter table
+-- Purpose: Allocate OrderNumber (yyyymmdd + 4-digit sequence) atomically per OrderSource and day
+-- LastSeq holds the last sequence handed out for (OrderSource, DatePrefix)
+-- The index lets the allocator resync with orders created elsewhere through a range seek
+
+CREATE TABLE dbo.OrderNumberSequence (
+    OrderSource int NOT NULL,
+    DatePrefix char(8) NOT NULL,
+    LastSeq int NOT NULL,
+    CONSTRAINT PK_OrderNumberSequence PRIMARY KEY (OrderSource, DatePrefix)
+);
+
+CREATE INDEX IX_Orders_OrderSource_OrderNumber
+ON dbo.Orders (OrderSource, OrderNumber);
@@ -76,7 +76,7 @@ class AppGUI(ctk.CTk):
             self._status_bar.set_db_status(False)
             return
 
-        db_manager.configure(server_info)
+        db_manager.configure(server_info, self._config_panel.get_pool_config())
 
         # Test connection first
         success, msg = db_manager.test_connection()
@@ -98,7 +98,11 @@ class AppGUI(ctk.CTk):
 
         # Create FastAPI app with middleware
         context_path = self._config_panel.get_context_path()
-        app = create_app(context_path)
+        app = create_app(
+            context_path,
+            self._config_panel.get_product_index_config(),
+            self._config_panel.get_order_number_config(),
+        )
         app.add_middleware(LoggingMiddleware)
 
         # Start server
@@ -6,6 +6,9 @@ import customtkinter as ctk
 from app.database.config import (
     AppConfig,
     DatabaseServerInfo,
+    OrderNumberConfig,
+    PoolConfig,
+    ProductIndexConfig,
     load_app_config,
     load_database_servers,
     save_app_config,
@@ -166,6 +169,9 @@ class ConfigPanel(ctk.CTkFrame):
             port=port,
             context_path=context_path,
             selected_db_index=selected_index,
+            pool=self._config.pool,
+            product_index=self._config.product_index,
+            order_number=self._config.order_number,
         )
         save_app_config(self._config)
         self._conn_status.configure(text="Config saved", text_color="#2ecc71")
@@ -189,3 +195,12 @@ class ConfigPanel(ctk.CTkFrame):
 
     def get_selected_db(self) -> Optional[DatabaseServerInfo]:
         return self._get_selected_server()
+
+    def get_pool_config(self) -> PoolConfig:
+        return self._config.pool
+
+    def get_product_index_config(self) -> ProductIndexConfig:
+        return self._config.product_index
+
+    def get_order_number_config(self) -> OrderNumberConfig:
+        return self._config.order_number
@@ -0,0 +1,57 @@
+import pytest
+
+from app.database.batch import MAX_PARAMS, MAX_VALUES_ROWS, chunked, insert_many, placeholders
+
+
+class _RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, sql, params):
+        self.statements.append((sql, params))
+
+
+def test_chunked_splits_into_bounded_slices():
+    assert list(chunked([1, 2, 3, 4, 5], 2)) == [[1, 2], [3, 4], [5]]
+    assert list(chunked([], 3)) == []
+
+
+def test_chunked_rejects_non_positive_size():
+    with pytest.raises(ValueError):
+        list(chunked([1], 0))
+
+
+def test_placeholders():
+    assert placeholders(3) == "%s,%s,%s"
+    assert placeholders(1) == "%s"
+
+
+def test_insert_many_without_rows_executes_nothing():
+    cursor = _RecordingCursor()
+    insert_many(cursor, "dbo.T", ("A", "B"), [])
+    assert cursor.statements == []
+
+
+def test_insert_many_builds_multi_row_values():
+    cursor = _RecordingCursor()
+    insert_many(cursor, "dbo.T", ("A", "B"), [(1, "x"), (2, "y")])
+    assert cursor.statements == [
+        ("INSERT INTO dbo.T (A, B) VALUES (%s,%s), (%s,%s)", (1, "x", 2, "y")),
+    ]
+
+
+def test_insert_many_stays_under_parameter_limit():
+    columns = ("A", "B", "C", "D", "E", "F", "G")
+    rows = [tuple(range(len(columns)))] * 1000
+    cursor = _RecordingCursor()
+    insert_many(cursor, "dbo.T", columns, rows)
+    assert sum(len(params) for _, params in cursor.statements) == len(rows) * len(columns)
+    assert all(len(params) <= MAX_PARAMS for _, params in cursor.statements)
+    assert len(cursor.statements) == 4
+
+
+def test_insert_many_stays_under_values_row_limit():
+    rows = [(i,) for i in range(MAX_VALUES_ROWS + 1)]
+    cursor = _RecordingCursor()
+    insert_many(cursor, "dbo.T", ("A",), rows)
+    assert [len(params) for _, params in cursor.statements] == [MAX_VALUES_ROWS, 1]
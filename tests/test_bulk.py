@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from pydantic import BaseModel
+
+from app.models import bulk
+from app.models.bulk import parse_bulk_rows
+
+
+class _Row(BaseModel):
+    code: str
+    quantity: int
+
+
+def test_parses_json_array():
+    body = json.dumps([{"code": "A", "quantity": 1}, {"code": "B", "quantity": 2}]).encode()
+    rows = parse_bulk_rows(body, _Row)
+    assert rows == [(_Row(code="A", quantity=1), None), (_Row(code="B", quantity=2), None)]
+
+
+def test_parses_ndjson_skipping_blank_lines():
+    body = b'{"code": "A", "quantity": 1}\n\n  \n{"code": "B", "quantity": 2}\n'
+    rows = parse_bulk_rows(body, _Row)
+    assert [row.code for row, _ in rows] == ["A", "B"]
+
+
+def test_accepts_utf8_bom():
+    body = '﻿[{"code": "書", "quantity": 1}]'.encode("utf-8")
+    assert parse_bulk_rows(body, _Row)[0][0].code == "書"
+
+
+def test_bad_rows_are_reported_in_place():
+    body = b'{"code": "A", "quantity": 1}\nnot json\n[1]\n{"code": "B"}\n'
+    rows = parse_bulk_rows(body, _Row)
+    assert rows[0] == (_Row(code="A", quantity=1), None)
+    assert rows[1][0] is None and rows[1][1].startswith("JSON 格式錯誤")
+    assert rows[2] == (None, "每筆資料必須為 JSON 物件")
+    assert rows[3][0] is None and "quantity" in rows[3][1]
+
+
+@pytest.mark.parametrize("body", [b"", b"   \n", b"\xff\xfe", b'[{"code": "A"'])
+def test_invalid_bodies_raise(body):
+    with pytest.raises(ValueError):
+        parse_bulk_rows(body, _Row)
+
+
+def test_row_limit(monkeypatch):
+    monkeypatch.setattr(bulk, "MAX_BULK_ROWS", 2)
+    body = b'{"code": "A", "quantity": 1}\n' * 2
+    assert len(parse_bulk_rows(body, _Row)) == 2
+    with pytest.raises(ValueError):
+        parse_bulk_rows(body * 2, _Row)
@@ -0,0 +1,76 @@
+import pytest
+
+from utils.lru_cache import LRUTTLCache
+
+
+def test_put_and_get():
+    cache = LRUTTLCache(max_size=2)
+    assert cache.put("a", 1)
+    assert cache.get("a") == 1
+    assert cache.get("missing", "default") == "default"
+
+
+def test_evicts_least_recently_used():
+    cache = LRUTTLCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entry_is_a_miss():
+    cache = LRUTTLCache(ttl=0)
+    cache.put("a", 1)
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_tag_drops_only_tagged_entries():
+    cache = LRUTTLCache()
+    cache.put("a", 1, tags=("vendor:1",))
+    cache.put("b", 2, tags=("vendor:1", "vendor:2"))
+    cache.put("c", 3, tags=("vendor:2",))
+    cache.invalidate_tag("vendor:1")
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+    assert cache.stats()["invalidations"] == 2
+
+
+def test_replaced_entry_loses_old_tags():
+    cache = LRUTTLCache()
+    cache.put("a", 1, tags=("old",))
+    cache.put("a", 2, tags=("new",))
+    cache.invalidate_tag("old")
+    assert cache.get("a") == 2
+
+
+def test_put_skipped_after_invalidation_since_generation():
+    cache = LRUTTLCache()
+    generation = cache.generation
+    cache.invalidate_tag("vendor:1")
+    assert not cache.put("a", 1, generation=generation)
+    assert cache.get("a") is None
+    assert cache.put("a", 1, generation=cache.generation)
+    assert cache.get("a") == 1
+
+
+@pytest.mark.parametrize("invalidate", [
+    lambda cache: cache.invalidate("other"),
+    lambda cache: cache.invalidate_tag("other"),
+    lambda cache: cache.clear(),
+])
+def test_every_invalidation_bumps_generation(invalidate):
+    cache = LRUTTLCache()
+    generation = cache.generation
+    invalidate(cache)
+    assert cache.generation == generation + 1
+
+
+def test_rejects_non_positive_max_size():
+    with pytest.raises(ValueError):
+        LRUTTLCache(max_size=0)
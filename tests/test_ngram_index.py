@@ -0,0 +1,52 @@
+from utils.ngram_index import NgramIndex
+
+
+def _index(**texts):
+    index = NgramIndex()
+    for key, text in texts.items():
+        index.add(key, text)
+    return index
+
+
+def test_search_matches_substrings_case_insensitively():
+    index = _index(a="Python Cookbook", b="Learning PYTHON", c="Go in Action")
+    assert index.search("python") == {"a", "b"}
+    assert index.search("ook") == {"a"}
+    assert index.search("rust") == set()
+
+
+def test_search_cjk_without_segmentation():
+    index = _index(a="台灣大學出版社", b="大學用書", c="出版年鑑")
+    assert index.search("大學") == {"a", "b"}
+    assert index.search("學出版") == {"a"}
+
+
+def test_candidates_are_verified():
+    # "abca" has bigrams ab, bc, ca but does not contain "abcab"
+    index = _index(a="abca", b="xabcabx")
+    assert index.search("abcab") == {"b"}
+
+
+def test_single_character_query_scans_texts():
+    index = _index(a="書", b="book")
+    assert index.search("書") == {"a"}
+    assert index.search("K") == {"b"}
+
+
+def test_add_replaces_previous_text():
+    index = _index(a="old title")
+    index.add("a", "new title")
+    assert index.search("old") == set()
+    assert index.search("new") == {"a"}
+    assert len(index) == 1
+
+
+def test_remove_and_clear():
+    index = _index(a="shared text", b="shared text")
+    index.remove("a")
+    index.remove("missing")
+    assert "a" not in index
+    assert index.search("shared") == {"b"}
+    index.clear()
+    assert len(index) == 0
+    assert index.search("shared") == set()
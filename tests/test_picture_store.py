@@ -0,0 +1,77 @@
+import base64
+import hashlib
+
+import pytest
+
+from app.services import picture_store
+
+_DIGEST = hashlib.sha256(b"picture").hexdigest()
+
+
+@pytest.fixture
+def picture_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(picture_store, "PICTURE_DIR", tmp_path)
+    return tmp_path
+
+
+def test_is_picture_hash():
+    assert picture_store.is_picture_hash(_DIGEST)
+    assert not picture_store.is_picture_hash(_DIGEST.upper())
+    assert not picture_store.is_picture_hash(_DIGEST[:-1])
+
+
+@pytest.mark.parametrize("value, expected", [
+    (f"sha256:{_DIGEST}", _DIGEST),
+    (f"sha256:{_DIGEST.upper()} ", _DIGEST),
+    (_DIGEST, None),
+    ("sha256:not-a-digest", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_picture_ref(value, expected):
+    assert picture_store.parse_picture_ref(value) == expected
+
+
+@pytest.mark.parametrize("header, expected", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ("*", True),
+    ('"abd"', False),
+    ("", False),
+])
+def test_etag_matches(header, expected):
+    assert picture_store.etag_matches(header, '"abc"') is expected
+
+
+@pytest.mark.parametrize("head, expected", [
+    (b"\xff\xd8\xff\xe0", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n\x00", "image/png"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF\x00\x00\x00\x00WEBP", "image/webp"),
+    (b"plain", "application/octet-stream"),
+])
+def test_sniff_media_type(head, expected):
+    assert picture_store.sniff_media_type(head) == expected
+
+
+def test_decode_base64_picture_strips_data_url_prefix():
+    value = "data:image/png;base64," + base64.b64encode(b"picture").decode()
+    assert picture_store.decode_base64_picture(value) == b"picture"
+    with pytest.raises(ValueError):
+        picture_store.decode_base64_picture("***")
+
+
+def test_store_and_prepare_round_trip(picture_dir):
+    ref = picture_store.store_prepared_picture(picture_store.prepare_picture(base64.b64encode(b"picture").decode()))
+    assert ref == f"sha256:{_DIGEST}"
+    assert picture_store.picture_exists(_DIGEST)
+    assert b"".join(picture_store.iter_picture(_DIGEST)) == b"picture"
+    assert picture_store.prepare_picture(ref.upper().replace("SHA256", "sha256")) == ref
+
+
+def test_prepare_rejects_unknown_ref_and_empty_content(picture_dir):
+    with pytest.raises(ValueError):
+        picture_store.prepare_picture(f"sha256:{_DIGEST}")
+    with pytest.raises(ValueError):
+        picture_store.prepare_picture("")
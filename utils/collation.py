@@ -0,0 +1,7 @@
+def collation_key(value: str) -> str:
+    """Normalize a string the way the database's case-insensitive collation compares it.
+
+    Trailing blanks are ignored and case is folded, so two values with the
+    same key match the same row in an ``=`` or ``IN`` comparison.
+    """
+    return value.rstrip().casefold()
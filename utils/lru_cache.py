@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable, Optional
+
+
+class LRUTTLCache:
+    """Thread-safe LRU cache whose entries also expire ``ttl`` seconds after being stored.
+
+    Entries can carry tags; invalidate_tag() drops every entry stored under
+    a tag. A reader that loads a value from the source should take
+    ``generation`` before loading and pass it to put(): if anything was
+    invalidated in the meantime the value may already be stale and is not
+    stored.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        if max_size < 1:
+            raise ValueError("Cache max_size must be at least 1")
+        self._max_size = max_size
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        # key -> (value, expires_at, tags); least recently used first
+        self._entries: OrderedDict[Hashable, tuple[Any, float, tuple]] = OrderedDict()
+        self._tagged: dict[Hashable, set] = {}
+        self._generation = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._invalidations = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped by every invalidation."""
+        return self._generation
+
+    def _drop(self, key: Hashable) -> None:
+        """Remove an entry and its tag links. Caller holds the lock."""
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tagged[tag]
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return default
+            if entry[1] <= time.monotonic():
+                self._drop(key)
+                self._expirations += 1
+                self._misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, key: Hashable, value: Any, tags: Iterable[Hashable] = (),
+            generation: Optional[int] = None) -> bool:
+        """Store a value. Returns False if it was skipped because of an invalidation after ``generation``."""
+        tags = tuple(tags)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (value, time.monotonic() + self._ttl, tags)
+            for tag in tags:
+                self._tagged.setdefault(tag, set()).add(key)
+            while len(self._entries) > self._max_size:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+            return True
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._generation += 1
+            if key in self._entries:
+                self._drop(key)
+                self._invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable) -> None:
+        """Drop every entry stored with ``tag``."""
+        with self._lock:
+            self._generation += 1
+            for key in list(self._tagged.get(tag, ())):
+                self._drop(key)
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._invalidations += len(self._entries)
+            self._entries.clear()
+            self._tagged.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxSize": self._max_size,
+                "ttlSeconds": self._ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "invalidations": self._invalidations,
+            }
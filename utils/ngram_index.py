@@ -0,0 +1,72 @@
+from typing import Hashable, Iterable
+
+
+def _bigrams(text: str) -> set[str]:
+    return {text[i:i + 2] for i in range(len(text) - 1)}
+
+
+class NgramIndex:
+    """Character bigram inverted index for case-insensitive substring search.
+
+    Works for CJK text without word segmentation: every pair of adjacent
+    characters is a posting key, so any query of two or more characters is
+    answered by intersecting posting sets and verifying the candidates.
+    Single-character queries scan the stored texts.
+
+    Not thread-safe; callers must serialise writes against reads.
+    """
+
+    def __init__(self):
+        self._texts: dict[Hashable, str] = {}
+        self._postings: dict[str, set] = {}
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._texts
+
+    def keys(self) -> Iterable[Hashable]:
+        return self._texts.keys()
+
+    def add(self, key: Hashable, text: str) -> None:
+        """Index ``text`` under ``key``, replacing any text indexed for it before."""
+        self.remove(key)
+        folded = text.casefold()
+        self._texts[key] = folded
+        for gram in _bigrams(folded):
+            self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, key: Hashable) -> None:
+        folded = self._texts.pop(key, None)
+        if folded is None:
+            return
+        for gram in _bigrams(folded):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def clear(self) -> None:
+        self._texts.clear()
+        self._postings.clear()
+
+    def search(self, term: str) -> set:
+        """Return the keys whose text contains ``term`` (case-insensitive)."""
+        folded = term.casefold()
+        if len(folded) < 2:
+            return {key for key, text in self._texts.items() if folded in text}
+
+        postings = []
+        for gram in _bigrams(folded):
+            keys = self._postings.get(gram)
+            if not keys:
+                return set()
+            postings.append(keys)
+        postings.sort(key=len)
+
+        candidates = postings[0].intersection(*postings[1:])
+        if len(folded) == 2:
+            return candidates
+        return {key for key in candidates if folded in self._texts[key]}